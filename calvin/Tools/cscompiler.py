@@ -18,24 +18,32 @@
 import os
 import sys
 import json
+import hashlib
 import argparse
+import itertools
+import multiprocessing
 from cspreprocess import Preprocessor
 from calvin.csparser.cscompile import compile_script, appname_from_filename
 from calvin.csparser.dscodegen import calvin_dscodegen
-from calvin.csparser.parser import printable_ir
+from calvin.csparser.parser import printable_ir, get_parser
+from calvin.actorstore.store import ActorStore, DocumentationStore
+from calvin.utilities.issuetracker import IssueTracker
+
+def compile_source(source_text, filename, ds, ir, credentials=None):
+    appname = appname_from_filename(filename)
+    if ds:
+        return calvin_dscodegen(source_text, appname)
+    elif ir:
+        return printable_ir(source_text)
+    else:
+        return compile_script(source_text, appname, credentials=credentials)
 
 def compile_file(filename, ds, ir, credentials=None, include_paths=None):
     pp = Preprocessor(include_paths)
     sourceText, it = pp.process(filename)
     if it.error_count > 0:
         return ({}, it)
-    appname = appname_from_filename(filename)
-    if ds:
-        return calvin_dscodegen(sourceText, appname)
-    elif ir:
-        return printable_ir(sourceText)
-    else:
-        return compile_script(sourceText, appname, credentials=credentials)
+    return compile_source(sourceText, filename, ds, ir, credentials)
 
 def compile_generator(files, ds, ir, credentials, include_paths):
     for filename in files:
@@ -43,6 +51,102 @@ def compile_generator(files, ds, ir, credentials, include_paths):
         yield((result, issuetracker, filename))
 
 
+def find_scripts(paths):
+    """Return sorted list of .calvin files in paths, directories are searched recursively"""
+    scripts = set()
+    for path in paths:
+        if not os.path.isdir(path):
+            scripts.add(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            scripts.update([os.path.join(dirpath, f) for f in filenames if f.endswith('.calvin')])
+    return sorted(scripts)
+
+def _output_name(filename):
+    path, ext = os.path.splitext(filename)
+    return path + ".json"
+
+def _batch_compile(job):
+    """Compile one script in a batch, returns (filename, output text or None, issues)"""
+    filename, source_text, ds, ir, indent, sort_keys = job
+    try:
+        result, issuetracker = compile_source(source_text, filename, ds, ir)
+    except Exception as e:
+        return (filename, None, [{'type': 'error', 'reason': "Compiler failure: {}".format(e)}])
+    issues = issuetracker.issues(sort_key='line')
+    if issuetracker.error_count:
+        return (filename, None, issues)
+    output = result if ir else json.dumps(result, indent=indent, sort_keys=sort_keys)
+    return (filename, output, issues)
+
+def _load_report(report_file):
+    try:
+        with open(report_file, 'r') as f:
+            return json.load(f).get('scripts', {})
+    except (IOError, ValueError, AttributeError):
+        return {}
+
+def compile_batch(paths, ds, ir, include_paths=None, jobs=None, report_file=None, indent=4, sort_keys=False):
+    """
+    Compile all scripts in paths (files or directory trees) using jobs processes, writing
+    each deployable next to its script. Scripts whose content, compiler options and actors
+    are unchanged since the run recorded in report_file are skipped.
+    Returns the report, a dict with the outcome and issues of each script.
+    """
+    previous = _load_report(report_file) if report_file else {}
+    # The actor store is described and the parser built once, before forking the workers
+    DocumentationStore().docs
+    get_parser()
+    fingerprint = ActorStore().fingerprint()
+    options = json.dumps([ds, ir, indent, sort_keys, fingerprint])
+
+    scripts = {}
+    jobs_todo = []
+    for filename in find_scripts(paths):
+        source_text, it = Preprocessor(include_paths).process(filename)
+        if it.error_count:
+            scripts[filename] = {'status': 'failed', 'hash': None, 'issues': it.issues(sort_key='line')}
+            continue
+        source = source_text.encode('utf-8') if isinstance(source_text, unicode) else source_text
+        digest = hashlib.sha1(source + options).hexdigest()
+        old = previous.get(filename)
+        if old and old['hash'] == digest and old['status'] != 'failed' and os.path.exists(_output_name(filename)):
+            scripts[filename] = {'status': 'unchanged', 'hash': digest, 'issues': old['issues']}
+            continue
+        scripts[filename] = {'status': 'compiled', 'hash': digest, 'issues': []}
+        jobs_todo.append((filename, source_text, ds, ir, indent, sort_keys))
+
+    jobs = jobs or multiprocessing.cpu_count()
+    if jobs > 1 and len(jobs_todo) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(jobs_todo)))
+        results = pool.imap_unordered(_batch_compile, jobs_todo)
+    else:
+        pool = None
+        results = itertools.imap(_batch_compile, jobs_todo)
+    try:
+        for filename, output, issues in results:
+            scripts[filename]['issues'] = issues
+            if output is None:
+                scripts[filename]['status'] = 'failed'
+                continue
+            with open(_output_name(filename), 'w') as f:
+                f.write(output)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    summary = {'compiled': 0, 'unchanged': 0, 'failed': 0}
+    for entry in scripts.values():
+        summary[entry['status']] += 1
+    report = {'summary': summary, 'scripts': scripts}
+    if report_file:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+    return report
+
+
 def main():
     long_description = """
   Compile a CalvinScript source file, <filename> into a deployable JSON representation.
@@ -78,11 +182,36 @@ def main():
                            help='send output to stdout instead of file (default)')
     outgroup.add_argument('--output', dest='outfile', type=str, default='', metavar='<filename>',
                            help='Output file, default is filename.json')
+    argparser.add_argument('--batch', action='store_true', default=False,
+                           help='compile all scripts in the given files and directories (recursively) in parallel, '
+                                'skipping scripts that are unchanged since last run')
+    argparser.add_argument('-j', '--jobs', type=int, default=None, metavar='<n>',
+                           help='number of processes used by --batch, default is number of CPUs')
+    argparser.add_argument('--report', type=str, default='cscompile_report.json', metavar='<filename>',
+                           help='JSON report of outcome and issues for --batch, default is cscompile_report.json')
 
 
 
     args = argparser.parse_args()
     exit_code = 0
+    if args.batch:
+        if args.outfile:
+            argparser.error("--batch writes each output next to its script, --output and --stdout can't be used")
+        report = compile_batch(args.files, args.deployscript, args.intermediate, args.include_paths, args.jobs,
+                               args.report, args.indent, args.sorted)
+        for filename, entry in sorted(report['scripts'].items()):
+            issuetracker = IssueTracker(allow_duplicates=True)
+            for issue in entry['issues']:
+                if issue['type'] == 'error':
+                    issuetracker.add_error(issue['reason'], issue)
+                elif args.verbose:
+                    issuetracker.add_warning(issue['reason'], issue)
+            for issue in issuetracker.formatted_issues(custom_format=args.fmt, script=filename, line=0, col=0):
+                sys.stderr.write(issue + "\n")
+        if args.verbose:
+            sys.stderr.write("{compiled} compiled, {unchanged} unchanged, {failed} failed\n".format(**report['summary']))
+        return 1 if report['summary']['failed'] else 0
+
     for result, issuetracker, filename in compile_generator(args.files, args.deployscript, args.intermediate, None, args.include_paths):
         if issuetracker.error_count:
             for issue in issuetracker.formatted_errors(sort_key='line', custom_format=args.fmt, script=filename, line=0, col=0):
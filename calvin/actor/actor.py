@@ -22,6 +22,8 @@ from calvin.actor import actorport
 from calvin.utilities.calvinlogger import get_logger
 from calvin.utilities.utils import enum
 from calvin.runtime.north.calvin_token import Token, ExceptionToken
+from calvin.actor.actorcost import ActorCost
+from calvin.runtime.north.profiler import get_profiler
 # from calvin.runtime.north import calvincontrol
 # from calvin.runtime.north import metering
 from calvin.runtime.north.replicationmanager import ReplicationData
@@ -34,6 +36,7 @@ from calvin.runtime.north.calvinsys import get_calvinsys
 from calvin.runtime.north.calvinlib import get_calvinlib
 
 _log = get_logger(__name__)
+_profiler = get_profiler()
 
 
 # Tests in test_manage_decorator.py
@@ -77,13 +80,20 @@ def manage(include=None, exclude=None):
     return wrapper
 
 
-def condition(action_input=[], action_output=[], metadata=False):
+def condition(action_input=[], action_output=[], metadata=False, batch=None):
     """
     Decorator condition specifies the required input data and output space.
     Both parameters are lists of port names
     Return value is a tuple (did_fire, output_available, exhaust_list)
+
+    With batch=N the action is called with a list of up to N values for each input port,
+    read from the ports in one go, and returns a list of values for each output port
+    (at most as many values as it got on each input port), see batch_condition.
     """
 
+    if batch is not None:
+        return batch_condition(action_input, action_output, metadata, batch)
+
     tokens_produced = len(action_output)
     tokens_consumed = len(action_input)
 
@@ -119,6 +129,7 @@ def condition(action_input=[], action_output=[], metadata=False):
                 exception = exception or is_exception_token
                 x = token if is_exception_token else ((token.value, token.metadata) if metadata else token.value)
                 args.append(x)
+            self._cost.tokens_consumed += tokens_consumed
             #
             # Check for exceptional conditions
             #
@@ -157,6 +168,105 @@ def condition(action_input=[], action_output=[], metadata=False):
     return wrap
 
 
+def _max_available(ports, length):
+    """Largest n <= length such that all ports have n tokens (or slots) available, 0 if none"""
+    def available(n):
+        return all(port.tokens_available(n) for port in ports)
+    if available(length):
+        return length
+    if not available(1):
+        return 0
+    low, high = 1, length - 1
+    while low < high:
+        n = (low + high + 1) // 2
+        if available(n):
+            low = n
+        else:
+            high = n - 1
+    return low
+
+
+def batch_condition(action_input, action_output, metadata, batch):
+    """
+    Batched version of condition, normally used as @condition(action_input, action_output, batch=N).
+    The action fires when all input ports have at least one token and all output ports at least one
+    free slot, and is called with a list of n values for each input port, where n is the largest
+    number <= batch of tokens available on all input ports and slots available on all output ports.
+    The action must return a list (of length <= n) of values for each output port, the values are
+    wrapped in tokens as for condition.
+    An exception token in the queue ends the batch before it, the exception token itself is handled
+    in a firing of its own by the actor's exception_handler exactly as for condition.
+    """
+
+    if not action_input:
+        raise Exception("@condition: batch requires at least one input port")
+    if batch < 1:
+        raise Exception("@condition: batch must be at least 1")
+
+    tokens_produced = len(action_output)
+    tokens_consumed = len(action_input)
+
+    def wrap(action_method):
+
+        @functools.wraps(action_method)
+        def batch_condition_wrapper(self):
+            inports = [self.inports[portname] for portname in action_input]
+            outports = [self.outports[portname] for portname in action_output]
+            n_out = _max_available(outports, batch)
+            if not n_out:
+                return (False, False, ())
+            n = _max_available(inports, n_out)
+            if not n:
+                return (False, True, ())
+            #
+            # Read n tokens from every input port, stop before any exception token
+            #
+            tokens = [[port.peek_token() for _ in xrange(n)] for port in inports]
+            valid = n
+            for port_tokens in tokens:
+                for i, token in enumerate(port_tokens[:valid]):
+                    if isinstance(token, ExceptionToken):
+                        valid = i
+                        break
+            exception = valid == 0
+            if valid < n:
+                valid = valid or 1
+                for port, port_tokens in zip(inports, tokens):
+                    port.peek_cancel()
+                    del port_tokens[valid:]
+                    for _ in xrange(valid):
+                        port.peek_token()
+                n = valid
+            exhausted_ports = set(port for port in inports if port.peek_commit())
+            self._cost.tokens_consumed += n * tokens_consumed
+
+            if exception:
+                args = [t[0] if isinstance(t[0], ExceptionToken) else
+                        ((t[0].value, t[0].metadata) if metadata else t[0].value) for t in tokens]
+                production = [[p] for p in self.exception_handler(action_method, args) or ()]
+            else:
+                args = [[(t.value, t.metadata) for t in port_tokens] if metadata else [t.value for t in port_tokens]
+                        for port_tokens in tokens]
+                production = action_method(self, *args) or ()
+
+            valid_production = (tokens_produced == len(production) and all(len(p) <= n for p in production))
+
+            if not valid_production:
+                action = "%s.%s" % (self._type, action_method.__name__)
+                raise Exception("%s invalid batch production %s, expected %s with at most %d values each" % (
+                    action, str(production), str(tuple(action_output)), n))
+
+            for port, values in zip(outports, production):
+                for retval in values:
+                    x = retval if isinstance(retval, Token) else (Token(retval[0], **retval[1]) if metadata else Token(retval))
+                    port.write_token(x)
+
+            return (True, True, exhausted_ports)
+
+        return batch_condition_wrapper
+    return wrap
+
+
 def stateguard(action_guard):
     """
     Decorator guard refines the criteria for picking an action to run by stating a function
@@ -314,6 +424,9 @@ class Actor(object):
     test_args = ()
     test_kwargs = {}
 
+    # Default time (in seconds) an actor may keep firing actions in one call to fire()
+    FIRE_TIME_SLICE = 0.020
+
     @property
     def id(self):
         return self._id
@@ -358,6 +471,7 @@ class Actor(object):
         self.authorization_checks = None
         self._replication_data = ReplicationData(initialize=False)
         self._exhaust_cb = None
+        self._cost = ActorCost()
 
         self.inports = {p: actorport.InPort(p, self, pp) for p, pp in self.inport_properties.items()}
         self.outports = {p: actorport.OutPort(p, self, pp) for p, pp in self.outport_properties.items()}
@@ -541,10 +655,16 @@ class Actor(object):
             async.DelayedCall(0, self._exhaust_cb, status=response.CalvinResponse(True))
             self._exhaust_cb = None
 
+    @property
+    def cost(self):
+        return self._cost
+
     @verify_status([STATUS.ENABLED])
-    def fire(self):
+    def fire(self, time_slice=None):
         """
         Fire an actor.
+        Keeps firing actions until none can fire or time_slice seconds (default FIRE_TIME_SLICE)
+        have passed, a time_slice of 0.0 fires at most one action.
         Returns True if any action fired
         """
         # FIXME: Move authorization decision to scheduler
@@ -554,19 +674,28 @@ class Actor(object):
         if not self._authorized():
             return False
 
+        if time_slice is None:
+            time_slice = self.FIRE_TIME_SLICE
         start_time = time.time()
         actor_did_fire = False
+        actions_fired = 0
+        profiling = _profiler.enabled
         #
         # Repeatedly go over the action priority list
         #
         done = False
         while not done:
             for action_method in self.__class__.action_priority:
+                if profiling:
+                    action_start = time.time()
                 did_fire, output_ok, exhausted = action_method(self)
                 actor_did_fire |= did_fire
                 # Action firing should fire the first action that can fire,
                 # hence when fired start from the beginning priority list
                 if did_fire:
+                    actions_fired += 1
+                    if profiling:
+                        _profiler.action_fired(self, action_method.__name__, time.time() - action_start)
                     # # FIXME: Add hooks for metering and probing
                     # self.metering.fired(self._id, action_method.__name__)
                     # self.control.log_actor_firing( ... )
@@ -581,7 +710,7 @@ class Actor(object):
                 #
                 # FIXME: IMHO this decision should be made in the scheduler. No timing here.
                 time_spent = time.time() - start_time
-                done = time_spent > 0.020
+                done = time_spent >= time_slice
             else:
                 #
                 # We reached the end of the list without ANY firing during this round
@@ -591,6 +720,7 @@ class Actor(object):
                 self._handle_exhaustion(exhausted, output_ok)
                 done = True
 
+        self._cost.update(time.time() - start_time, actions_fired)
         return actor_did_fire
 
 
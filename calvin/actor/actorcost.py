@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class ActorCost(object):
+    """
+    Keeps exponential moving averages of the cost of firing an actor.
+    Updated by Actor.fire() and used by the scheduler to size the time slice
+    given to the actor.
+    """
+
+    # Weight of the latest sample in the moving averages
+    ALPHA = 0.1
+    # Number of actions that must fit in the default time slice for an actor to be considered cheap
+    CHEAP_ACTIONS = 100
+
+    def __init__(self):
+        super(ActorCost, self).__init__()
+        self.fire_count = 0
+        self.action_count = 0
+        self.token_count = 0
+        # Seconds spent in a call to fire() that fired at least one action
+        self.avg_fire_time = 0.0
+        # Seconds spent per action firing
+        self.avg_action_time = 0.0
+        # Tokens consumed per action firing
+        self.avg_tokens = 0.0
+        # Action firings per call to fire()
+        self.avg_actions = 0.0
+        # Tokens consumed since last update, counted by the @condition decorator
+        self.tokens_consumed = 0
+
+    def _average(self, average, sample):
+        return sample if self.fire_count == 1 else average + self.ALPHA * (sample - average)
+
+    def update(self, duration, actions):
+        """Record one call to fire() that fired actions in duration seconds"""
+        tokens = self.tokens_consumed
+        self.tokens_consumed = 0
+        if not actions:
+            return
+        self.fire_count += 1
+        self.action_count += actions
+        self.token_count += tokens
+        self.avg_fire_time = self._average(self.avg_fire_time, duration)
+        self.avg_action_time = self._average(self.avg_action_time, duration / actions)
+        self.avg_tokens = self._average(self.avg_tokens, float(tokens) / actions)
+        self.avg_actions = self._average(self.avg_actions, float(actions))
+
+    def time_slice(self, default, maximum):
+        """
+        Time slice for next call to fire().
+        Actors whose actions cost more than the default slice are capped to a single action (0.0),
+        actors that fit CHEAP_ACTIONS actions in the default slice get maximum to fire large batches,
+        all other actors (including those not yet fired) get the default.
+        """
+        if not self.fire_count:
+            return default
+        if self.avg_action_time > default:
+            return 0.0
+        if self.avg_action_time * self.CHEAP_ACTIONS < default:
+            return maximum
+        return default
+
+    def info(self):
+        return {
+            'fire_count': self.fire_count,
+            'action_count': self.action_count,
+            'token_count': self.token_count,
+            'avg_fire_time': self.avg_fire_time,
+            'avg_action_time': self.avg_action_time,
+            'avg_tokens': self.avg_tokens,
+            'avg_actions': self.avg_actions
+        }
@@ -422,6 +422,11 @@ class PortMeta(object):
         return self._port
 
     def retry(self, callback):
+        # The registry information we got was stale, don't use cached values for the lookup
+        if self.port_id:
+            self.pm.node.storage.invalidate("port-", self.port_id)
+        if self.actor_id:
+            self.pm.node.storage.invalidate("actor-", self.actor_id)
         self.node_id = None
         self.retries += 1
         self.retrieve(callback)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+
+from calvin.utilities.calvinlogger import get_logger
+
+_log = get_logger(__name__)
+
+
+class ActorManifest(object):
+    """
+    Index of the directories and actors below one actor path, kept in a file in the actor path.
+
+    Directories are only listed again when their mtime changed, and actors and modules are only
+    described again (which means importing them) when the mtime or size of their file changed.
+    """
+
+    VERSION = 1
+    FILENAME = '.actor_manifest.json'
+
+    def __init__(self, root, persistent=True):
+        super(ActorManifest, self).__init__()
+        self.root = root
+        self.path = os.path.join(root, self.FILENAME)
+        self.persistent = persistent
+        # key: relative dir path, value: dict with mtime, files and subdirs
+        self.dirs = {}
+        # key: relative file path, value: dict with mtime, size and desc (description)
+        self.actors = {}
+        self.dirty = False
+        if persistent:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            return
+        if manifest.get('version') != self.VERSION:
+            return
+        self.dirs = manifest['dirs']
+        self.actors = manifest['actors']
+
+    def save(self):
+        if not self.dirty or not self.persistent:
+            return
+        self.dirty = False
+        # Written in place, creating or renaming files would change the mtime of the root directory.
+        # A partially written manifest read by another process is just ignored.
+        try:
+            data = json.dumps({'version': self.VERSION, 'dirs': self.dirs, 'actors': self.actors})
+            with open(self.path, 'w') as f:
+                f.write(data)
+        except (IOError, OSError, TypeError, ValueError):
+            _log.debug("Could not write actor manifest %s", self.path)
+
+    def _dir(self, rel_path, excluded):
+        abs_path = os.path.join(self.root, rel_path)
+        mtime = os.path.getmtime(abs_path)
+        entry = self.dirs.get(rel_path)
+        if entry and entry['mtime'] == mtime:
+            return entry
+        # Same selection as os.walk and glob in the store, which skip hidden files
+        files = []
+        subdirs = []
+        for name in sorted(os.listdir(abs_path)):
+            if os.path.isdir(os.path.join(abs_path, name)):
+                # Like os.walk, don't follow symbolic links
+                if name not in excluded and not os.path.islink(os.path.join(abs_path, name)):
+                    subdirs.append(name)
+            elif not name.startswith('.') and os.path.splitext(name)[1] in ('.py', '.comp'):
+                files.append(name)
+        entry = {'mtime': mtime, 'files': files, 'subdirs': subdirs}
+        self.dirs[rel_path] = entry
+        self.dirty = True
+        return entry
+
+    def directories(self, excluded=()):
+        """Return list of (abs path, relative path, files) for all directories below root"""
+        if not os.path.isdir(self.root):
+            return []
+        result = []
+        visit = ['.']
+        visited = set([])
+        while visit:
+            rel_path = visit.pop(0)
+            visited.add(rel_path)
+            try:
+                entry = self._dir(rel_path, excluded)
+            except OSError:
+                continue
+            abs_path = os.path.normpath(os.path.join(self.root, rel_path))
+            if rel_path != '.':
+                result.append((abs_path, rel_path, [os.path.join(abs_path, f) for f in entry['files']]))
+            visit.extend([os.path.normpath(os.path.join(rel_path, d)) for d in entry['subdirs']])
+        removed = [d for d in self.dirs if d not in visited]
+        for d in removed:
+            del self.dirs[d]
+        files = set([os.path.normpath(os.path.join(d, f)) for d in self.dirs for f in self.dirs[d]['files']])
+        removed.extend([f for f in self.actors if f not in files])
+        for f in removed:
+            self.actors.pop(f, None)
+        self.dirty = self.dirty or bool(removed)
+        return result
+
+    def describe(self, path, describer):
+        """
+        Return the description of the actor (or module) in file path, describer is called to get
+        the description of a new or changed file and should return None when broken.
+        """
+        rel_path = os.path.relpath(path, self.root)
+        st = os.stat(path)
+        entry = self.actors.get(rel_path)
+        if entry and entry['mtime'] == st.st_mtime and entry['size'] == st.st_size:
+            return entry['desc']
+        desc = describer()
+        if desc is None:
+            # Broken, e.g. a missing dependency, try again next time
+            return None
+        try:
+            # Only keep descriptions that are unchanged after a round trip
+            if json.loads(json.dumps(desc)) != desc:
+                return desc
+        except (TypeError, ValueError):
+            return desc
+        self.actors[rel_path] = {'mtime': st.st_mtime, 'size': st.st_size, 'desc': desc}
+        self.dirty = True
+        return desc
@@ -17,6 +17,7 @@
 import os
 import glob
 import imp
+import functools
 import inspect
 import json
 import re
@@ -24,6 +25,7 @@ from types import ModuleType
 import hashlib
 import numbers
 
+from calvin.actorstore.manifest import ActorManifest
 from calvin.csparser.astnode import node_encoder, node_decoder
 from calvin.utilities import calvinconfig
 from calvin.utilities import dynops
@@ -79,6 +81,84 @@ class Singleton(type):
             cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
 
+#
+# Cache of loaded actor classes
+#
+class ActorClassCache(object):
+    """Loaded actor classes and verified signatures, shared by all stores.
+
+    Classes are kept per path together with the file's mtime, size and content hash, a file that
+    has been touched but not changed keeps its class. Signatures are kept per path, content hash
+    and signature files.
+    """
+
+    def __init__(self):
+        super(ActorClassCache, self).__init__()
+        # key: path, value: (name, (mtime, size), digest, pyclass)
+        self.classes = {}
+        # key: (path, digest, signature files), value: signer
+        self.signatures = {}
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return (st.st_mtime, st.st_size)
+
+    def digest(self, name, path):
+        """Return content hash of path, re-read only when the file's mtime or size changed"""
+        stat = self._stat(path)
+        entry = self.classes.get(path)
+        if entry and entry[0] == name and entry[1] == stat:
+            return entry[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        if entry and entry[0] == name and entry[2] == digest:
+            self.classes[path] = (name, stat, digest, entry[3])
+        return digest
+
+    def get_class(self, name, path, digest):
+        entry = self.classes.get(path)
+        if entry and entry[0] == name and entry[2] == digest:
+            return entry[3]
+        return None
+
+    def put_class(self, name, path, digest, pyclass):
+        self.classes[path] = (name, self._stat(path), digest, pyclass)
+
+    def _signature_key(self, path, digest):
+        sign_files = tuple(sorted((f, os.path.getmtime(f)) for f in glob.glob(path + ".sign.*")))
+        return (path, digest, sign_files)
+
+    def verify_signature(self, sec, path, digest):
+        """Return (verified, signer), only successful verifications are cached"""
+        key = self._signature_key(path, digest)
+        if key in self.signatures:
+            return (True, self.signatures[key])
+        verified, signer = sec.verify_signature(path, "actor")
+        if verified:
+            self.signatures[key] = signer
+        return (verified, signer)
+
+    def invalidate(self, path=None):
+        """Drop the cached class and signatures of path, or everything if path is None"""
+        if path is None:
+            self.classes = {}
+            self.signatures = {}
+            return
+        self.classes.pop(path, None)
+        self.signatures = {k: v for k, v in self.signatures.iteritems() if k[0] != path}
+
+
+_class_cache = ActorClassCache()
+
+# key: actor path, value: ActorManifest shared by all stores
+_manifests = {}
+
+def _manifest(root):
+    if root not in _manifests:
+        _manifests[root] = ActorManifest(root, persistent=_conf.get('global', 'actor_manifest'))
+    return _manifests[root]
+
 #
 # Base class for all "stores"
 #
@@ -109,39 +189,45 @@ class Store(object):
     def update(self):
         """Should be called after a module has been added at runtime."""
         _log.debug("Store update SECURITY %s" % str(self.sec))
+        _class_cache.invalidate()
         self._MODULE_CACHE = self.find_all_modules()
 
 
     def directories(self):
         for path in self._MODULE_PATHS: # FIXME: Reverse order
+            for current, rel_path, files in _manifest(path).directories(self._excluded_dirs):
+                yield (current, _rel_path_to_namespace(rel_path), files)
 
-            if not os.path.exists(path):
-                continue
 
-            for current, subdirs, _ in os.walk(path):
-                rel_path = os.path.relpath(current, path)
-                # Skip top directory
-                if rel_path == '.':
-                    continue
-                namespace = _rel_path_to_namespace(rel_path)
-                files = _files_in_dir(current, ('.py', '.comp'))
+    def _manifest_for(self, path):
+        """Return the manifest of the actor path that path is in"""
+        roots = [p for p in self._MODULE_PATHS if path.startswith(os.path.join(p, ''))]
+        return _manifest(max(roots, key=len)) if roots else None
 
-                yield (current, namespace, files)
 
-                # Exclude special directories
-                for exclude in self._excluded_dirs:
-                    if exclude in subdirs:
-                        subdirs.remove(exclude)
+    def fingerprint(self):
+        """Return a hash of the paths, mtimes and sizes of all actor and component files"""
+        h = hashlib.sha1()
+        for _, _, files in self.directories():
+            for f in files:
+                st = os.stat(f)
+                h.update("%s:%r:%d;" % (f, st.st_mtime, st.st_size))
+        return h.hexdigest()
 
 
-    def _load_pymodule(self, name, path):
+    def save_manifests(self):
+        for path in self._MODULE_PATHS:
+            _manifest(path).save()
+
+
+    def _load_pymodule(self, name, path, verified=False):
         if not os.path.isfile(path):
             return (None, None)
         pymodule = None
         signer = None
         _log.debug("Store load_pymodule SECURITY %s" % str(self.sec))
         try:
-            if self.sec:
+            if self.sec and not verified:
                 _log.debug("Verify signature for %s actor" % name)
                 verified, signer = self.sec.verify_signature(path, "actor")
                 if self.verify and not verified:
@@ -158,13 +244,30 @@ class Store(object):
             return (pymodule, signer)
 
 
-    def _load_pyclass(self, name, path):
+    def _load_pyclass(self, name, path, verified=False):
+        """Return (class, signer), the class is only loaded again when the content of path changed."""
         if not os.path.isfile(path):
             return (None, None)
-        pymodule, signer = self._load_pymodule(name, path)
+        try:
+            digest = _class_cache.digest(name, path)
+        except Exception:
+            _log.exception("Could not read python module")
+            return (None, None)
+        signer = None
+        if self.sec and not verified:
+            verified, signer = _class_cache.verify_signature(self.sec, path, digest)
+            if self.verify and not verified:
+                _log.error("Failed verification of signature for %s actor" % name)
+                return (None, signer)
+        pyclass = _class_cache.get_class(name, path, digest)
+        if pyclass:
+            return (pyclass, signer)
+        pymodule, _ = self._load_pymodule(name, path, verified=True)
         pyclass = pymodule and pymodule.__dict__.get(name, None)
         if not pyclass:
             _log.debug("No entry %s in %s" % (name, path))
+            return (pyclass, signer)
+        _class_cache.put_class(name, path, digest, pyclass)
         return (pyclass, signer)
 
 
@@ -178,6 +281,7 @@ class Store(object):
                 modules[namespace] = []
             if abs_path not in modules[namespace]:
                 modules[namespace].append(abs_path)
+        self.save_manifests()
         return modules
 
 
@@ -209,7 +313,8 @@ class ActorStore(Store):
         self.sec = security
         self.verify = verify
         _log.debug("ActorStore init SECURITY %s" % str(self.sec))
-        self.update()
+        # Not update() since that also drops the classes loaded by other stores
+        self._MODULE_CACHE = self.find_all_modules()
 
 
     def load_from_path(self, path):
@@ -247,6 +352,10 @@ class ActorStore(Store):
             actor_class, signer = self.load_actor(actor_type, actor_path)
             if actor_class:
                 return (True, True, actor_class, signer)
+        return self._lookup_component(namespace, actor_type)
+
+
+    def _lookup_component(self, namespace, actor_type):
         for path in self.paths_for_module(namespace):
             actor_path = os.path.join(path, actor_type + '.comp')
             # TODO add credential verification of components
@@ -256,6 +365,53 @@ class ActorStore(Store):
         return (False, False, None, None)
 
 
+    def lookup_description(self, qualified_name):
+        """
+        Like lookup, but for primitive actors info is a description from the actor store manifest,
+        a dict with args (as _get_args), inputs, outputs, doclines (as _parse_docstring) and requires.
+        The actor is only imported when its file is not in the manifest or has changed.
+        """
+        namespace, _, actor_type = qualified_name.rpartition('.')
+        for path in self.paths_for_module(namespace):
+            actor_path = os.path.join(path, actor_type + '.py')
+            manifest = self._manifest_for(actor_path)
+            if not manifest or not os.path.isfile(actor_path):
+                continue
+            desc = manifest.describe(actor_path, functools.partial(self._describe_actor, actor_type, actor_path))
+            if desc is None:
+                continue
+            # Optional args are kept in order to build the same dict as _get_args
+            desc = {'args': {'mandatory': desc['mandatory'], 'optional': dict(desc['optional'])},
+                    'inputs': [tuple(p) for p in desc['inputs']],
+                    'outputs': [tuple(p) for p in desc['outputs']],
+                    'doclines': desc['doclines'],
+                    'requires': desc['requires']}
+            signer = None
+            if self.sec:
+                digest = _class_cache.digest(actor_type, actor_path)
+                verified, signer = _class_cache.verify_signature(self.sec, actor_path, digest)
+                if self.verify and not verified:
+                    _log.error("Failed verification of signature for %s actor" % actor_type)
+                    continue
+            return (True, True, desc, signer)
+        return self._lookup_component(namespace, actor_type)
+
+
+    def _describe_actor(self, actor_type, actor_path):
+        # Signatures are verified when the description is used
+        actor_class, _ = self._load_pyclass(actor_type, actor_path, verified=True)
+        if not actor_class:
+            return None
+        inputs, outputs, doclines = self._parse_docstring(actor_class)
+        mandatory, optional = self._get_arg_list(actor_class)
+        return {'mandatory': mandatory,
+                'optional': [list(arg) for arg in optional],
+                'inputs': [list(p) for p in inputs],
+                'outputs': [list(p) for p in outputs],
+                'doclines': doclines,
+                'requires': list(getattr(actor_class, 'requires', []))}
+
+
     def _parse_docstring(self, class_):
         # Extract port names from docstring
         docstring = inspect.cleandoc(class_.__doc__)
@@ -375,12 +531,18 @@ class ActorStore(Store):
         Return a dict with a list of mandatory arguments, and a dictionary of optional arguments.
         Either one may be empty.
         """
+        mandatory, optional = self._get_arg_list(actor_class)
+        return {'mandatory':mandatory, 'optional':dict(optional)}
+
+
+    def _get_arg_list(self, actor_class):
+        """Return a list of mandatory arguments, and a list of (argument, default) for optional arguments."""
         a = inspect.getargspec(actor_class.init)
         defaults = [] if not a.defaults else a.defaults
         n_mandatory = len(a.args) - len(defaults)
         mandatory = a.args[1:n_mandatory]
-        optional = {arg:default for arg, default in zip(a.args[n_mandatory:], defaults)}
-        return {'mandatory':mandatory, 'optional':optional}
+        optional = zip(a.args[n_mandatory:], defaults)
+        return (mandatory, optional)
 
 
     def load_component(self, name, path):
@@ -429,6 +591,7 @@ class ActorStore(Store):
       except Exception as e:
          _log.exception("Could not write component to: %s" % filepath)
          return False
+      _class_cache.invalidate(os.path.join(paths[0], component_type + ".py"))
       return True
 
 
@@ -536,25 +699,24 @@ class GlobalStore(ActorStore):
         self.qualified_actor_list = []
         self._collect()
         for a in self.qualified_actor_list:
-            found, is_primitive, actor, signer = self.lookup(a)
+            found, is_primitive, actor, signer = self.lookup_description(a)
             if not found:
                 continue
             # Currently only args and requires differences that would generate multiple hits
             if is_primitive:
-                inputs, outputs, _ = self._parse_docstring(actor)
-                args = self._get_args(actor)
                 desc = {'is_primitive': is_primitive,
                         'actor_type': a,
-                        'args': args,
-                        'inports': [p[0] for p in inputs],
-                        'outports': [p[0] for p in outputs],
-                        'requires': actor.requires if hasattr(actor, 'requires') else [],
+                        'args': actor['args'],
+                        'inports': [p[0] for p in actor['inputs']],
+                        'outports': [p[0] for p in actor['outputs']],
+                        'requires': actor['requires'],
                         'signer': signer}
             else:
                 desc = {'is_primitive': is_primitive,
                         'actor_type': a,
                         'component': actor}
             self.export_actor(desc)
+        self.save_manifests()
 
     def global_lookup(self, desc, cb):
         """ Lookup the described actor
@@ -631,7 +793,16 @@ class DocumentationStore(ActorStore):
     """Interface to documentation"""
     def __init__(self):
         super(DocumentationStore, self).__init__()
-        self.docs = self.root_docs()
+        self._docs = None
+
+
+    @property
+    def docs(self):
+        """Documentation tree of all modules, built when first used"""
+        if self._docs is None:
+            self._docs = self.root_docs()
+            self.save_manifests()
+        return self._docs
 
 
     def module_docs(self, namespace):
@@ -640,15 +811,25 @@ class DocumentationStore(ActorStore):
         paths = self.paths_for_module(namespace)
         for path in paths:
             docpath = os.path.join(path, '__init__.py')
-            pymodule, _ = self._load_pymodule('__init__', docpath)
-            if pymodule and pymodule.__doc__:
-                doclines = pymodule.__doc__.splitlines()
+            manifest = self._manifest_for(docpath)
+            if not manifest or not os.path.isfile(docpath):
+                continue
+            doc = manifest.describe(docpath, functools.partial(self._describe_module, docpath))
+            if doc:
+                doclines = doc.splitlines()
                 return ModuleDoc(namespace, modules, actors, doclines)
         return ErrorDoc(namespace, None, "Unknown module")
 
 
+    def _describe_module(self, docpath):
+        pymodule, _ = self._load_pymodule('__init__', docpath)
+        if not pymodule:
+            return None
+        return pymodule.__doc__ or ""
+
+
     def actor_docs(self, qualified_name):
-        found, is_primitive, actor, _ = self.lookup(qualified_name)
+        found, is_primitive, actor, _ = self.lookup_description(qualified_name)
         if not found:
             return ErrorDoc(qualified_name, None, "Unknown actor")
         if not actor:
@@ -656,10 +837,8 @@ class DocumentationStore(ActorStore):
 
         namespace, name = qualified_name.rsplit('.', 1)
         if is_primitive:
-            args = self._get_args(actor)
-            inputs, outputs, doclines = self._parse_docstring(actor)
-            requires = getattr(actor, 'requires', [])
-            doc = ActorDoc(namespace, name, args, inputs, outputs, doclines, requires)
+            doc = ActorDoc(namespace, name, actor['args'], actor['inputs'], actor['outputs'], actor['doclines'],
+                           actor['requires'])
         else:
             if type(actor) is dict:
                 return ErrorDoc(namespace, name, "Old-style components are not valid")
@@ -678,7 +857,10 @@ class DocumentationStore(ActorStore):
 
 
     def metadata(self, qualified_name):
-        doc = self._help(qualified_name)
+        # Actors are looked up directly instead of building the documentation tree
+        doc = self.actor_docs(qualified_name) if qualified_name else None
+        if type(doc) not in (ActorDoc, ComponentDoc):
+            doc = self._help(qualified_name)
         return doc.metadata()
 
     def _help(self, what):
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import pytest
+from mock import Mock, patch
+
+from calvin.actorstore import store
+from calvin.actorstore.manifest import ActorManifest
+
+pytestmark = pytest.mark.unittest
+
+ACTOR_SOURCE = """
+from calvin.actor.actor import Actor, condition
+
+class Dummy(Actor):
+    \"\"\"
+    A dummy actor
+
+    Outputs:
+      token : output
+    \"\"\"
+
+    def init(self, data, n=1):
+        pass
+
+    @condition([], ['token'])
+    def out(self):
+        return (1, )
+
+    action_priority = (out, )
+    requires = ['sys.dummy']
+"""
+
+
+@pytest.fixture
+def actor_tree(tmpdir):
+    root = tmpdir.mkdir("actors")
+    ns = root.mkdir("test")
+    ns.join("__init__.py").write('"""Test actors"""\n')
+    ns.join("Dummy.py").write(ACTOR_SOURCE)
+    return str(root)
+
+
+def test_directories(actor_tree):
+    manifest = ActorManifest(actor_tree)
+    dirs = manifest.directories()
+    assert [(rel, sorted(os.path.basename(f) for f in files)) for _, rel, files in dirs] == \
+        [('test', ['Dummy.py', '__init__.py'])]
+    manifest.save()
+    assert os.path.isfile(os.path.join(actor_tree, ActorManifest.FILENAME))
+    # Hidden files like the manifest itself are not listed
+    open(os.path.join(actor_tree, "test", "Other.comp"), 'w').close()
+    os.mkdir(os.path.join(actor_tree, "test", "sub"))
+    os.utime(os.path.join(actor_tree, "test"), (1, 1))
+    dirs = ActorManifest(actor_tree).directories()
+    assert [(rel, sorted(os.path.basename(f) for f in files)) for _, rel, files in dirs] == \
+        [('test', ['Dummy.py', 'Other.comp', '__init__.py']), ('test/sub', [])]
+
+
+def test_describe(actor_tree):
+    path = os.path.join(actor_tree, "test", "Dummy.py")
+    manifest = ActorManifest(actor_tree)
+    manifest.directories()
+    describer = Mock(return_value={'doc': "Dummy"})
+    assert manifest.describe(path, describer) == {'doc': "Dummy"}
+    manifest.save()
+    # From the saved manifest
+    manifest = ActorManifest(actor_tree)
+    assert manifest.describe(path, describer) == {'doc': "Dummy"}
+    assert describer.call_count == 1
+    # Changed file
+    os.utime(path, (1, 1))
+    assert manifest.describe(path, describer) == {'doc': "Dummy"}
+    assert describer.call_count == 2
+    # Broken actors and descriptions that can't be stored are not kept
+    manifest = ActorManifest(actor_tree, persistent=False)
+    for desc in (None, {'default': (1, 2)}):
+        describer = Mock(return_value=desc)
+        manifest.describe(path, describer)
+        manifest.describe(path, describer)
+        assert describer.call_count == 2
+
+
+def test_export_from_manifest(actor_tree):
+    def export():
+        store._manifests.clear()
+        store._class_cache.invalidate()
+        node = Mock()
+        global_store = store.GlobalStore(node=node)
+        global_store._MODULE_PATHS = [actor_tree]
+        global_store._MODULE_CACHE = global_store.find_all_modules()
+        global_store.export()
+        return node.storage.set.call_args[0][2]
+
+    with patch('calvin.actorstore.store.imp.load_source', wraps=store.imp.load_source) as load_source:
+        desc = export()
+        assert load_source.call_count == 1
+        assert export() == desc
+        assert load_source.call_count == 1
+    assert desc['actor_type'] == 'test.Dummy'
+    assert desc['args'] == {'mandatory': ['data'], 'optional': {'n': 1}}
+    assert desc['outports'] == ['token'] and desc['inports'] == []
+    assert desc['requires'] == ['sys.dummy']
+
+
+def test_docs_from_manifest(actor_tree):
+    docstore = store.DocumentationStore()
+    docstore._MODULE_PATHS = [actor_tree]
+    docstore._MODULE_CACHE = docstore.find_all_modules()
+    metadata = docstore.actor_docs("test.Dummy").metadata()
+    assert metadata['args'] == {'mandatory': ['data'], 'optional': {'n': 1}}
+    assert metadata['requires'] == ['sys.dummy']
+    assert docstore.module_docs("test").docs == "Test actors"
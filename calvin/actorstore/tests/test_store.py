@@ -14,11 +14,35 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import pytest
 import timeit
+from mock import Mock, patch
 
+from calvin.actorstore import store
 from calvin.actorstore.store import ActorStore
 
+ACTOR_SOURCE = """
+from calvin.actor.actor import Actor, condition
+
+class Dummy(Actor):
+    \"\"\"
+    Version %d
+
+    Outputs:
+      token : output
+    \"\"\"
+
+    def init(self):
+        pass
+
+    @condition([], ['token'])
+    def out(self):
+        return (%d, )
+
+    action_priority = (out, )
+"""
+
 
 class TestActorStore(object):
 
@@ -47,6 +71,52 @@ class TestActorStore(object):
     def test_load_modules(self):
         pass
 
+    def test_class_cache(self, tmpdir):
+        path = str(tmpdir.join("Dummy.py"))
+        with open(path, 'w') as f:
+            f.write(ACTOR_SOURCE % (1, 1))
+        with patch('calvin.actorstore.store.imp.load_source', wraps=store.imp.load_source) as load_source:
+            first, _ = self.ms.load_actor("Dummy", path)
+            second, _ = ActorStore().load_actor("Dummy", path)
+            assert first is second
+            assert load_source.call_count == 1
+            # Touched but not changed
+            os.utime(path, (1, 1))
+            assert self.ms.load_actor("Dummy", path)[0] is first
+            assert load_source.call_count == 1
+            # Changed
+            with open(path, 'w') as f:
+                f.write(ACTOR_SOURCE % (2, 2))
+            os.utime(path, (2, 2))
+            changed, _ = self.ms.load_actor("Dummy", path)
+            assert changed is not first
+            assert "Version 2" in changed.__doc__
+            assert load_source.call_count == 2
+            # Explicit invalidation
+            self.ms.update()
+            assert self.ms.load_actor("Dummy", path)[0] is not changed
+            assert load_source.call_count == 3
+
+    def test_signature_cache(self, tmpdir):
+        path = str(tmpdir.join("Dummy.py"))
+        with open(path, 'w') as f:
+            f.write(ACTOR_SOURCE % (1, 1))
+        sec = Mock()
+        sec.verify_signature.return_value = (False, None)
+        secure_store = ActorStore(security=sec)
+        assert secure_store.load_actor("Dummy", path) == (None, None)
+        sec.verify_signature.return_value = (True, ['signer'])
+        for _ in range(3):
+            actor_class, signer = secure_store.load_actor("Dummy", path)
+            assert actor_class and signer == ['signer']
+        # Failures are not cached
+        assert sec.verify_signature.call_count == 2
+        # A new signature is verified
+        with open(path + ".sign.0123", 'w') as f:
+            f.write("signature")
+        secure_store.load_actor("Dummy", path)
+        assert sec.verify_signature.call_count == 3
+
     @pytest.mark.xfail  # May or may not pass. Not that important
     def test_perf(self):
         time = timeit.timeit(lambda: self.ms.lookup("std.Sum"), number=1000)
@@ -36,6 +36,15 @@ def _construct_metadata(node):
         }
     }
 
+_docstore = None
+
+def _metadata(actor_type):
+    """Return actor store metadata for actor_type from a documentation store shared by all compilations"""
+    global _docstore
+    if _docstore is None:
+        _docstore = DocumentationStore()
+    return _docstore.metadata(actor_type)
+
 def _lookup(node, issue_tracker):
     if _is_local_component(node.actor_type):
         comps = query(_root(node), kind=ast.Component, attributes={'name':node.actor_type})
@@ -57,7 +66,7 @@ def _lookup(node, issue_tracker):
             'definition': comp.children[0]
         }
     else:
-        metadata = DocumentationStore().metadata(node.actor_type)
+        metadata = _metadata(node.actor_type)
         if not metadata['is_known']:
             reason = "Not validating actor type: '{}'".format(node.actor_type)
             issue_tracker.add_warning(reason, node)
@@ -1,12 +1,28 @@
 
 import os
+import copy
+import hashlib
+from collections import OrderedDict
 from codegen import calvin_codegen
+from calvin.actorstore.store import ActorStore
 from calvin.utilities.security import Security, security_enabled
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.calvinlogger import get_logger
 from calvin.utilities.issuetracker import IssueTracker
+from calvin.utilities import calvinconfig
 
 _log = get_logger(__name__)
+_conf = calvinconfig.get()
+
+# key: (source hash, appname, verify), value: (actor store fingerprint, (deployable, issuetracker))
+_compiled = OrderedDict()
+_actorstore = None
+
+def _actorstore_fingerprint():
+    global _actorstore
+    if _actorstore is None:
+        _actorstore = ActorStore()
+    return _actorstore.fingerprint()
 
 def appname_from_filename(filename):
     appname = os.path.splitext(os.path.basename(filename))[0]
@@ -25,7 +41,21 @@ def compile_script(source_text, filename, credentials=None, verify=True):
     N.B 'credentials' and 'verify' are intended for actor store access, currently unused
     """
     appname = appname_from_filename(filename)
-    return calvin_codegen(source_text, appname, verify=verify)
+    cache_size = _conf.get('global', 'compile_cache_size')
+    if not cache_size:
+        return calvin_codegen(source_text, appname, verify=verify)
+    # Compiled scripts are reused until the script or any actor changes
+    source = source_text.encode('utf-8') if isinstance(source_text, unicode) else source_text
+    key = (hashlib.sha1(source).hexdigest(), appname, verify)
+    fingerprint = _actorstore_fingerprint()
+    entry = _compiled.pop(key, None)
+    if entry is None or entry[0] != fingerprint:
+        entry = (fingerprint, calvin_codegen(source_text, appname, verify=verify))
+    _compiled[key] = entry
+    while len(_compiled) > cache_size:
+        _compiled.popitem(last=False)
+    # Callers may modify the deployable
+    return copy.deepcopy(entry[1])
 
 
 # FIXME: It might make sense to turn this function into a plain asynchronous security check.
@@ -495,8 +495,10 @@ class CalvinParser(object):
         self.source_text = source_text
         root = None
 
+        # The lexer is reused between parses
+        self.lexer.lineno = 1
         try:
-            root = self.parser.parse(source_text, debug=logger)
+            root = self.parser.parse(source_text, lexer=self.lexer, debug=logger)
         except SyntaxError as e:
             self.issuetracker.add_error(e.text, {'line':e.lineno, 'col':e.offset})
         finally:
@@ -505,11 +507,20 @@ class CalvinParser(object):
         return ir, self.issuetracker
 
 
+_parser = None
+
+def get_parser():
+    """Return the process wide parser, building lexer and parse tables is only done once."""
+    global _parser
+    if _parser is None:
+        # Not optimized, the parse tables are checked against the grammar and rebuilt when stale
+        _parser = CalvinParser()
+    return _parser
+
 # FIXME: [PP] Optionally supply an IssueTracker
 def calvin_parse(source_text):
     """Parse source text and return ir (AST) and issuetracker."""
-    parser = CalvinParser()
-    return parser.parse(source_text)
+    return get_parser().parse(source_text)
 
 def printable_ir(source_text):
     ir, it = calvin_parse(source_text)
@@ -49,6 +49,7 @@ APPLICATION_PATH = '/application/{}'
 APPLICATION_MIGRATE = '/application/{}/migrate'
 ACTOR_PORT = '/actor/{}/port/{}'
 ACTOR_REPORT = '/actor/{}/report'
+ACTOR_COST = '/actor/{}/cost'
 SET_PORT_PROPERTY = '/set_port_property'
 APPLICATIONS = '/applications'
 DEPLOY = '/deploy'
@@ -61,6 +62,9 @@ METER_PATH = '/meter/{}'
 METER_PATH_TIMED = '/meter/{}/timed'
 METER_PATH_AGGREGATED = '/meter/{}/aggregated'
 METER_PATH_METAINFO = '/meter/{}/metainfo'
+METER_PATH_RATES = '/meter/{}/rates'
+PROFILING = '/profiling'
+PROFILING_FLAMEGRAPH = '/profiling/flamegraph'
 CSR_REQUEST = '/certificate_authority/certificate_signing_request'
 ENROLLMENT_PASSWORD = '/certificate_authority/certificate_enrollment_password/{}'
 AUTHENTICATION = '/authentication'
@@ -307,6 +311,10 @@ class RequestHandler(object):
             r = self._get(rt, timeout, async, path)
         return self.check_response(r)
 
+    def get_actor_cost(self, rt, actor_id, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, ACTOR_COST.format(actor_id))
+        return self.check_response(r)
+
     def get_applications(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
         r = self._get(rt, timeout, async, APPLICATIONS)
         return self.check_response(r)
@@ -368,6 +376,22 @@ class RequestHandler(object):
         r = self._get(rt, timeout, async, METER_PATH_METAINFO.format(user_id))
         return self.check_response(r)
 
+    def get_rates_metering(self, rt, user_id, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, METER_PATH_RATES.format(user_id))
+        return self.check_response(r)
+
+    def set_profiling(self, rt, enabled, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._post(rt, timeout, async, PROFILING, data={'enabled': enabled})
+        return self.check_response(r)
+
+    def get_profiling(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, PROFILING)
+        return self.check_response(r)
+
+    def get_profiling_flamegraph(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, PROFILING_FLAMEGRAPH)
+        return self.check_response(r)
+
     def add_index(self, rt, index, value, timeout=DEFAULT_TIMEOUT, async=False):
         data = {'value': value}
         path = INDEX_PATH.format(index)
@@ -414,6 +414,132 @@ class ActorManager(object):
             if callback:
                 callback(status=status, state=state, ports=ports, actor_type=actor_type)
 
+    def migrate_batch(self, actor_ids, node_id, callback=None):
+        """ Migrate the actors actor_ids to peer node node_id in one ACTOR_NEW_BATCH message,
+            connections between the actors are re-established locally on the peer.
+            callback is called with status and a list actors of dicts with actor_id, actor_type,
+            state and ports, these could be used by the callback to retry the actors elsewhere.
+        """
+        actors = [self.actors[actor_id] for actor_id in actor_ids if actor_id in self.actors]
+        if len(actors) < len(actor_ids):
+            # Can only migrate actors from our node
+            if callback:
+                callback(status=response.CalvinResponse(False), actors=[])
+            return
+        if node_id == self.node.id:
+            # No need to migrate to ourself
+            for actor in actors:
+                actor._replication_data.inhibate(actor.id, False)
+            if callback:
+                callback(status=response.CalvinResponse(True), actors=[])
+            return
+        # Get all connections before any disconnect removes the connections between the actors
+        batch = {'pending': len(actors), 'status': response.CalvinResponse(True), 'actors': []}
+        for actor in actors:
+            actor._replication_data.inhibate(actor.id, False)
+            actor._migrating_to = node_id
+            actor.will_migrate()
+            batch['actors'].append({'actor_id': actor.id, 'actor_type': actor._type,
+                                    'ports': actor.connections(self.node.id)})
+        for actor in actors:
+            self.node.pm.disconnect(callback=CalvinCB(self._migrate_batch_disconnected,
+                                                      node_id=node_id,
+                                                      batch=batch,
+                                                      callback=callback),
+                                    actor_id=actor.id)
+            self.node.control.log_actor_migrate(actor.id, node_id)
+
+    def _migrate_batch_disconnected(self, node_id, batch, status, callback=None, **kwargs):
+        """ One of the actors in the batch is disconnected, send the batch when all are """
+        if not status:
+            batch['status'] = status
+        batch['pending'] -= 1
+        if batch['pending'] > 0:
+            return
+        for a in batch['actors']:
+            a['state'] = self.actors[a['actor_id']].serialize()
+            self.destroy(a['actor_id'], temporary=True)
+        if batch['status']:
+            self.node.proto.actor_new_batch(node_id, CalvinCB(self._migrate_batch_sent, batch=batch,
+                                                              callback=callback),
+                                            batch['actors'])
+        else:
+            self._migrate_batch_sent(batch['status'], batch, callback)
+
+    def _migrate_batch_sent(self, status, batch, callback=None, **kwargs):
+        if status:
+            if callback:
+                callback(status=status, actors=[])
+            return
+        # The connections between the actors of the batch was on this node, let storage find them instead
+        port_ids = set([])
+        for a in batch['actors']:
+            port_ids.update(a['ports']['inports'].keys())
+            port_ids.update(a['ports']['outports'].keys())
+        for a in batch['actors']:
+            for peers in a['ports']['inports'].values() + a['ports']['outports'].values():
+                peers[:] = [(None, p[1]) if p[1] in port_ids else p for p in peers]
+        _log.debug("Batch migration failed: %s", status)
+        if callback:
+            callback(status=status, actors=batch['actors'])
+
+    def new_batch_from_migration(self, actors, callback=None):
+        """ Instantiate migrated actors from a list of dicts with actor_type, actor_state and prev_connections.
+            Connections between the actors were local on the sending node and are made locally on this node.
+            callback is called once with the status when all actors are created and connected.
+        """
+        port_ids = set([])
+        for a in actors:
+            port_ids.update(a['prev_connections']['inports'].keys())
+            port_ids.update(a['prev_connections']['outports'].keys())
+        connected = set([])
+        connection_lists = {}
+        for a in actors:
+            connection_list = []
+            for c in self._prev_connections_to_connection_list(a['prev_connections']):
+                if c[3] in port_ids:
+                    # Connect each pair of ports in the batch only once and locally
+                    if (c[3], c[1]) in connected:
+                        continue
+                    connected.add((c[1], c[3]))
+                    c = (c[0], c[1], self.node.id, c[3])
+                connection_list.append(c)
+            connection_lists[a['actor_state']['private']['_id']] = connection_list
+        batch = {'pending': len(actors), 'status': response.CalvinResponse(True),
+                 'connection_lists': connection_lists}
+        for a in actors:
+            try:
+                self.new_from_migration(a['actor_type'], a['actor_state'],
+                                        callback=CalvinCB(self._new_batch_created, batch=batch, callback=callback))
+            except Exception:
+                _log.exception("Batch migration of actor failed")
+                self._new_batch_created(response.CalvinResponse(False), batch=batch, callback=callback)
+
+    def _new_batch_created(self, status, batch, callback=None, **kwargs):
+        """ Connect the actors when all are created, since they may be each others peers """
+        if not status:
+            batch['status'] = status
+        batch['pending'] -= 1
+        if batch['pending'] > 0:
+            return
+        connection_lists = {actor_id: cl for actor_id, cl in batch['connection_lists'].iteritems()
+                            if cl and actor_id in self.actors}
+        if not connection_lists:
+            if callback:
+                callback(status=batch['status'])
+            return
+        batch['pending'] = len(connection_lists)
+        for actor_id, connection_list in connection_lists.iteritems():
+            self.connect(actor_id, connection_list,
+                         callback=CalvinCB(self._new_batch_connected, batch=batch, callback=callback))
+
+    def _new_batch_connected(self, status, batch, callback=None, **kwargs):
+        if not status:
+            batch['status'] = status
+        batch['pending'] -= 1
+        if batch['pending'] == 0 and callback:
+            callback(status=batch['status'])
+
     def peernew_to_local_cb(self, reply, **kwargs):
         if kwargs['actor_id'] == reply:
             # Managed to setup since new returned same actor id
@@ -511,6 +637,15 @@ class ActorManager(object):
 
         return self.actors[actor_id].report(**(kwargs if kwargs and isinstance(kwargs, dict) else {}))
 
+    def get_cost(self, actor_id):
+        if actor_id not in self.actors:
+            self._actor_not_found(actor_id)
+
+        actor = self.actors[actor_id]
+        cost = actor.cost.info()
+        cost['time_slice'] = actor.cost.time_slice(actor.FIRE_TIME_SLICE, self.node.sched.MAX_FIRE_TIME_SLICE)
+        return cost
+
     def enabled_actors(self):
         return [actor for actor in self.actors.values() if actor.enabled()]
 
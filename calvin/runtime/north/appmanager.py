@@ -26,6 +26,7 @@ from calvin.actorstore.store import ActorStore, GlobalStore
 from calvin.runtime.south.plugins.async import async
 from calvin.utilities.security import Security
 from calvin.utilities.requirement_matching import ReqMatch
+from calvin.runtime.north.placement import PlacementEngine, node_cost
 
 _log = calvinlogger.get_logger(__name__)
 
@@ -439,73 +440,104 @@ class AppManager(object):
             status = response.CalvinResponse(response.CREATED)
             _log.analyze(self._node.id, "+ MISS PLACEMENT", {'app_id': app.id, 'placement': app.actor_placement}, tb=True)
 
-        # Collect an actor by actor matrix stipulating a weighting 0.0 - 1.0 for their connectivity
-        actor_ids, actor_matrix = self._actor_connectivity(app)
-
         # Get list of all possible nodes
         node_ids = set([])
         for possible_nodes in app.actor_placement.values():
             node_ids |= possible_nodes
-        node_ids = list(node_ids)
         node_ids = [n for n in node_ids if not isinstance(n, dynops.InfiniteElement)]
         for actor_id, possible_nodes in app.actor_placement.iteritems():
             if any([isinstance(n, dynops.InfiniteElement) for n in possible_nodes]):
                 app.actor_placement[actor_id] = node_ids
-        _log.analyze(self._node.id, "+ ACTOR MATRIX", {'actor_ids': actor_ids, 'actor_matrix': actor_matrix,
-                                            'node_ids': node_ids, 'placement': app.actor_placement}, tb=True)
 
-        # Weight the actors possible placement with their connectivity matrix
-        weighted_actor_placement = {}
-        for actor_id in actor_ids:
-            # actor matrix is symmetric, so independent if read horizontal or vertical
-            actor_weights = actor_matrix[actor_ids.index(actor_id)]
-            # Sum the actor weights for each actors possible nodes, matrix mult AA * AN,
-            # AA actor weights, AN actor * node with 1 when possible
-            weights = [sum([actor_weights[actor_ids.index(_id)] if node_id in app.actor_placement[actor_id] else 0
-                             for _id in actor_ids])
-                             for node_id in node_ids]
-            # Get first node with highest weight
-            # FIXME should verify that the node actually exist also
-            # TODO should select from a resource sharing perspective also, instead of picking first max
-            # TODO: should also ask authorization server before selecting node to migrate to.
-            _log.analyze(self._node.id, "+ WEIGHTS", {'actor_id': actor_id, 'weights': weights})
-            #weighted_actor_placement[actor_id] = node_ids[weights.index(max(weights))]
-            # Get a list of nodes in sorted weighted order
-            weighted_actor_placement[actor_id] = [n for (w, n) in sorted(zip(weights, node_ids), reverse=True)]
+        engine = PlacementEngine(app.get_actors(), node_ids)
+        for actor_id, possible_nodes in app.actor_placement.iteritems():
+            engine.set_possible(actor_id, possible_nodes)
+        # Connectivity and node costs are collected before the placement is decided
+        app._placement_status = status
+        app._placement_pending = 1
+        self._actor_connectivity(app, engine)
+        self._node_costs(app, engine)
+        self._placement_collected(app, engine)
+
+    def _placement_collected(self, app, engine):
+        app._placement_pending -= 1
+        if app._placement_pending > 0:
+            return
+        status = app._placement_status
+        del app._placement_status
+        _log.analyze(self._node.id, "+ ACTOR CONNECTIVITY", {'edges': engine.edges, 'node_ids': engine.node_ids,
+                                                           'costs': engine.costs, 'placement': app.actor_placement}, tb=True)
+        # Get a list of nodes in weighted order for each actor
+        # FIXME should verify that the node actually exist also
+        # TODO: should also ask authorization server before selecting node to migrate to.
+        weighted_actor_placement = engine.placement()
+        # Migrate the actors placed on the same node in one batch
+        batches = {}
         for actor_id, node_id in weighted_actor_placement.iteritems():
-            _log.debug("Actor deployment %s \t-> %s" % (app.actors[actor_id], node_id))
-            # FIXME add callback that recreate the actor locally
-            self._node.am.robust_migrate(actor_id, node_id[:], None)
+            _log.debug("Actor deployment %s \t-> %s", app.actors[actor_id], node_id)
+            # Can only migrate actors from our node
+            if node_id and actor_id in self._node.am.actors:
+                batches.setdefault(node_id[0], []).append(actor_id)
+        for node_id, actor_ids in batches.iteritems():
+            self._node.am.migrate_batch(actor_ids, node_id,
+                                        callback=CalvinCB(self._placement_batch_migrated,
+                                                          placement=weighted_actor_placement))
 
         app._org_cb(status=status, placement=weighted_actor_placement)
         del app._org_cb
         _log.analyze(self._node.id, "+ DONE", {'app_id': app.id}, tb=True)
 
-    def _actor_connectivity(self, app):
-        """ Matrix of weights between actors how close they want to be
-            0 = don't care
-            1 = same node
+    def _placement_batch_migrated(self, status, actors, placement):
+        """ Try the remaining placements of each actor when the batch migration failed """
+        for a in actors:
+            # FIXME add callback that recreate the actor locally
+            self._node.am.robust_migrate(a['actor_id'], placement[a['actor_id']][1:], None,
+                                         state=a['state'], actor_type=a['actor_type'], ports=a['ports'])
 
-            Currently any nodes that are connected gets 0.5, and
-            diagonal is 1:s
-        """
-        list_actors = app.get_actors()
-        l= len(list_actors)
-        actor_matrix = [[0 for x in range(l)] for x in range(l)]
-        for actor_id in list_actors:
+    def _actor_connectivity(self, app, engine):
+        """ Connect the actors of app in engine, peers on other nodes are looked up in storage """
+        for actor_id in app.get_actors():
+            if actor_id not in self._node.am.actors:
+                continue
             connections = self._node.am.connections(actor_id)
-            for p in connections['inports'].values():
-                try:
-                    peer_actor_id = self._node.pm._get_local_port(port_id=p[1]).owner.id
-                except:
-                    # Only work while the peer still is local
-                    # TODO get it from storage
-                    continue
-                actor_matrix[list_actors.index(actor_id)][list_actors.index(peer_actor_id)] = 0.5
-                actor_matrix[list_actors.index(peer_actor_id)][list_actors.index(actor_id)] = 0.5
-        for i in range(l):
-            actor_matrix[i][i] = 1
-        return (list_actors, actor_matrix)
+            for peers in connections['inports'].values() + connections['outports'].values():
+                for peer_node_id, peer_port_id in peers:
+                    if peer_node_id == self._node.id:
+                        try:
+                            engine.connect(actor_id, self._node.pm._get_local_port(port_id=peer_port_id).owner.id)
+                            continue
+                        except:
+                            # Peer has left this node, get it from storage
+                            pass
+                    app._placement_pending += 1
+                    self.storage.get_port(peer_port_id, cb=CalvinCB(self._actor_connectivity_cb, app=app,
+                                                                    engine=engine, actor_id=actor_id))
+
+    def _actor_connectivity_cb(self, key, value, app, engine, actor_id):
+        if value:
+            engine.connect(actor_id, value.get('actor_id'))
+        self._placement_collected(app, engine)
+
+    def _node_costs(self, app, engine):
+        """ Set node cost in engine from the nodes' resource attributes and link round trip time """
+        for node_id in engine.node_ids:
+            if node_id == self._node.id:
+                rtt = 0
+            else:
+                link = self._node.network.link_get(node_id)
+                rtt = link.get_rtt() if link else None
+            resources = {}
+            for prefix, name in (("nodeCpuAvail-", 'cpu_avail'), ("nodeMemAvail-", 'mem_avail')):
+                app._placement_pending += 1
+                self.storage.get(prefix=prefix, key=node_id,
+                                 cb=CalvinCB(self._node_costs_cb, app=app, engine=engine, node_id=node_id,
+                                             name=name, resources=resources, rtt=rtt))
+
+    def _node_costs_cb(self, key, value, app, engine, node_id, name, resources, rtt):
+        resources[name] = value
+        if len(resources) == 2:
+            engine.set_cost(node_id, node_cost(rtt=rtt, **resources))
+        self._placement_collected(app, engine)
 
     # Remigration
 
@@ -17,6 +17,7 @@
 import re
 import os
 from calvin.runtime.north.authorization.policy_information_point import PolicyInformationPoint
+from calvin.runtime.north.authorization.policy_engine import PolicyEngine
 from calvin.runtime.north.plugins.authorization_checks import check_authorization_plugin_list
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.calvinlogger import get_logger
@@ -31,13 +32,17 @@ class PolicyDecisionPoint(object):
             "policy_combining": "permit_overrides",
             "policy_storage": "files",
             "policy_storage_path": os.path.join(os.path.expanduser("~"), ".calvin", "security", "policies"),
-            "policy_name_pattern": "*"
+            "policy_name_pattern": "*",
+            # Max number of decisions kept and seconds they are reused, 0 disables the decision cache
+            "decision_cache_size": 1000,
+            "decision_cache_ttl": 10.0
         }
         if config is not None:
             # Change some of the default values of the config.
             self.config.update(config)
         self.node = node
         self.registered_nodes = {}
+        self.engine = PolicyEngine(self, self.config["decision_cache_size"], self.config["decision_cache_ttl"])
 
     def register_node(self, node_id, node_attributes):
         """
@@ -220,8 +225,22 @@ class PolicyDecisionPoint(object):
             ]
         }
         """
+        _log.debug("combined_policy_decision: \n\trequest=%s", request)
+        try:
+            # Get policies from PRP (Policy Retrieval Point).
+            policies = self.node.authorization.prp.get_policies(self.config["policy_name_pattern"])
+        except Exception as err:
+            _log.error("Failed to get policies from PRP, exc={}".format(err))
+            return ("indeterminate", [])
+        return self.engine.decision(policies, request, pip)
+
+    def interpreted_policy_decision(self, request, pip):
+        """
+        Return (decision, obligations) for request by interpreting every policy,
+        the same as combined_policy_decision but without compiled policies and cached decisions.
+        """
         _log.debug("\n********************************************************\n"
-                   "combined_policy_decision: \n\trequest={}".format(request))
+                   "interpreted_policy_decision: \n\trequest={}".format(request))
         policy_decisions = []
         policy_obligations = []
         try:
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import copy
+import json
+import functools
+from calvin.runtime.north.registry_cache import RegistryCache
+from calvin.utilities.calvinlogger import get_logger
+
+_log = get_logger(__name__)
+
+# Policies without any of these characters in a target value match only that exact string
+_REGEX_SPECIAL = re.compile(r'[.^$*+?{}\[\]\\|()]')
+# Attribute types used to index policies
+_INDEXED_TYPES = ("subject", "action")
+
+_CONSTANT = 0
+_ATTRIBUTE = 1
+_DYNAMIC = 2
+
+
+class _AttributeRecorder(object):
+    """
+    Wraps a PolicyInformationPoint, recording if a decision depends on attributes that are not
+    part of the request (the environment, e.g. current time) or that could not be fetched.
+    """
+
+    def __init__(self, pip):
+        super(_AttributeRecorder, self).__init__()
+        self.pip = pip
+        self.volatile = False
+
+    def get_attribute_value(self, attribute_type, attribute):
+        if attribute_type == "environment":
+            self.volatile = True
+        try:
+            return self.pip.get_attribute_value(attribute_type, attribute)
+        except Exception:
+            self.volatile = True
+            raise
+
+
+def _values_match(policy_value, request_value):
+    # Same matching as PolicyDecisionPoint.target_matches
+    try:
+        return any([re.match(r+'$', x) for r in policy_value for x in request_value])
+    except TypeError:
+        return not set(request_value).isdisjoint(policy_value)
+
+
+class PolicyEngine(object):
+    """
+    Makes the decisions of a PolicyDecisionPoint using policies compiled into closures.
+
+    Policies are compiled when first seen and recompiled when the policy retrieval point returns
+    other policy objects. Policies are indexed by the first attribute of their target, when it is
+    a subject or action attribute matching only exact values, so that only candidate policies are
+    evaluated. Decisions are kept for cache_ttl seconds, except decisions that depend on the
+    environment or on attributes the PolicyInformationPoint failed to get.
+
+    Anything that can't be compiled (e.g. a malformed policy or an invalid regular expression)
+    is evaluated by the interpreting methods of the PolicyDecisionPoint, so that decisions are
+    always the same as theirs.
+    """
+
+    def __init__(self, pdp, cache_size, cache_ttl):
+        super(PolicyEngine, self).__init__()
+        self.pdp = pdp
+        # List of (policy_id, policy) the compiled policies were made from
+        self.sources = []
+        # List of (target function, decision function), in policy order
+        self.compiled = []
+        # key: (attribute_type, attribute), value: (positions of all policies, {value: positions})
+        self.index = {}
+        # Positions of policies that are always evaluated
+        self.unindexed = []
+        self.decisions = RegistryCache(cache_size, {'': cache_ttl})
+
+    def decision(self, policies, request, pip):
+        """Return (decision, obligations) for request using policies, a dict from the policy retrieval point"""
+        self._update(policies)
+        try:
+            key = json.dumps(request, sort_keys=True)
+        except (TypeError, ValueError):
+            key = None
+        if key is not None:
+            cached = self.decisions.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        recorder = _AttributeRecorder(pip)
+        result = self._combined_decision(request, recorder)
+        _log.debug("Policy engine decision %s for request %s", result, key)
+        if key is not None and not recorder.volatile:
+            self.decisions.put(key, copy.deepcopy(result))
+        return result
+
+    def _update(self, policies):
+        sources = policies.items()
+        if len(sources) == len(self.sources) and all(
+                a[0] == b[0] and a[1] is b[1] for a, b in zip(sources, self.sources)):
+            return
+        # Policies that are the same objects as before are not compiled again
+        previous = dict([(policy_id, (policy, compiled))
+                         for (policy_id, policy), compiled in zip(self.sources, self.compiled)])
+        self.sources = sources
+        self.compiled = []
+        for policy_id, policy in sources:
+            old = previous.get(policy_id)
+            self.compiled.append(old[1] if old and old[0] is policy else self._compile_policy(policy))
+        self._build_index()
+        self.decisions.clear()
+
+    def _build_index(self):
+        self.index = {}
+        self.unindexed = []
+        for position, (policy_id, policy) in enumerate(self.sources):
+            key, literals = self._index_key(policy)
+            if key is None:
+                self.unindexed.append(position)
+                continue
+            positions, values = self.index.setdefault(key, (set([]), {}))
+            positions.add(position)
+            for literal in literals:
+                values.setdefault(literal, set([])).add(position)
+
+    def _index_key(self, policy):
+        """Return ((attribute_type, attribute), values) of the first attribute of a policy target if it can be indexed"""
+        try:
+            target = policy["target"]
+            for attribute_type in target:
+                for attribute in target[attribute_type]:
+                    # Only the first attribute, a target stops at the first attribute that doesn't match
+                    values = target[attribute_type][attribute]
+                    if not isinstance(values, list):
+                        values = [values]
+                    if (attribute_type not in _INDEXED_TYPES or
+                            not all(isinstance(v, basestring) and not _REGEX_SPECIAL.search(v) for v in values)):
+                        return None, None
+                    return (attribute_type, attribute), values
+        except Exception:
+            pass
+        return None, None
+
+    def _candidates(self, request):
+        """Return positions, in policy order, of the policies that may match request"""
+        positions = set(self.unindexed)
+        for (attribute_type, attribute), (indexed, literals) in self.index.iteritems():
+            try:
+                request_value = request[attribute_type][attribute]
+            except Exception:
+                # Fetched from the PIP, or fails, when the policies are evaluated
+                positions.update(indexed)
+                continue
+            if not isinstance(request_value, list):
+                request_value = [request_value]
+            if not all(isinstance(x, basestring) for x in request_value):
+                positions.update(indexed)
+                continue
+            for x in request_value:
+                positions.update(literals.get(x, ()))
+                if x.endswith('\n'):
+                    # '$' also matches before a newline at the end
+                    positions.update(literals.get(x[:-1], ()))
+        return sorted(positions)
+
+    def _combined_decision(self, request, pip):
+        # Same combining as PolicyDecisionPoint.combined_policy_decision
+        policy_combining = self.pdp.config["policy_combining"]
+        policy_decisions = []
+        policy_obligations = []
+        try:
+            for position in self._candidates(request):
+                target, decide = self.compiled[position]
+                if target is None or target(request, pip):
+                    try:
+                        decision, obligations = decide(request, pip)
+                    except Exception as err:
+                        _log.error("Failed to get policy decision, err={}".format(err))
+                        raise
+                    if ((decision == "permit" and not obligations and policy_combining == "permit_overrides") or
+                      (decision == "deny" and policy_combining == "deny_overrides")):
+                        return (decision, [])
+                    policy_decisions.append(decision)
+                    policy_obligations += obligations
+            if "indeterminate" in policy_decisions:
+                return ("indeterminate", [])
+            if not all(x == "not_applicable" for x in policy_decisions):
+                if policy_combining == "deny_overrides" or policy_obligations:
+                    return ("permit", policy_obligations)
+                else:
+                    return ("deny", [])
+            else:
+                return ("not_applicable", [])
+        except Exception as err:
+            _log.error("Error, exc={}".format(err))
+            return ("indeterminate", [])
+
+    def _compile_policy(self, policy):
+        """Return (target function or None, decision function) for policy"""
+        if not isinstance(policy, dict):
+            pdp = self.pdp
+            def target(request, pip):
+                return "target" not in policy or pdp.target_matches(policy["target"], request, pip)
+            return (target, functools.partial(pdp.policy_decision, policy))
+        target = self._compile_target(policy["target"]) if "target" in policy else None
+        return (target, self._compile_rules(policy))
+
+    def _compile_target(self, target):
+        """Return function(request, pip) returning the same as PolicyDecisionPoint.target_matches for target"""
+        try:
+            checks = [self._compile_attribute(attribute_type, attribute, target[attribute_type][attribute])
+                      for attribute_type in target for attribute in target[attribute_type]]
+        except Exception:
+            return functools.partial(self.pdp.target_matches, target)
+
+        def matches(request, pip):
+            for check in checks:
+                if not check(request, pip):
+                    return False
+            return True
+        return matches
+
+    def _compile_attribute(self, attribute_type, attribute, policy_value):
+        if not isinstance(policy_value, list):
+            policy_value = [policy_value]
+        patterns = None
+        if all(isinstance(r, basestring) for r in policy_value):
+            try:
+                patterns = [re.compile(r+'$') for r in policy_value]
+            except re.error:
+                pass
+
+        def check(request, pip):
+            try:
+                request_value = request[attribute_type][attribute]
+            except KeyError:
+                try:
+                    # Try to fetch missing attribute from Policy Information Point (PIP).
+                    request_value = pip.get_attribute_value(attribute_type, attribute)
+                except Exception:
+                    return False
+            if not isinstance(request_value, list):
+                request_value = [request_value]
+            if patterns is None:
+                return _values_match(policy_value, request_value)
+            if not patterns:
+                return False
+            if all(isinstance(x, basestring) for x in request_value):
+                return any(p.match(x) for p in patterns for x in request_value)
+            return not set(request_value).isdisjoint(policy_value)
+        return check
+
+    def _compile_rules(self, policy):
+        """Return function(request, pip) returning the same as PolicyDecisionPoint.policy_decision for policy"""
+        rules = policy.get("rules")
+        if not isinstance(rules, list) or not all(isinstance(rule, dict) for rule in rules):
+            return functools.partial(self.pdp.policy_decision, policy)
+        compiled = [(self._compile_target(rule["target"]) if "target" in rule else None, self._compile_rule(rule))
+                    for rule in rules]
+        has_rule_combining = "rule_combining" in policy
+        rule_combining = policy.get("rule_combining")
+
+        def decide(request, pip):
+            rule_decisions = []
+            rule_obligations = []
+            for target, rule_decision in compiled:
+                if target is not None and not target(request, pip):
+                    continue
+                decision, obligations = rule_decision(request, pip)
+                if not has_rule_combining:
+                    _log.error("No rule_combining in policy")
+                    raise Exception("No rule_combining in policy")
+                if ((decision == "permit" and not obligations and rule_combining == "permit_overrides") or
+                  (decision == "deny" and rule_combining == "deny_overrides")):
+                    return (decision, [])
+                rule_decisions.append(decision)
+                if decision == "permit" and obligations:
+                    # Obligations are only accepted if the decision is "permit".
+                    rule_obligations += obligations
+            if "indeterminate" in rule_decisions:
+                return ("indeterminate", [])
+            if not all(x == "not_applicable" for x in rule_decisions):
+                if rule_combining == "deny_overrides" or rule_obligations:
+                    return ("permit", rule_obligations)
+                else:
+                    return ("deny", [])
+            else:
+                return ("not_applicable", [])
+        return decide
+
+    def _compile_rule(self, rule):
+        """Return function(request, pip) returning the same as PolicyDecisionPoint.rule_decision for rule"""
+        if "condition" not in rule:
+            if "id" not in rule or "effect" not in rule:
+                return functools.partial(self.pdp.rule_decision, rule)
+            result = (rule["effect"], rule.get("obligations", []))
+            return lambda request, pip: result
+        try:
+            condition = self._compile_condition(rule["condition"])
+        except Exception:
+            return functools.partial(self.pdp.rule_decision, rule)
+
+        def decide(request, pip):
+            try:
+                if condition(request, pip):
+                    return (rule["effect"], rule.get("obligations", []))
+                else:
+                    return ("not_applicable", [])
+            except Exception as err:
+                _log.exception("Rule decision exception, exc={}".format(err))
+                return ("indeterminate", [])
+        return decide
+
+    def _compile_condition(self, condition):
+        """Return function(request, pip) returning if condition is satisfied, raises exception if it can't be compiled"""
+        attributes = condition["attributes"]
+        if not isinstance(attributes, list):
+            raise TypeError("Condition attributes must be a list")
+        nested = []
+        for attribute in attributes:
+            if isinstance(attribute, dict):
+                nested.append(self._compile_function(attribute["function"], attribute["attributes"]))
+            else:
+                nested.append(None)
+        dynamic = set([index for index, function in enumerate(nested) if function])
+        function = self._compile_function(condition["function"], attributes, dynamic)
+
+        def satisfied(request, pip):
+            # Nested functions are evaluated first, like in PolicyDecisionPoint.rule_decision
+            args = [f(request, pip, ()) if f else attribute for f, attribute in zip(nested, attributes)]
+            return function(request, pip, args)
+        return satisfied
+
+    def _compile_function(self, func, args, dynamic=()):
+        """
+        Return function(request, pip, values) returning the same as PolicyDecisionPoint.evaluate_function
+        for func and args, where values holds the values of args at positions in dynamic.
+        Raises exception if func and args can't be compiled.
+        """
+        if not isinstance(args, list):
+            raise TypeError("Function attributes must be a list")
+        to_string = self.pdp._to_string
+        convert = func not in ["and", "or"]
+        steps = []
+        for index, arg in enumerate(args):
+            if index in dynamic:
+                steps.append((_DYNAMIC, index))
+            elif isinstance(arg, basestring) and arg.startswith("attr"):
+                path = arg.split(":")
+                steps.append((_ATTRIBUTE, (path[1], path[2])))
+            elif convert:
+                steps.append((_CONSTANT, [to_string(a) for a in arg] if isinstance(arg, list) else [to_string(arg)]))
+            else:
+                steps.append((_CONSTANT, arg))
+
+        def converted(value):
+            if not convert:
+                return value
+            if isinstance(value, list):
+                return [to_string(v) for v in value]
+            return [to_string(value)]
+
+        def values_of(request, pip, values):
+            """Return list of argument values, or None when an attribute is missing"""
+            result = []
+            for kind, data in steps:
+                if kind is _CONSTANT:
+                    result.append(data)
+                elif kind is _DYNAMIC:
+                    result.append(converted(values[data]))
+                else:
+                    try:
+                        value = request[data[0]][data[1]]
+                    except KeyError:
+                        try:
+                            # Try to fetch missing attribute from Policy Information Point (PIP).
+                            value = pip.get_attribute_value(data[0], data[1])
+                        except Exception:
+                            return None
+                    result.append(converted(value))
+            return result
+
+        if func in ["equal", "not_equal", "less_than_or_equal", "greater_than_or_equal"] and len(args) < 2:
+            raise IndexError("Function {} needs two attributes".format(func))
+        if func in ["equal", "not_equal"]:
+            if steps[1][0] is _CONSTANT:
+                patterns = [re.compile(r+'$') for r in steps[1][1]]
+                def matches(args):
+                    return any(p.match(x) for p in patterns for x in args[0])
+            else:
+                def matches(args):
+                    return any([re.match(r+'$', x) for r in args[1] for x in args[0]])
+            if func == "equal":
+                operation = matches
+            else:
+                operation = lambda args: not matches(args)
+        elif func == "and":
+            operation = all
+        elif func == "or":
+            operation = lambda args: True in args
+        elif func == "less_than_or_equal":
+            operation = lambda args: args[0] <= args[1]
+        elif func == "greater_than_or_equal":
+            operation = lambda args: args[0] >= args[1]
+        else:
+            operation = lambda args: None
+
+        def evaluate(request, pip, values):
+            args = values_of(request, pip, values)
+            if args is None:
+                return False
+            return operation(args)
+        return evaluate
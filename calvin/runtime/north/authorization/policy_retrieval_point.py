@@ -16,8 +16,10 @@
 
 from abc import ABCMeta, abstractmethod
 import os
+import errno
 import glob
 import json
+import time
 from calvin.utilities import calvinuuid
 from calvin.utilities.calvinlogger import get_logger
 
@@ -54,10 +56,23 @@ class PolicyRetrievalPoint(object):
 
 
 class FilePolicyRetrievalPoint(PolicyRetrievalPoint):
+    """
+    Policies stored as JSON files in a directory. Parsed policies are kept and only
+    read again when the mtime or size of their file changed, the same policy objects
+    are returned until then and must not be modified.
 
-    def __init__(self, path):
+    The directory is checked for changed files at most every check_interval seconds,
+    changes made through this class are seen immediately.
+    """
+
+    def __init__(self, path, check_interval=1.0):
         # Replace ~ by the user's home directory.
         self.path = os.path.expanduser(path)
+        self.check_interval = check_interval
+        # key: file path, value: (mtime, size, policy)
+        self._policies = {}
+        # key: name pattern, value: (time of check, policies)
+        self._found = {}
         if not os.path.exists(self.path):
             try:
                 os.makedirs(self.path)
@@ -65,35 +80,51 @@ class FilePolicyRetrievalPoint(PolicyRetrievalPoint):
                 if exc.errno != errno.EEXIST:
                     raise
 
+    def _load(self, filename):
+        """Return the policy in filename, parsed again only when the file changed"""
+        st = os.stat(filename)
+        entry = self._policies.get(filename)
+        if entry and entry[0] == st.st_mtime and entry[1] == st.st_size:
+            return entry[2]
+        with open(filename, 'rb') as data:
+            policy = json.load(data)
+        self._policies[filename] = (st.st_mtime, st.st_size, policy)
+        return policy
+
     def get_policy(self, policy_id):
         """Return the policy identified by policy_id"""
         try:
-            with open(os.path.join(self.path, policy_id + ".json"), 'rt') as data:
-                return json.load(data)
+            return self._load(os.path.join(self.path, policy_id + ".json"))
         except Exception as err:
             _log.error("Failed to open policy file for policy_id={}".format(policy_id))
             raise
 
     def get_policies(self, name_pattern='*'):
         """Return all policies found using the name_pattern"""
+        found = self._found.get(name_pattern)
+        if found and time.time() - found[0] < self.check_interval:
+            return dict(found[1])
         policies = {}
         for filename in glob.glob(os.path.join(self.path, name_pattern + ".json")): 
             try:
-                with open(filename, 'rb') as data:
-                    policy_id = os.path.splitext(os.path.basename(filename))[0]
-                    policies[policy_id] = json.load(data)
+                policy_id = os.path.splitext(os.path.basename(filename))[0]
+                policies[policy_id] = self._load(filename)
             except ValueError as err:
                 _log.error("Failed to parse policy as json, file={}".format(filename))
                 raise
             except (OSError, IOError) as err:
                 _log.error("Failed to open file={}".format(filename))
                 raise
-        return policies
+        self._found[name_pattern] = (time.time(), policies)
+        return dict(policies)
 
     def create_policy(self, data):
         """Create policy based on the JSON representation in data"""
         policy_id = calvinuuid.uuid("POLICY")
-        with open(os.path.join(self.path, policy_id + ".json"), "w") as file:
+        file_path = os.path.join(self.path, policy_id + ".json")
+        self._policies.pop(file_path, None)
+        self._found.clear()
+        with open(file_path, "w") as file:
             json.dump(data, file)
         return policy_id
 
@@ -101,6 +132,9 @@ class FilePolicyRetrievalPoint(PolicyRetrievalPoint):
         """Change the content of the policy identified by policy_id to data (JSON representation of policy)"""
         file_path = os.path.join(self.path, policy_id + ".json")
         if os.path.isfile(file_path):
+            # The file could be written again within the mtime resolution and with the same size
+            self._policies.pop(file_path, None)
+            self._found.clear()
             with open(file_path, "w") as file:
                 json.dump(data, file)
         else:
@@ -108,4 +142,7 @@ class FilePolicyRetrievalPoint(PolicyRetrievalPoint):
 
     def delete_policy(self, policy_id):
         """Delete the policy named policy_id"""
-        os.remove(os.path.join(self.path, policy_id + ".json"))
+        file_path = os.path.join(self.path, policy_id + ".json")
+        self._policies.pop(file_path, None)
+        self._found.clear()
+        os.remove(file_path)
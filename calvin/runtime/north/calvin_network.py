@@ -31,6 +31,8 @@ _conf = calvinconfig.get()
 # FIXME should be read from calvin config
 TRANSPORT_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), *['south', 'plugins', 'transports'])
 TRANSPORT_PLUGIN_NS = "calvin.runtime.south.plugins.transports"
+# Max number of messages coalesced in one BATCH message
+MAX_BATCH_MSGS = 100
 
 
 class CalvinBaseLink(object):
@@ -78,6 +80,11 @@ class CalvinLink(CalvinBaseLink):
         self.replies_timeout = old_link.replies_timeout if old_link else {}
         self.peer_is_sleeping = False
         self.buffered_msgs = []
+        # Messages sent during one reactor tick are coalesced into one BATCH message,
+        # when enabled and the peer runtime can unpack them
+        self.batching = bool(_conf.get(None, 'link_batching')) and transport.supports_batch()
+        self.batch = []
+        self.batch_flush = None
         if old_link:
             # close old link after a period, since might still receive messages on the transport layer
             # TODO chose the delay based on RTT instead of arbitrary 3 seconds
@@ -146,7 +153,14 @@ class CalvinLink(CalvinBaseLink):
         """
         msg['from_rt_uuid'] = self.rt_id
         msg['to_rt_uuid'] = self.peer_id if dest_peer_id is None else dest_peer_id
-        if not self.peer_is_sleeping:
+        if not self.peer_is_sleeping and self.batching:
+            _log.analyze(self.rt_id, "SEND_BATCHED", msg)
+            self.batch.append(msg)
+            if len(self.batch) >= MAX_BATCH_MSGS:
+                self.flush_batch()
+            elif self.batch_flush is None:
+                self.batch_flush = async.DelayedCall(0, self.flush_batch)
+        elif not self.peer_is_sleeping:
             _log.analyze(self.rt_id, "SEND", msg)
             self.transport.send(msg)
         else:
@@ -157,8 +171,20 @@ class CalvinLink(CalvinBaseLink):
         """ Disconnect the transport and hence the link object won't work anymore """
         _log.analyze(self.rt_id, "+ LINK", {})
         if dest_peer_id is None:
+            self.flush_batch()
             self.transport.disconnect()
 
+    def flush_batch(self):
+        """ Send the coalesced messages, a single message is sent as is """
+        if self.batch_flush is not None:
+            self.batch_flush.cancel()
+            self.batch_flush = None
+        msgs, self.batch = self.batch, []
+        if len(msgs) == 1:
+            self.transport.send(msgs[0])
+        elif msgs:
+            self.transport.send({'cmd': 'BATCH', 'msgs': msgs})
+
     def flush_buffered_msgs(self):
         for msg in self.buffered_msgs:
             self.send(msg)
@@ -418,6 +444,9 @@ class CalvinNetwork(object):
             _log.analyze(self.node.id, "+ INSERT", {'uri': uri, 'peer_id': peer_id}, peer_node_id=peer_id, tb=True)
             self._links[peer_id] = CalvinLink(self.node.id, peer_id, tp_link)
 
+        # Possible placements change when runtimes join
+        self.node.req_match_cache.invalidate()
+
         # Find and call any callbacks registered for the uri or peer id
         _log.debug("join _finished: %s: peer_id: %s, uri: %s\npending_joins_by_id: %s\npending_joins: %s" % (self.node.id, peer_id,
                                                                                          uri,
@@ -657,6 +686,8 @@ class CalvinNetwork(object):
                 self._links.pop(peer_id)
             else:
                 self._links.pop(peer_id)
+            # Possible placements change when runtimes leave
+            self.node.req_match_cache.invalidate()
         except KeyError:
             _log.error("Tried to remove non existing link to peer_id %s", peer_id)
 
@@ -44,6 +44,7 @@ from calvin.runtime.south.plugins.async import async
 from calvin.utilities.attribute_resolver import AttributeResolver
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.security import security_modules_check
+from calvin.utilities.requirement_matching import ReqMatchCache
 from calvin.utilities.runtime_credentials import RuntimeCredentials
 from calvin.utilities import calvinuuid
 from calvin.utilities import certificate
@@ -116,7 +117,7 @@ class Node(object):
         self.rm = replicationmanager.ReplicationManager(self)
         self.control = calvincontrol.get_calvincontrol()
 
-        _scheduler = scheduler.DebugScheduler if _log.getEffectiveLevel() <= logging.DEBUG else scheduler.Scheduler
+        _scheduler = scheduler.scheduler_class(debug=_log.getEffectiveLevel() <= logging.DEBUG)
         self.sched = _scheduler(self, self.am, self.monitor)
         self.async_msg_ids = {}
         self._calvinsys = CalvinSys(self)
@@ -128,6 +129,7 @@ class Node(object):
         # Default will multicast and listen on all interfaces
         # TODO: be able to specify the interfaces
         # @TODO: Store capabilities
+        self.req_match_cache = ReqMatchCache(_conf.get(None, 'reqmatch_cache_ttl'))
         self.storage = storage.Storage(self)
 
         self.network = CalvinNetwork(self)
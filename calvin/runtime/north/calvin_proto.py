@@ -188,6 +188,7 @@ class CalvinProto(CalvinCBClass):
             'PROXY_CONFIG': [CalvinCB(self.proxy_config_handler)],
             'SLEEP_REQUEST': [CalvinCB(self.proxy_sleep_request_handler)],
             'ACTOR_NEW': [CalvinCB(self.actor_new_handler)],
+            'ACTOR_NEW_BATCH': [CalvinCB(self.actor_new_batch_handler)],
             'ACTOR_MIGRATE': [CalvinCB(self.actor_migrate_handler)],
             'APP_DESTROY': [CalvinCB(self.app_destroy_handler)],
             'PORT_CONNECT': [CalvinCB(self.port_connect_handler)],
@@ -237,6 +238,7 @@ class CalvinProto(CalvinCBClass):
         resp = {
             'PROXY_CONFIG': response.INTERNAL_ERROR,
             'ACTOR_NEW': response.INTERNAL_ERROR,
+            'ACTOR_NEW_BATCH': response.INTERNAL_ERROR,
             'ACTOR_MIGRATE': response.NOT_FOUND,
             'APP_DESTROY': response.NOT_FOUND,
             'PORT_CONNECT': response.NOT_FOUND,
@@ -323,6 +325,26 @@ class CalvinProto(CalvinCBClass):
                                         callback=CalvinCB(self.node.network.link_request, payload['from_rt_uuid'], callback=CalvinCB(send_message,
                                             msg = {'cmd': 'REPLY', 'msg_uuid': payload['msg_uuid']})))
 
+    def actor_new_batch(self, to_rt_uuid, callback, actors):
+        """ Creates new actors on to_rt_uuid node, but is only intended for migrating a group of actors
+            callback: called when finished with the peers respons as argument
+            actors: list of dicts with actor_type, state and ports (prev_connections), see actor manager
+        """
+        self.node.network.link_request(to_rt_uuid, CalvinCB(send_message,
+                                                            msg = {'cmd': 'ACTOR_NEW_BATCH',
+                                                                   'state': [{'actor_type': a['actor_type'],
+                                                                              'actor_state': a['state'],
+                                                                              'prev_connections': a['ports']}
+                                                                             for a in actors]},
+                                                            callback=callback))
+
+    def actor_new_batch_handler(self, payload):
+        """ Peer request new actors with states and connections """
+        _log.analyze(self.rt_id, "+", payload, tb=True)
+        self.node.am.new_batch_from_migration(payload['state'],
+                                              callback=CalvinCB(self.node.network.link_request, payload['from_rt_uuid'], callback=CalvinCB(send_message,
+                                                  msg = {'cmd': 'REPLY', 'msg_uuid': payload['msg_uuid']})))
+
     def actor_migrate(self, to_rt_uuid, callback, actor_id, requirements, extend=False, move=False):
         """ Request actor on to_rt_uuid node to migrate accoring to new deployment requirements
             callback: called when finished with the status respons as argument
@@ -18,6 +18,9 @@ class Token(object):
 
     """ Token class """
 
+    # Tokens are immutable and numerous, keep them small
+    __slots__ = ('_value', '_origin', '_timestamp', '_port_tag')
+
     def __init__(self, value=None, origin=None, timestamp=None, port_tag=None):
         self._value = value
         self._origin = origin
@@ -62,11 +65,7 @@ class Token(object):
     def decode(cls, data, coder=None):
         representaton = coder.decode(data) if coder else data
         token_type = representaton.pop('type', ExceptionToken)
-        class_ = {
-            'Token':Token,
-            'ExceptionToken':ExceptionToken,
-            'EOSToken': EOSToken
-        }.get(token_type, ExceptionToken)
+        class_ = _TOKEN_CLASSES.get(token_type, ExceptionToken)
         return class_(**representaton)
 
     def __str__(self):
@@ -80,6 +79,8 @@ class ExceptionToken(Token):
 
     """ Base class for exception tokens """
 
+    __slots__ = ()
+
     def __init__(self, value="Exception", origin=None, timestamp=None, port_tag=None):
         super(ExceptionToken, self).__init__(value, origin, timestamp, port_tag)
 
@@ -87,10 +88,18 @@ class EOSToken(ExceptionToken):
 
     """ End of stream token """
 
+    __slots__ = ()
+
     def __init__(self, value="End of stream", origin=None, timestamp=None, port_tag=None):
         super(EOSToken, self).__init__(value, origin, timestamp, port_tag)
 
 
+_TOKEN_CLASSES = {
+    'Token': Token,
+    'ExceptionToken': ExceptionToken,
+    'EOSToken': EOSToken
+}
+
 if __name__ == '__main__':
 
     class Coder(object):
@@ -35,6 +35,7 @@ from control_apis import application_api
 from control_apis import documentation_api
 from control_apis import logging_api
 from control_apis import metering_api
+from control_apis import profiling_api
 from control_apis import registry_api
 from control_apis import uicalvinsys_api
 
@@ -129,6 +129,34 @@ def handle_actor_report(self, handle, connection, match, data, hdr):
     self.send_response(handle, connection, None if report is None else json.dumps(report, default=repr), status=status)
 
 
+@handler(r"GET /actor/(ACTOR_" + uuid_re + "|" + uuid_re + ")/cost\sHTTP/1")
+@authentication_decorator
+def handle_get_actor_cost(self, handle, connection, match, data, hdr):
+    """
+    GET /actor/{actor-id}/cost
+    Get the firing cost of an actor as tracked by the runtime, averages are exponential moving averages
+    Response status code: OK or NOT_FOUND
+    Response:
+    {
+        "fire_count": <number of times actor fired any action>,
+        "action_count": <number of actions fired>,
+        "token_count": <number of tokens consumed>,
+        "avg_fire_time": <seconds spent per firing>,
+        "avg_action_time": <seconds spent per action>,
+        "avg_tokens": <tokens consumed per action>,
+        "avg_actions": <actions fired per firing>,
+        "time_slice": <seconds the actor is allowed to fire next time, 0.0 means a single action>
+    }
+    """
+    try:
+        cost = self.node.am.get_cost(match.group(1))
+        status = calvinresponse.OK
+    except:
+        cost = None
+        status = calvinresponse.NOT_FOUND
+    self.send_response(handle, connection, None if cost is None else json.dumps(cost), status=status)
+
+
 @handler(r"POST /actor/(ACTOR_" + uuid_re + "|" + uuid_re + ")/migrate\sHTTP/1")
 @authentication_decorator
 def handle_actor_migrate(self, handle, connection, match, data, hdr):
@@ -113,6 +113,39 @@ def handle_get_aggregated_meter(self, handle, connection, match, data, hdr):
     self.send_response(handle, connection,
         json.dumps(data) if status == calvinresponse.OK else None, status=status)
 
+@handler(r"GET /meter/(METERING_" + uuid_re + "|" + uuid_re + ")/rates\sHTTP/1")
+@authentication_decorator
+def handle_get_rates_meter(self, handle, connection, match, data, hdr):
+    """
+    GET /meter/{user-id}/rates
+    Get firing rates of actions over the last minute, from per-second counts
+    Response status code: OK or NOT_FOUND
+    Response:
+    {
+        <actor-id>:
+        {
+            <action-name>:
+            {
+                'mean': <firings per second>,
+                'p50': <firings per second>,
+                'p90': <firings per second>,
+                'p99': <firings per second>,
+                'max': <firings per second>
+            },
+            ...
+        },
+        ...
+    }
+    """
+    try:
+        data = self.metering.get_rates(match.group(1))
+        status = calvinresponse.OK
+    except:
+        _log.exception("handle_get_rates_meter")
+        status = calvinresponse.NOT_FOUND
+    self.send_response(handle, connection,
+        json.dumps(data) if status == calvinresponse.OK else None, status=status)
+
 @handler(r"GET /meter/(METERING_" + uuid_re + "|" + uuid_re + ")/metainfo\sHTTP/1")
 @authentication_decorator
 def handle_get_metainfo_meter(self, handle, connection, match, data, hdr):
@@ -0,0 +1,75 @@
+import json
+from calvin.requests import calvinresponse
+from calvin.utilities.calvinlogger import get_logger
+from calvin.runtime.north.profiler import get_profiler
+from routes import handler, register
+from authentication import authentication_decorator
+
+_log = get_logger(__name__)
+
+@handler(r"POST /profiling\sHTTP/1")
+@authentication_decorator
+def handle_post_profiling(self, handle, connection, match, data, hdr):
+    """
+    POST /profiling
+    Enable or disable profiling of the runtime, statistics are cleared when enabled
+    Body:
+    {
+        "enabled": <true or false>
+    }
+    Response status code: OK or BAD_REQUEST
+    Response:
+    {
+        "enabled": <true or false>
+    }
+    """
+    profiler = get_profiler()
+    try:
+        if data['enabled']:
+            profiler.enable()
+        else:
+            profiler.disable()
+        status = calvinresponse.OK
+    except:
+        _log.exception("handle_post_profiling")
+        status = calvinresponse.BAD_REQUEST
+    self.send_response(handle, connection,
+        json.dumps({'enabled': profiler.enabled}) if status == calvinresponse.OK else None, status=status)
+
+@handler(r"GET /profiling\sHTTP/1")
+@authentication_decorator
+def handle_get_profiling(self, handle, connection, match, data, hdr):
+    """
+    GET /profiling
+    Get profiling information collected since profiling was enabled
+    Response status code: OK
+    Response:
+    {
+        "enabled": <true or false>,
+        "duration": <seconds since profiling was enabled>,
+        "scheduler": {"iterations": <n>, "loop_time": <s>, "avg_iteration": <s>, "max_iteration": <s>,
+                      "idle_ratio": <fraction of time not spent in the scheduler loop>},
+        "actors": {<actor-id>: {"name": <name>,
+                                "actions": {<action>: {"count": <n>, "total": <s>, "p50": <s>, "p99": <s>}, ...}}, ...},
+        "tunnels": {<port-id>: {"sent": <n>, "received": <n>, "sent_rate": <tokens/s>, "received_rate": <tokens/s>}, ...},
+        "ports": {<port-id>: {"actor_id": <actor-id>, "name": <name>, "direction": <"in" or "out">,
+                              "fill": <tokens in queue>, "length": <queue length>}, ...},
+        "storage_cache": {"size": <n>, "max_size": <n>, "hits": <n>, "misses": <n>}
+    }
+    """
+    data = get_profiler().snapshot(self.node.am.actors.values())
+    data['storage_cache'] = self.node.storage.cache.info()
+    self.send_response(handle, connection, json.dumps(data))
+
+@handler(r"GET /profiling/flamegraph\sHTTP/1")
+@authentication_decorator
+def handle_get_profiling_flamegraph(self, handle, connection, match, data, hdr):
+    """
+    GET /profiling/flamegraph
+    Get action firing time as collapsed stacks, one "<runtime-id>;<actor>;<action> <microseconds>" per line,
+    suitable as input to flame graph tools
+    Response status code: OK
+    Response: text
+    """
+    data = get_profiler().collapsed_stacks(self.node.id)
+    self.send_response(handle, connection, data, content_type="Content-Type: text/plain")
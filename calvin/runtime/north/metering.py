@@ -15,6 +15,7 @@
 # limitations under the License.
 
 import time
+from array import array
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinuuid
 from calvin.utilities import calvinconfig
@@ -39,6 +40,93 @@ def set_metering(metering):
         _metering = metering
     return _metering
 
+class ActorLog(object):
+    """
+    Bounded log of one actor's action firings.
+    Firings are kept in a ring buffer of timestamps and action indices, a firing's
+    sequence number (count at the time) is used as cursor by readers.
+    Firing counts are also kept per second and action for the last HISTOGRAM_SECONDS.
+    The buffers are allocated at the first logged firing and released by clear.
+    """
+
+    HISTOGRAM_SECONDS = 60
+
+    def __init__(self, actions, size):
+        super(ActorLog, self).__init__()
+        self.actions = list(actions)
+        self.action_index = {name: i for i, name in enumerate(self.actions)}
+        self.size = size
+        self.times = None
+        self.indices = None
+        self.seconds = None
+        self.histogram = None
+        # Total number of logged firings
+        self.count = 0
+
+    def _allocate(self):
+        self.times = array('d', [0.0]) * self.size
+        self.indices = array('H', [0]) * self.size
+        self.seconds = [0] * self.HISTOGRAM_SECONDS
+        self.histogram = [[0] * len(self.actions) for _ in range(self.HISTOGRAM_SECONDS)]
+
+    def log(self, t, action_name):
+        if self.times is None:
+            self._allocate()
+        index = self.action_index[action_name]
+        pos = self.count % self.size
+        self.times[pos] = t
+        self.indices[pos] = index
+        self.count += 1
+        second = int(t)
+        slot = second % self.HISTOGRAM_SECONDS
+        if self.seconds[slot] != second:
+            self.seconds[slot] = second
+            self.histogram[slot] = [0] * len(self.actions)
+        self.histogram[slot][index] += 1
+
+    def since(self, cursor, t):
+        """Firings after cursor (a previous count) and time t as [time, action name]"""
+        start = max(cursor, self.count - self.size)
+        entries = []
+        for n in xrange(start, self.count):
+            pos = n % self.size
+            if self.times[pos] > t:
+                entries.append([self.times[pos], self.actions[self.indices[pos]]])
+        return entries
+
+    def clear(self):
+        self.count = 0
+        self.times = None
+        self.indices = None
+        self.seconds = None
+        self.histogram = None
+
+    def rates(self, current):
+        """
+        Firing rates per action from the completed seconds in the histogram:
+        mean, max and 50th/90th/99th percentiles of firings per second.
+        """
+        now = int(current)
+        seconds = xrange(now - self.HISTOGRAM_SECONDS + 1, now)
+        if self.histogram is None:
+            counts = [None for s in seconds]
+        else:
+            counts = [self.histogram[s % self.HISTOGRAM_SECONDS] if self.seconds[s % self.HISTOGRAM_SECONDS] == s
+                      else None for s in seconds]
+        rates = {}
+        for index, name in enumerate(self.actions):
+            per_second = sorted(c[index] if c else 0 for c in counts)
+            n = len(per_second)
+            rates[name] = {
+                'mean': float(sum(per_second)) / n,
+                'p50': per_second[n // 2],
+                'p90': per_second[min(n - 1, n * 9 // 10)],
+                'p99': per_second[min(n - 1, n * 99 // 100)],
+                'max': per_second[-1]
+            }
+        return rates
+
+
 class Metering(object):
     """Metering logs all actor activity"""
     def __init__(self, node):
@@ -46,13 +134,15 @@ class Metering(object):
         self.node = node
         self.timeout = _conf.get(None, 'metering_timeout')
         self.aggregated_timeout = _conf.get(None, 'metering_aggregated_timeout')
+        self.log_size = _conf.get(None, 'metering_log_size') or 4096
         self.actors_log = {}
         self.actors_meta = {}
         self.actors_destroyed = {}
         self.active = False
         # Keep track of user's last access time, should inactive users be deleted? When?
         self.users = {}
-        self.oldest = time.time()
+        # Per user the count of each actor log at last access
+        self.cursors = {}
         self.last_forget = time.time()
         self.next_forget_aggregated = time.time()
         self.actors_aggregated = {}
@@ -69,11 +159,8 @@ class Metering(object):
             if self.next_forget_aggregated <= t:
                 self.forget_aggregated(t)
         if self.active and self.timeout > 0.0:
-            # Timed metering
-            self.actors_log[actor_id].append((t, action_name))
-            # Remove old data at most once per second
-            if self.oldest < t - self.timeout and self.last_forget < t - 1.0:
-                self.forget(t)
+            # Timed metering, old data is overwritten by the ring buffer or filtered out when read
+            self.actors_log[actor_id].log(t, action_name)
 
     def register(self, user_id=None):
         if not user_id:
@@ -81,12 +168,15 @@ class Metering(object):
         if user_id in self.users:
             raise Exception("User id already in use")
         self.users[user_id] = time.time()
+        # Only firings after registration
+        self.cursors[user_id] = {actor_id: log.count for actor_id, log in self.actors_log.iteritems()}
         self.active = True
         return user_id
 
     def unregister(self, user_id):
         if user_id in self.users:
             self.users.pop(user_id)
+            self.cursors.pop(user_id)
             self.active = bool(self.users)
             self.forget(time.time())
         else:
@@ -97,10 +187,13 @@ class Metering(object):
             _log.debug("get_timed_meter: User id not found")
             raise Exception("User id not found")
         t = time.time()
-        response = {actor_id: [d for d in data if d[0] > self.users[user_id]] 
-                                for actor_id, data in self.actors_log.iteritems()}
+        cursors = self.cursors[user_id]
+        response = {}
+        for actor_id, log in self.actors_log.iteritems():
+            # The cursor skips what the user has seen, data older than timeout is also skipped
+            response[actor_id] = log.since(cursors.get(actor_id, 0), t - self.timeout)
+            cursors[actor_id] = log.count
         self.users[user_id] = t
-        self.forget(t)
         return response
 
     def get_aggregated_meter(self, user_id):
@@ -110,18 +203,19 @@ class Metering(object):
         response = {'activity': self.actors_aggregated, 'time': self.actors_aggregated_time}
         return response
 
+    def get_rates(self, user_id):
+        if user_id not in self.users:
+            _log.debug("get_rates: User id not found")
+            raise Exception("User id not found")
+        t = time.time()
+        return {actor_id: log.rates(t) for actor_id, log in self.actors_log.iteritems()}
+
     def forget(self, current):
         self.last_forget = current
         if not self.active:
-            self.actors_log = {}
-            self.oldest = current
-            return
-        t = min(self.users.values())
-        if t < current - self.timeout:
-            t = current - self.timeout
-        self.oldest = t
-        for actor_id, data in self.actors_log.iteritems():
-            self.actors_log[actor_id] = [d for d in data if d[0] > t]
+            # Nobody reads the logs, start over when someone registers
+            for log in self.actors_log.itervalues():
+                log.clear()
 
     def forget_aggregated(self, current):
         # Remove meta info that we don't have any action data for anyway.
@@ -130,6 +224,7 @@ class Metering(object):
         for actor_id, dt in self.actors_destroyed.iteritems():
             if dt < et:
                 self.actors_meta.pop(actor_id)
+                self.actors_log.pop(actor_id, None)
                 try:
                     self.actors_aggregated_time.pop(actor_id)
                     self.actors_aggregated.pop(actor_id)
@@ -147,12 +242,13 @@ class Metering(object):
         # Remove note on actor destroyed for an actor that migrates back
         if actor.id in self.actors_destroyed:
             self.actors_destroyed.pop(actor.id)
-        # Make sure the log exist but don't overwrite old data for an actor that migrates back
-        self.actors_log.setdefault(actor.id, [])
         for action_method in actor.__class__.action_priority:
             self.actors_meta[actor.id][action_method.__name__] = {
                     'inports': {p[0]: p[1] for p in action_method.action_input},
                     'outports': {p[0]: p[1] for p in action_method.action_output}}
+        # Make sure the log exist but don't overwrite old data for an actor that migrates back
+        if actor.id not in self.actors_log:
+            self.actors_log[actor.id] = ActorLog([a.__name__ for a in actor.__class__.action_priority], self.log_size)
         _log.analyze(self.node.id, "+", {'actor_id': actor.id, 'metainfo': self.actors_meta[actor.id]})
 
     def remove_actor_info(self, actor_id):
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def node_cost(cpu_avail=None, mem_avail=None, rtt=None):
+    """
+    Cost of placing an actor on a node, 0.0 - PlacementEngine.MAX_COST.
+    cpu_avail and mem_avail are the node's resource attributes (0 - 100 percent available),
+    rtt is the round trip time in seconds of the link to the node (0 for this node).
+    Unknown values do not add to the cost.
+    """
+    avail = [float(a) for a in (cpu_avail, mem_avail) if a is not None]
+    load = 1.0 - sum(avail) / (100.0 * len(avail)) if avail else 0.0
+    delay = min(rtt / PlacementEngine.RTT_SCALE, 1.0) if rtt else 0.0
+    return PlacementEngine.LOAD_WEIGHT * max(load, 0.0) + PlacementEngine.RTT_WEIGHT * delay
+
+
+class PlacementEngine(object):
+    """
+    Orders the possible nodes for each actor of an application.
+
+    An actor's score on a node is its own weight 1, plus the weight of each connection
+    to a peer actor that can also be placed on the node, minus the cost of the node.
+    Connections are kept as a sparse adjacency, scoring uses NumPy when available.
+    """
+
+    # Weight of a connection between two actors
+    CONNECTED_WEIGHT = 0.5
+    # Weights of node load and link delay in the node cost, together below CONNECTED_WEIGHT
+    # so that costs only decide between nodes with equal connectivity
+    LOAD_WEIGHT = 0.2
+    RTT_WEIGHT = 0.2
+    MAX_COST = LOAD_WEIGHT + RTT_WEIGHT
+    # Round trip time in seconds considered maximal delay
+    RTT_SCALE = 0.1
+
+    def __init__(self, actor_ids, node_ids):
+        super(PlacementEngine, self).__init__()
+        self.actor_ids = list(actor_ids)
+        # Descending node id order, ties in score are broken in this order
+        self.node_ids = sorted(set(node_ids), reverse=True)
+        self._actor_index = {actor_id: i for i, actor_id in enumerate(self.actor_ids)}
+        self._node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        # actor index -> {peer actor index: weight}
+        self.edges = {}
+        # actor index -> set of node indexes
+        self.possible = {}
+        self.costs = [0.0] * len(self.node_ids)
+        # Actor by node matrix, True when the actor can be placed on the node
+        self._possible = None if numpy is None else numpy.zeros((len(self.actor_ids), len(self.node_ids)), dtype=bool)
+
+    def connect(self, actor_id, peer_actor_id, weight=CONNECTED_WEIGHT):
+        """Connect two actors of the application, connections to other actors are ignored"""
+        i = self._actor_index.get(actor_id)
+        j = self._actor_index.get(peer_actor_id)
+        if i is None or j is None or i == j:
+            return
+        self.edges.setdefault(i, {})[j] = weight
+        self.edges.setdefault(j, {})[i] = weight
+
+    def set_possible(self, actor_id, node_ids):
+        i = self._actor_index[actor_id]
+        self.possible[i] = set(self._node_index[n] for n in node_ids if n in self._node_index)
+        if self._possible is not None:
+            self._possible[i] = False
+            self._possible[i, list(self.possible[i])] = True
+
+    def set_cost(self, node_id, cost):
+        if node_id in self._node_index:
+            self.costs[self._node_index[node_id]] = cost
+
+    def placement(self):
+        """Return dict of actor id to list of its possible node ids, best first"""
+        if numpy is None:
+            return self._placement_python()
+        return self._placement_numpy()
+
+    def _placement_python(self):
+        placement = {}
+        for i, actor_id in enumerate(self.actor_ids):
+            possible = self.possible.get(i, set())
+            scores = {n: 1.0 - self.costs[n] for n in possible}
+            for j, weight in self.edges.get(i, {}).iteritems():
+                peer_possible = self.possible.get(j, set())
+                shared = possible if len(possible) < len(peer_possible) else peer_possible
+                for n in shared:
+                    if n in scores and n in peer_possible:
+                        scores[n] += weight
+            ordered = sorted(scores, key=lambda n: (-scores[n], n))
+            placement[actor_id] = [self.node_ids[n] for n in ordered]
+        return placement
+
+    def _placement_numpy(self):
+        possible = self._possible
+        scores = possible - numpy.array(self.costs)[numpy.newaxis, :]
+        if self.edges:
+            # Sum of connection weights to peers possible on each node, the sparse product A * P
+            # with the adjacency A as rows of (peer, weight) grouped by actor
+            rows = numpy.array(self.edges.keys())
+            lengths = numpy.array([len(peers) for peers in self.edges.itervalues()])
+            cols = numpy.array([j for peers in self.edges.itervalues() for j in peers])
+            weights = numpy.array([w for peers in self.edges.itervalues() for w in peers.itervalues()])
+            starts = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+            scores[rows] += numpy.add.reduceat(weights[:, numpy.newaxis] * possible[cols], starts, axis=0)
+        scores[~possible] = -numpy.inf
+        # Stable sort keeps descending node id order for equal scores
+        order = numpy.argsort(-scores, axis=1, kind='mergesort')
+        counts = possible.sum(axis=1)
+        node_ids = numpy.array(self.node_ids, dtype=object)
+        return {actor_id: node_ids[order[i, :counts[i]]].tolist() for i, actor_id in enumerate(self.actor_ids)}
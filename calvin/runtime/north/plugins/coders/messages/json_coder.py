@@ -15,11 +15,14 @@
 # limitations under the License.
 
 import json
+import json.encoder
 from message_coder import MessageCoderBase
 
 # set of functions to encode/decode data tokens to/from a json description
 class MessageCoder(MessageCoderBase):
 
+    native = json.encoder.c_make_encoder is not None
+
     def encode(self, data):
         return json.dumps(data)
 
@@ -26,9 +26,19 @@ class MessageCoderBase(object):
 
     """
 
+    # True when the coder is implemented in native code, such coders are preferred
+    native = False
+
     def __init__(self, *args, **kwargs):
         pass
 
+    @classmethod
+    def available(cls):
+        """
+            Returns True when the modules needed by the coder could be imported.
+        """
+        return True
+
     def encode(self, data):
         """
             Encodes data to be sent from a serializable representation.
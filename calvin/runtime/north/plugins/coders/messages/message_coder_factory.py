@@ -18,14 +18,53 @@
 import json_coder
 import msgpack_coder
 
+# Coder name -> coder class, several implementations can be registered for a name (they must be
+# compatible on the wire), the first available one is used.
+_registry = {}
+_names = []
+
+
+def register(name, coder_class):
+    """
+        Register a message coder class under name, ignored if the class is not available.
+    """
+    if not coder_class.available() or name in _registry:
+        return
+    _registry[name] = coder_class
+    _names.append(name)
+
+
+register('msgpack', msgpack_coder.NativeMessageCoder)
+register('json', json_coder.MessageCoder)
+register('msgpack', msgpack_coder.MessageCoder)
+
+
 def get_prio_list():
-    return ['json', 'msgpack']
+    """
+        Names of the registered coders, native coders first and otherwise in registration order.
+    """
+    return [n for n in _names if _registry[n].native] + [n for n in _names if not _registry[n].native]
 
-def get(type_):
-    if type_ == "json":
-        return json_coder.MessageCoder()
+def get_capabilities():
+    """
+        Capabilities of the registered coders, advertised to other runtimes.
+    """
+    return {n: {'native': _registry[n].native} for n in _names}
 
-    if type_ == "msgpack":
-        return msgpack_coder.MessageCoder()
+def select(serializers, capabilities=None, prio_list=None):
+    """
+        Select the coder to use with another runtime that supports serializers (with capabilities
+        when advertised). Prefers coders that are native on both sides, then our priority order.
+        Returns None when there is no common coder.
+    """
+    common = [n for n in (prio_list or get_prio_list()) if n in serializers]
+    if capabilities:
+        for name in common:
+            if _registry[name].native and capabilities.get(name, {}).get('native', False):
+                return name
+    return common[0] if common else None
 
-    raise Exception("Coder {} requested is not supported".format(type_))
+def get(type_):
+    if type_ not in _registry:
+        raise Exception("Coder {} requested is not supported".format(type_))
+    return _registry[type_]()
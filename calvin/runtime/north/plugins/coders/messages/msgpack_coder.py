@@ -17,9 +17,19 @@
 import umsgpack
 from message_coder import MessageCoderBase
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 umsgpack.compatibility = True
 
-# set of functions to encode/decode data tokens to/from a json description
+if msgpack is not None and msgpack.version >= (1, 0, 0):
+    _unpack_options = {'raw': True, 'strict_map_key': False}
+else:
+    _unpack_options = {'raw': True}
+
+
 class MessageCoder(MessageCoderBase):
 
     def encode(self, data):
@@ -28,3 +38,24 @@ class MessageCoder(MessageCoderBase):
     def decode(self, data):
         data = umsgpack.unpackb(data)
         return data
+
+
+class NativeMessageCoder(MessageCoderBase):
+
+    """
+        Uses the msgpack package, on the wire identical to umsgpack in compatibility mode,
+        i.e. both str and unicode are sent as raw and decoded as str.
+    """
+
+    # The msgpack package falls back on a pure Python implementation when its extension is missing
+    native = msgpack is not None and msgpack.Packer.__module__ != 'msgpack.fallback'
+
+    @classmethod
+    def available(cls):
+        return cls.native
+
+    def encode(self, data):
+        return msgpack.packb(data, use_bin_type=False)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, **_unpack_options)
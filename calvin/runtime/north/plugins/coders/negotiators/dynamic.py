@@ -23,6 +23,26 @@ _conf = calvinconfig.get()
 
 class DynamicNegotiator(negotiator_base.NegotiatorBase):
 
-    def get_coder(self, channel):
-        raise NotImplemented("This is not implemented yet.")
+    """
+        Selects the first coder in our priority list that the other runtime also supports.
+        Negotiates message coders unless another coder factory (e.g. token_coder_factory) is given.
+    """
+
+    def __init__(self, transport=None, factory=message_coder_factory):
+        super(DynamicNegotiator, self).__init__(transport)
+        self.factory = factory
+
+    def get_coder(self, prio_list):
+        name = self.get_name(prio_list)
+        return self.factory.get(name) if name else None
+
+    def get_name(self, prio_list):
+        """Name of the selected coder or None when there is no common coder"""
+        for coder in self.get_list():
+            if coder in prio_list:
+                return coder
+        return None
+
+    def get_list(self):
+        return self.factory.get_prio_list()
 
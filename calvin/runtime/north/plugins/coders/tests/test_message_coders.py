@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import timeit
+
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.runtime.north.plugins.coders.messages import json_coder, msgpack_coder
+
+pytestmark = pytest.mark.unittest
+
+MESSAGES = {
+    'token': {'cmd': 'TOKEN', 'token': {'type': 'Token', 'value': 4711}, 'peer_port_id': 'a' * 36,
+              'sequencenbr': 17, 'port_id': 'b' * 36},
+    'tokens': {'cmd': 'TOKENS', 'format': 'compact', 'tokens': range(64), 'peer_port_id': 'a' * 36,
+               'sequencenbr': 17, 'port_id': 'b' * 36},
+    'storage': {'cmd': 'GET', 'key': 'actor-' + 'c' * 36, 'value': {'name': 'src', 'node_id': 'd' * 36,
+                'inports': [], 'outports': [{'id': 'e' * 36, 'name': 'token'}]}, 'msg_uuid': 'f' * 36},
+    'control': {'cmd': 'TUNNEL_NEW', 'type': 'token', 'tunnel_id': 'g' * 36, 'policy': {}, 'from_rt_uuid': 'h' * 36}
+}
+
+CODERS = [json_coder.MessageCoder, msgpack_coder.MessageCoder]
+if msgpack_coder.NativeMessageCoder.available():
+    CODERS.append(msgpack_coder.NativeMessageCoder)
+
+
+@pytest.mark.parametrize("name", message_coder_factory.get_prio_list())
+def test_roundtrip(name):
+    coder = message_coder_factory.get(name)
+    for msg in MESSAGES.values():
+        assert coder.decode(coder.encode(msg)) == msg
+
+
+@pytest.mark.skipif(not msgpack_coder.NativeMessageCoder.available(), reason="msgpack not installed")
+def test_native_msgpack_compatible():
+    native = msgpack_coder.NativeMessageCoder()
+    python = msgpack_coder.MessageCoder()
+    for msg in MESSAGES.values():
+        assert native.encode(msg) == python.encode(msg)
+        assert native.decode(python.encode(msg)) == python.decode(native.encode(msg))
+    assert message_coder_factory.get('msgpack').__class__ is msgpack_coder.NativeMessageCoder
+    assert message_coder_factory.get_prio_list()[0] == 'msgpack'
+
+
+def test_select():
+    native = [n for n in message_coder_factory.get_prio_list() if message_coder_factory.get_capabilities()[n]['native']]
+    assert message_coder_factory.select(['other']) is None
+    assert message_coder_factory.select(['msgpack']) == 'msgpack'
+    # Old runtimes do not advertise capabilities, use our priority
+    assert message_coder_factory.select(['json', 'msgpack']) == message_coder_factory.get_prio_list()[0]
+    # Prefer what is native on both sides
+    if 'json' in native:
+        capabilities = {'json': {'native': True}, 'msgpack': {'native': False}}
+        assert message_coder_factory.select(['json', 'msgpack'], capabilities) == 'json'
+
+
+def test_perf():
+    # Run with -s to see the numbers, times are the best of three runs
+    number = 2000
+    print
+    print "%-34s %-8s %10s %10s %8s" % ('coder', 'message', 'encode', 'decode', 'bytes')
+    results = {}
+    for coder_class in CODERS:
+        coder = coder_class()
+        name = "%s.%s" % (coder_class.__module__.split('.')[-1], coder_class.__name__)
+        for msg_name, msg in sorted(MESSAGES.items()):
+            data = coder.encode(msg)
+            encode = min(timeit.repeat(lambda: coder.encode(msg), number=number, repeat=3))
+            decode = min(timeit.repeat(lambda: coder.decode(data), number=number, repeat=3))
+            print "%-34s %-8s %8.2fus %8.2fus %8d" % (name, msg_name, 1e6 * encode / number, 1e6 * decode / number, len(data))
+            results.setdefault(coder_class, 0.0)
+            results[coder_class] += encode + decode
+    # Native coders should beat the pure Python msgpack, and native msgpack should beat json
+    for coder_class, total in results.items():
+        if coder_class.native:
+            assert total < results[msgpack_coder.MessageCoder]
+    if msgpack_coder.NativeMessageCoder in results:
+        assert results[msgpack_coder.NativeMessageCoder] < results[json_coder.MessageCoder]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import timeit
+
+from calvin.runtime.north.calvin_token import Token, ExceptionToken, EOSToken
+from calvin.runtime.north.plugins.coders.tokens import token_coder_factory
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.runtime.north.plugins.coders.negotiators.dynamic import DynamicNegotiator
+
+pytestmark = pytest.mark.unittest
+
+PAYLOADS = {
+    'int': 4711,
+    'float': 3.1415,
+    'str': u"a string token",
+    'dict': {u'a': 1, u'b': [1, 2, 3], u'c': {u'd': u'e'}}
+}
+
+TOKENS = [Token(v) for v in PAYLOADS.values()] + [
+    Token([1, 2]),
+    Token(None),
+    Token(5, origin=u'origin', timestamp=1.5, port_tag=u'tag'),
+    ExceptionToken(),
+    EOSToken(),
+    EOSToken(u"end", origin=u'origin')
+]
+
+
+def same_token(a, b):
+    return type(a) is type(b) and a.value == b.value and a.metadata == b.metadata
+
+
+@pytest.mark.parametrize("token_coder", token_coder_factory.get_prio_list())
+@pytest.mark.parametrize("message_coder", message_coder_factory.get_prio_list())
+def test_roundtrip(token_coder, message_coder):
+    tcoder = token_coder_factory.get(token_coder)
+    mcoder = message_coder_factory.get(message_coder)
+    for token in TOKENS:
+        decoded = tcoder.decode(mcoder.decode(mcoder.encode({'tokens': [tcoder.encode(token)]}))['tokens'][0])
+        assert same_token(token, decoded)
+
+
+def test_compact_plain_token():
+    coder = token_coder_factory.get('compact')
+    assert coder.encode(Token(5)) == 5
+    assert coder.encode(Token({'a': 1})) == [0, {'a': 1}]
+    assert coder.encode(EOSToken()) == [2, "End of stream"]
+
+
+def test_negotiate():
+    negotiator = DynamicNegotiator(factory=token_coder_factory)
+    assert negotiator.get_name(['dict', 'compact']) == 'compact'
+    assert negotiator.get_name(['dict']) == 'dict'
+    assert negotiator.get_name(['other']) is None
+    assert negotiator.get_coder(['dict']) is token_coder_factory.get('dict')
+
+
+def test_perf():
+    # Run with -s to see the numbers, times are the best of three runs
+    dict_coder = token_coder_factory.get('dict')
+    compact_coder = token_coder_factory.get('compact')
+    mcoder = message_coder_factory.get('msgpack')
+    number = 2000
+    print
+    print "%-6s %12s %12s %12s %12s %8s %8s" % ('value', 'dict enc', 'compact enc', 'dict dec', 'compact dec', 'dict B', 'compact B')
+    results = []
+    for name, value in sorted(PAYLOADS.items()):
+        token = Token(value)
+        dict_data = dict_coder.encode(token)
+        compact_data = compact_coder.encode(token)
+        times = [
+            min(timeit.repeat(lambda: dict_coder.encode(token), number=number, repeat=3)),
+            min(timeit.repeat(lambda: compact_coder.encode(token), number=number, repeat=3)),
+            # Token.decode consumes the type key, decode a fresh dict every time as the tunnel does
+            min(timeit.repeat(lambda: dict_coder.decode(dict(dict_data)), number=number, repeat=3)),
+            min(timeit.repeat(lambda: compact_coder.decode(compact_data), number=number, repeat=3))
+        ]
+        sizes = [len(mcoder.encode(dict_data)), len(mcoder.encode(compact_data))]
+        print "%-6s %10.2fus %10.2fus %10.2fus %10.2fus %8d %8d" % tuple(
+            [name] + [1e6 * t / number for t in times] + sizes)
+        results.append((times, sizes))
+    for times, sizes in results:
+        assert sizes[1] < sizes[0]
+    # Compared over all payloads, a single payload takes too little time to compare reliably
+    assert sum(t[1] + t[3] for t, _ in results) < sum(t[0] + t[2] for t, _ in results)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from calvin.runtime.north.calvin_token import Token, ExceptionToken, EOSToken
+from token_coder import TokenCoderBase
+
+# Value types that are sent as is, anything else is sent in a tagged list
+_SCALARS = frozenset([int, long, float, bool, str, unicode, type(None)])
+_CLASSES = [Token, ExceptionToken, EOSToken]
+_TAGS = {cls: tag for tag, cls in enumerate(_CLASSES)}
+
+
+class TokenCoder(TokenCoderBase):
+
+    """
+    Compact token representation without intermediate dicts:
+        plain token with scalar value and no metadata: the value
+        plain token without metadata: [0, value]
+        other tokens: [tag, value, origin, timestamp, port_tag]
+    where tag is the index of the token class in _CLASSES.
+    """
+
+    def encode(self, token):
+        if token._origin is None and token._timestamp is None and token._port_tag is None:
+            if type(token) is Token:
+                if type(token._value) in _SCALARS:
+                    return token._value
+                return [0, token._value]
+            return [_TAGS[type(token)], token._value]
+        return [_TAGS[type(token)], token._value, token._origin, token._timestamp, token._port_tag]
+
+    def decode(self, data):
+        if type(data) is not list:
+            return Token(data)
+        return _CLASSES[data[0]](*data[1:])
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+class TokenCoderBase(object):
+
+    """
+        Base class for the token coders, converts tokens to and from
+        the representation embedded in token messages.
+
+        Should be inherited from when writing token coders.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def encode(self, token):
+        """
+            Encodes a token to a serializable representation.
+        """
+        raise NotImplementedError()
+
+    def decode(self, data):
+        """
+            Decodes a serializable representation into a token.
+        """
+        raise NotImplementedError()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import dict_coder
+import compact_coder
+
+_coders = {}
+
+def get_prio_list():
+    return ['compact', 'dict']
+
+def get(type_):
+    # Coders are stateless, share one instance of each
+    if type_ not in _coders:
+        if type_ == "dict":
+            _coders[type_] = dict_coder.TokenCoder()
+        elif type_ == "compact":
+            _coders[type_] = compact_coder.TokenCoder()
+        else:
+            raise Exception("Token coder {} requested is not supported".format(type_))
+    return _coders[type_]
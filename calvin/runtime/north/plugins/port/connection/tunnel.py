@@ -447,7 +447,49 @@ class TunnelConnection(BaseConnection):
                     # it is sorted out if we connect again
                     try:
                         if e.get_peer()[1] == payload['peer_port_id']:
-                            e.reply(payload['sequencenbr'], payload['value'])
+                            e.reply(payload['sequencenbr'], payload['value'], payload.get('window'), payload.get('token_formats'))
+                            break
+                    except:
+                        pass
+
+        def recv_tokens_handler(self, tunnel, payload):
+            """ Gets called when a range of tokens arrives on any port """
+            try:
+                port = self._get_local_port(port_id=payload['peer_port_id'])
+                for e in port.endpoints:
+                    # We might have started a disconnect, just ignore in that case
+                    # it is sorted out if we connect again
+                    try:
+                        if e.peer_id == payload['port_id']:
+                            e.recv_tokens(payload)
+                            break
+                    except:
+                        pass
+            except:
+                # Same as for a single token, inform the other end that it should look up the port again
+                _log.debug("recv_tokens_handler, ABORT")
+                reply = {'cmd': 'TOKENS_REPLY',
+                         'port_id': payload['port_id'],
+                         'peer_port_id': payload['peer_port_id'],
+                         'sequencenbr': payload['sequencenbr'],
+                         'count': 0,
+                         'value': 'ABORT'}
+                tunnel.send(reply)
+
+        def recv_tokens_reply_handler(self, tunnel, payload):
+            """ Gets called when a range of tokens is (N)ACKed for any port """
+            if payload['value'] == 'ABORT':
+                # FIXME implement ABORT
+                return
+            try:
+                port = self._get_local_port(port_id=payload['port_id'])
+            except:
+                pass
+            else:
+                for e in port.endpoints:
+                    try:
+                        if e.get_peer()[1] == payload['peer_port_id']:
+                            e.reply_tokens(payload['sequencenbr'], payload['count'], payload['value'], payload['window'])
                             break
                     except:
                         pass
@@ -459,6 +501,10 @@ class TunnelConnection(BaseConnection):
                     self.recv_token_handler(tunnel, payload)
                 elif 'TOKEN_REPLY' == payload['cmd']:
                     self.recv_token_reply_handler(tunnel, payload)
+                elif 'TOKENS' == payload['cmd']:
+                    self.recv_tokens_handler(tunnel, payload)
+                elif 'TOKENS_REPLY' == payload['cmd']:
+                    self.recv_tokens_reply_handler(tunnel, payload)
 
     def init(self):
         return TunnelConnection.TokenTunnel(self.node, self.kwargs['portmanager'])
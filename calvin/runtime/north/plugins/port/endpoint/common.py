@@ -42,6 +42,12 @@ class Endpoint(object):
         raise Exception("Can't communicate on endpoint in port %s.%s with id: %s" % (
             self.port.owner.name, self.port.name, self.port.id))
 
+    def runnable_actor_ids(self):
+        """
+        Ids of local actors that might be able to fire after communicate() transferred tokens.
+        """
+        return [self.port.owner.id]
+
     def destroy(self):
         pass
 
@@ -97,6 +97,10 @@ class LocalOutEndpoint(Endpoint):
     def use_monitor(self):
         return True
 
+    def runnable_actor_ids(self):
+        # The reader got new tokens and the writer got free slots in its queue
+        return [self.peer_port.owner.id, self.port.owner.id]
+
     def communicate(self, *args, **kwargs):
         if self.peer_endpoint is None:
             for e in self.peer_port.endpoints:
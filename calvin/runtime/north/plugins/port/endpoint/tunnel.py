@@ -18,16 +18,25 @@ from calvin.runtime.north.calvin_token import Token
 from calvin.runtime.north.plugins.port.endpoint.common import Endpoint
 from calvin.runtime.north.plugins.port.queue.common import COMMIT_RESPONSE, QueueEmpty, QueueFull
 from calvin.runtime.north.plugins.port import DISCONNECT
+from calvin.runtime.north.plugins.coders.tokens import token_coder_factory
+from calvin.runtime.north.plugins.coders.negotiators.dynamic import DynamicNegotiator
+from calvin.runtime.north.profiler import get_profiler
 import time
 from calvin.utilities.calvinlogger import get_logger
+from calvin.utilities import calvinconfig
 
 _log = get_logger(__name__)
+_conf = calvinconfig.get()
+_token_negotiator = DynamicNegotiator(factory=token_coder_factory)
+_profiler = get_profiler()
 
 #
 # Remote tunnel endpoints
 #
 
 PRESSURE_LENGTH = 20
+# Max number of tokens coalesced in one TOKENS message
+TOKENS_PER_MESSAGE = 64
 
 class TunnelInEndpoint(Endpoint):
 
@@ -66,12 +75,30 @@ class TunnelInEndpoint(Endpoint):
             tokens = self.port.queue.exhaust(peer_id=self.peer_id, terminate=DISCONNECT.EXHAUST_PEER_RECV)
             self.remaining_tokens = {self.port.id: tokens}
 
+    def _free_slots(self):
+        # Largest n with n slots available, reported to the sender to size its window
+        low, high = 0, self.port.queue.N - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.port.queue.slots_available(mid, self.peer_id):
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def _record_pressure(self, sequencenbr):
+        if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH] != sequencenbr:
+            self.pressure[self.pressure_count % PRESSURE_LENGTH] = sequencenbr
+            self.pressure_count += 1
+
     def recv_token(self, payload):
         try:
             r = self.port.queue.com_write(Token.decode(payload['token']), self.peer_id, payload['sequencenbr'])
             if r == COMMIT_RESPONSE.handled:
                 # New token, trigger loop
-                self.trigger_loop()
+                self.trigger_loop(actor_ids=[self.port.owner.id])
+                if _profiler.enabled:
+                    _profiler.tokens_received(self.port.id, 1)
             if r == COMMIT_RESPONSE.invalid:
                 ok = False
             else:
@@ -81,16 +108,56 @@ class TunnelInEndpoint(Endpoint):
         except QueueFull:
             # Queue full just send NACK
             ok = False
-            if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH] != payload['sequencenbr']:
-                self.pressure[self.pressure_count % PRESSURE_LENGTH] = payload['sequencenbr']
-                self.pressure_count += 1
+            self._record_pressure(payload['sequencenbr'])
         self.pressure_last = payload['sequencenbr']
         reply = {
             'cmd': 'TOKEN_REPLY',
             'port_id': payload['port_id'],
             'peer_port_id': payload['peer_port_id'],
             'sequencenbr': payload['sequencenbr'],
-            'value': 'ACK' if ok else 'NACK'
+            'value': 'ACK' if ok else 'NACK',
+            # Free slots and token formats, tells the sender that we also accept TOKENS messages
+            'window': self._free_slots(),
+            'token_formats': _token_negotiator.get_list()
+        }
+        self.tunnel.send(reply)
+
+    def recv_tokens(self, payload):
+        """
+        Receive a range of tokens starting at payload['sequencenbr'].
+        Tokens are written in order until one is not accepted, the reply acks
+        the count of accepted tokens and nacks the rest of the range.
+        """
+        first = payload['sequencenbr']
+        coder = token_coder_factory.get(payload.get('format', 'dict'))
+        count = 0
+        new_tokens = 0
+        try:
+            for token in payload['tokens']:
+                r = self.port.queue.com_write(coder.decode(token), self.peer_id, first + count)
+                if r == COMMIT_RESPONSE.invalid:
+                    # Out of order, likely an earlier range was nacked
+                    break
+                if r == COMMIT_RESPONSE.handled:
+                    new_tokens += 1
+                count += 1
+        except QueueFull:
+            self._record_pressure(first + count)
+        if new_tokens:
+            self.trigger_loop(actor_ids=[self.port.owner.id])
+            if _profiler.enabled:
+                _profiler.tokens_received(self.port.id, new_tokens)
+        self.pressure_last = first + len(payload['tokens']) - 1
+        _log.debug("recv_tokens %s %s: %d-%d => %d" % (self.port.id, self.port.name, first,
+                                                        first + len(payload['tokens']) - 1, count))
+        reply = {
+            'cmd': 'TOKENS_REPLY',
+            'port_id': payload['port_id'],
+            'peer_port_id': payload['peer_port_id'],
+            'sequencenbr': first,
+            'count': count,
+            'value': 'ACK' if count == len(payload['tokens']) else 'NACK',
+            'window': self._free_slots()
         }
         self.tunnel.send(reply)
 
@@ -120,6 +187,13 @@ class TunnelOutEndpoint(Endpoint):
         self.backoff = 0.0
         self.time_cont = 0.0
         self.bulk = True
+        # Windowed transfer is used when the peer reports its free slots in replies,
+        # tokens with sequence nbrs from window_end are held back until the window opens
+        self.windowed = False
+        self.window_end = 0
+        # Token format in TOKENS messages, negotiated with the peer
+        self.token_format = 'dict'
+        self.token_coder = token_coder_factory.get('dict')
 
     def __str__(self):
         str = super(TunnelOutEndpoint, self).__str__()
@@ -148,8 +222,14 @@ class TunnelOutEndpoint(Endpoint):
             tokens = self.port.queue.exhaust(peer_id=self.peer_id, terminate=DISCONNECT.EXHAUST_PEER_SEND)
             self.remaining_tokens = {self.port.id: tokens}
 
-    def reply(self, sequencenbr, status):
+    def reply(self, sequencenbr, status, window=None, token_formats=None):
         _log.debug("Reply on port %s/%s/%s [%i] %s" % (self.port.owner.name, self.peer_id, self.port.name, sequencenbr, status))
+        if window is not None and _conf.get(None, 'token_window'):
+            self.windowed = True
+            self.window_end = sequencenbr + window + (1 if status == 'ACK' else 0)
+            if token_formats:
+                self.token_format = _token_negotiator.get_name(token_formats) or 'dict'
+                self.token_coder = token_coder_factory.get(self.token_format)
         if status == 'ACK':
             self._reply_ack(sequencenbr, status)
         elif status == 'NACK':
@@ -158,37 +238,104 @@ class TunnelOutEndpoint(Endpoint):
             # FIXME implement ABORT
             pass
 
+    def reply_tokens(self, sequencenbr, count, status, window):
+        """
+        Reply on a TOKENS message, the first count tokens from sequencenbr are
+        acked (cumulative) and when status is NACK the rest are resent later.
+        """
+        _log.debug("Reply on port %s/%s/%s [%i+%i] %s" % (self.port.owner.name, self.peer_id, self.port.name,
+                                                         sequencenbr, count, status))
+        self.window_end = sequencenbr + count + window
+        if count:
+            # Back to full send speed directly
+            self.bulk = True
+            self.backoff = 0.0
+            # Maybe someone can fill the queue again
+            self.trigger_loop(actor_ids=[self.port.owner.id])
+            for n in xrange(sequencenbr, sequencenbr + count):
+                self._commit(n)
+        if status == 'NACK':
+            self._reply_nack(sequencenbr + count, status)
+
     def _reply_ack(self, sequencenbr, status):
         # Back to full send speed directly
         self.bulk = True
         self.backoff = 0.0
         # Maybe someone can fill the queue again
-        self.trigger_loop()
+        self.trigger_loop(actor_ids=[self.port.owner.id])
+        self._commit(sequencenbr)
+
+    def _commit(self, sequencenbr):
         r = self.port.queue.com_commit(self.peer_id, sequencenbr)
-        if r == COMMIT_RESPONSE.handled or r == COMMIT_RESPONSE.invalid:
+        if r == COMMIT_RESPONSE.invalid:
             return
-        self.sequencenbrs_acked.append(sequencenbr)
-        self.sequencenbrs_acked.sort()
+        if r != COMMIT_RESPONSE.handled:
+            self.sequencenbrs_acked.append(sequencenbr)
+            self.sequencenbrs_acked.sort()
+        # Earlier out of order acks might now be in order
         for n in self.sequencenbrs_acked[:]:
             r = self.port.queue.com_commit(self.peer_id, n)
             if r == COMMIT_RESPONSE.handled or r == COMMIT_RESPONSE.invalid:
                 self.sequencenbrs_acked.remove(n)
 
     def _reply_nack(self, sequencenbr, status):
+        self._slow_down()
+        r = self.port.queue.com_cancel(self.peer_id, sequencenbr)
+        if r == COMMIT_RESPONSE.handled:
+            # Filter out ACK for later seq nbrs, should not happen but precaution
+            self.sequencenbrs_acked = [n for n in self.sequencenbrs_acked if n < sequencenbr]
+
+    def _slow_down(self):
         # Make send only send one token at a time and have increasing time between them
         curr_time = time.time()
         if self.bulk:
             self.time_cont = curr_time
         if self.time_cont <= curr_time:
             # Need to trigger again due to either too late NACK or switched from series of ACK
-            self.trigger_loop()
+            self.trigger_loop(actor_ids=[])
         self.bulk = False
         self.backoff = min(1.0, 0.1 if self.backoff < 0.1 else self.backoff * 2.0)
 
-        r = self.port.queue.com_cancel(self.peer_id, sequencenbr)
-        if r == COMMIT_RESPONSE.handled:
-            # Filter out ACK for later seq nbrs, should not happen but precaution
-            self.sequencenbrs_acked = [n for n in self.sequencenbrs_acked if n < sequencenbr]
+    def _send_tokens(self, sequencenbr, tokens):
+        _log.debug("Send on port  %s/%s/%s [%i+%i]" % (self.port.owner.name, self.peer_id, self.port.name,
+                                                       sequencenbr, len(tokens)))
+        if _profiler.enabled:
+            _profiler.tokens_sent(self.port.id, len(tokens))
+        self.tunnel.send({
+            'cmd': 'TOKENS',
+            'format': self.token_format,
+            'tokens': tokens,
+            'peer_port_id': self.peer_id,
+            'sequencenbr': sequencenbr,
+            'port_id': self.port.id
+        })
+
+    def _send_window(self):
+        # Send what fits in the window, coalesced in TOKENS messages
+        sent = False
+        first = None
+        tokens = []
+        while self.port.queue.tokens_available(1, self.peer_id):
+            sequencenbr, token = self.port.queue.com_peek(self.peer_id)
+            if sequencenbr >= self.window_end:
+                self.port.queue.com_cancel(self.peer_id, sequencenbr)
+                break
+            if first is None:
+                first = sequencenbr
+            tokens.append(self.token_coder.encode(token))
+            if len(tokens) == TOKENS_PER_MESSAGE:
+                self._send_tokens(first, tokens)
+                sent = True
+                first = None
+                tokens = []
+        if tokens:
+            self._send_tokens(first, tokens)
+            sent = True
+        if (not sent and self.port.queue.tokens_available(1, self.peer_id) and
+              self.port.queue.com_is_committed(self.peer_id)):
+            # Window closed and nothing in flight that could open it, probe the peer one token at a time
+            self._slow_down()
+        return sent
 
     def _send_one_token(self):
         sequencenbr_sent, token = self.port.queue.com_peek(self.peer_id)
@@ -197,6 +344,8 @@ class TunnelOutEndpoint(Endpoint):
                                                        self.port.name,
                                                        sequencenbr_sent,
                                                        "" if self.bulk else "@%f/%f" % (self.time_cont, self.backoff)))
+        if _profiler.enabled:
+            _profiler.tokens_sent(self.port.id, 1)
         self.tunnel.send({
             'cmd': 'TOKEN',
             'token': token.encode(),
@@ -208,10 +357,17 @@ class TunnelOutEndpoint(Endpoint):
     def use_monitor(self):
         return True
 
+    def runnable_actor_ids(self):
+        # Sent tokens are only tentatively read, the writer is triggered when they are acked
+        return []
+
     def communicate(self, *args, **kwargs):
         # FIXME uses internal queue attributes
         sent = False
-        if self.bulk:
+        if self.bulk and self.windowed:
+            # Send as much as the other side has room for
+            sent = self._send_window()
+        elif self.bulk:
             # Send all we have, since other side seems to keep up
             while self.port.queue.tokens_available(1, self.peer_id):
                 sent = True
@@ -225,7 +381,7 @@ class TunnelOutEndpoint(Endpoint):
             sent = True
             self.time_cont = time.time() + self.backoff
             # Make sure that resend will be tried in backoff seconds
-            self.trigger_loop(self.backoff)
+            self.trigger_loop(self.backoff, actor_ids=[])
         return sent
 
     def get_peer(self):
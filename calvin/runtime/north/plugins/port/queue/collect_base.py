@@ -14,15 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from calvin.runtime.north.calvin_token import Token
 from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.queue_base import QueueBase, RingBuffer
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities import calvinlogger
 
 _log = calvinlogger.get_logger(__name__)
 
 
-class CollectBase(object):
+class CollectBase(QueueBase):
 
     """
     A queue with fanin support, does not handle token order between connections
@@ -30,22 +30,16 @@ class CollectBase(object):
     """
 
     def __init__(self, port_properties, peer_port_properties):
-        super(CollectBase, self).__init__()
-        # Set default queue length to 4 if not specified
-        length = port_properties.get('queue_length', 4)
-        # Compensate length for FIFO having an unused slot
-        length += 1
+        super(CollectBase, self).__init__(port_properties, peer_port_properties)
         # Each peer have it's own FIFO
         self.fifo = {}
-        self.nbr_peers = port_properties.get('nbr_peers', 1)
-        self.N = length
         # Peers ordered by id
         self.writers = []
         # NOTE: For simplicity, modulo operation is only used in fifo access,
         #       all read and write positions are monotonousy increasing
-        self.write_pos = {}
-        self.read_pos = {}
-        self.tentative_read_pos = {}
+        self.write_pos = self._positions()
+        self.read_pos = self._positions()
+        self.tentative_read_pos = self._positions()
         self.tags = {}
         self.tags_are_ordering = False
         self.exhausted_tokens = {}
@@ -61,19 +55,20 @@ class CollectBase(object):
         if remap is None:
             state = {
                 'queuetype': self._type,
-                'fifo': {p: [t.encode() for t in tokens] for p, tokens in self.fifo.items()},
+                'fifo': {p: tokens.encode(self.read_pos.get(p, 0), self.write_pos.get(p, 0))
+                         for p, tokens in self.fifo.items()},
                 'N': self.N,
                 'writers': self.writers,
-                'write_pos': self.write_pos,
-                'read_pos': self.read_pos,
-                'tentative_read_pos': self.tentative_read_pos,
+                'write_pos': self.write_pos.copy(),
+                'read_pos': self.read_pos.copy(),
+                'tentative_read_pos': self.tentative_read_pos.copy(),
                 'tags': self.tags,
                 'tags-are-ordering': self.tags_are_ordering
             }
         else:
             state = {
                 'queuetype': self._type,
-                'fifo': {remap[p] if p in remap else p: [Token(0).encode() for t in tokens] for p, tokens in self.fifo.items()},
+                'fifo': {remap[p] if p in remap else p: RingBuffer(self.N).encode(0, 0) for p in self.fifo.keys()},
                 'N': self.N,
                 'writers': sorted([remap[pid] if pid in remap else pid for pid in self.writers]),
                 'write_pos': {remap[pid] if pid in remap else pid: 0 for pid in self.write_pos.keys()},
@@ -87,27 +82,24 @@ class CollectBase(object):
 
     def _set_state(self, state):
         self._type = state.get('queuetype')
-        self.fifo = {p: [Token.decode(t) for t in tokens] for p, tokens in state['fifo'].items()}
         self.N = state['N']
         self.writers = state['writers']
-        self.write_pos = state['write_pos']
-        self.read_pos = state['read_pos']
-        self.tentative_read_pos = state['tentative_read_pos']
+        self._set_peers(self.writers, [
+            (self.write_pos, state['write_pos']),
+            (self.read_pos, state['read_pos']),
+            (self.tentative_read_pos, state['tentative_read_pos'])])
+        self.fifo = {p: RingBuffer.decode(self.N, tokens, self.read_pos.get(p, 0), self.write_pos.get(p, 0))
+                     for p, tokens in state['fifo'].items()}
         self.tags = state.get("tags", {})
         self.tags_are_ordering = state.get("tags-are-ordering", False)
 
-    @property
-    def queue_type(self):
-        return self._type
-
     def add_writer(self, writer, properties):
         if not isinstance(writer, basestring):
             raise Exception('Not a string: %s' % writer)
         if writer not in self.writers:
-            self.read_pos[writer] = 0
-            self.write_pos[writer] = 0
-            self.tentative_read_pos[writer] = 0
-            self.fifo.setdefault(writer, [Token(0)] * self.N)
+            # Starts at position 0 in all positions
+            self._add_peer(writer)
+            self.fifo.setdefault(writer, RingBuffer(self.N))
             self.writers.append(writer)
             self.writers.sort()
         if len(self.writers) > self.nbr_peers:
@@ -121,9 +113,7 @@ class CollectBase(object):
         if not isinstance(writer, basestring):
             raise Exception('Not a string: %s' % writer)
         _log.debug("remove_writer %s %s" % (self.reader if hasattr(self, 'reader') else "--", writer))
-        del self.read_pos[writer]
-        del self.tentative_read_pos[writer]
-        del self.write_pos[writer]
+        self._remove_peer(writer)
         del self.fifo[writer]
         del self.tags[writer]
         self.writers.remove(writer)
@@ -229,6 +219,7 @@ class CollectBase(object):
 
     def commit(self, metadata):
         for writer in self.writers:
+            self.fifo[writer].release(self.read_pos[writer], self.tentative_read_pos[writer])
             self.read_pos[writer] = self.tentative_read_pos[writer]
         # Transfer in exhausted tokens when possible
         remove = []
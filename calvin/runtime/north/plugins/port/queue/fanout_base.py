@@ -14,32 +14,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from calvin.runtime.north.calvin_token import Token
 from calvin.runtime.north.plugins.port.queue.common import QueueEmpty, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.queue_base import QueueBase, RingBuffer
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities import calvinlogger
 
 _log = calvinlogger.get_logger(__name__)
 
-class FanoutBase(object):
+class FanoutBase(QueueBase):
 
     def __init__(self, port_properties, peer_port_properties):
-        # Set default queue length to 4 if not specified
-        length = port_properties.get('queue_length', 4)
-        # Compensate length for FIFO having an unused slot
-        length += 1
+        super(FanoutBase, self).__init__(port_properties, peer_port_properties)
         # Each peer have it's own FIFO
         self.fifo = {}
-        self.nbr_peers = port_properties.get('nbr_peers', 1)
-        self.N = length
         self.readers = []
         # NOTE: For simplicity, modulo operation is only used in fifo access,
         #       all read and write positions are monotonousy increasing
-        self.write_pos = {}
-        self.read_pos = {}
-        self.tentative_read_pos = {}
-        # No type in base class
-        self._type = None
+        self.write_pos = self._positions()
+        self.read_pos = self._positions()
+        self.tentative_read_pos = self._positions()
 
     def __str__(self):
         fifo = "\n".join([str(k) + ": " + ", ".join(map(lambda x: str(x), self.fifo[k])) for k in self.fifo.keys()])
@@ -49,18 +42,19 @@ class FanoutBase(object):
         if remap is None:
             state = {
                 'queuetype': self._type,
-                'fifo': {p: [t.encode() for t in tokens] for p, tokens in self.fifo.items()},
+                'fifo': {p: tokens.encode(self.read_pos.get(p, 0), self.write_pos.get(p, 0))
+                         for p, tokens in self.fifo.items()},
                 'N': self.N,
                 'readers': self.readers,
-                'write_pos': self.write_pos,
-                'read_pos': self.read_pos,
-                'tentative_read_pos': self.tentative_read_pos,
+                'write_pos': self.write_pos.copy(),
+                'read_pos': self.read_pos.copy(),
+                'tentative_read_pos': self.tentative_read_pos.copy(),
             }
         else:
             # Remapping of port ids implies reset of tokens
             state = {
                 'queuetype': self._type,
-                'fifo': {remap[p] if p in remap else p: [Token(0).encode() for t in tokens] for p, tokens in self.fifo.items()},
+                'fifo': {remap[p] if p in remap else p: RingBuffer(self.N).encode(0, 0) for p in self.fifo.keys()},
                 'N': self.N,
                 'readers': sorted([remap[pid] if pid in remap else pid for pid in self.readers]),
                 'write_pos': {remap[pid] if pid in remap else pid: 0 for pid in self.write_pos.keys()},
@@ -71,20 +65,18 @@ class FanoutBase(object):
 
     def _set_state(self, state):
         self._type = state.get('queuetype')
-        self.fifo = {p: [Token.decode(t) for t in tokens] for p, tokens in state['fifo'].items()}
         self.N = state['N']
         self.readers = state['readers']
-        self.write_pos = state['write_pos']
-        self.read_pos = state['read_pos']
-        self.tentative_read_pos = state['tentative_read_pos']
+        self._set_peers(self.readers, [
+            (self.write_pos, state['write_pos']),
+            (self.read_pos, state['read_pos']),
+            (self.tentative_read_pos, state['tentative_read_pos'])])
+        self.fifo = {p: RingBuffer.decode(self.N, tokens, self.read_pos.get(p, 0), self.write_pos.get(p, 0))
+                     for p, tokens in state['fifo'].items()}
         if len(self.readers) > self.nbr_peers:
             # If the peer has been replicated just set it to nbr connected
             self.nbr_peers = len(self.readers)
 
-    @property
-    def queue_type(self):
-        return self._type
-
     def add_writer(self, writer, properties):
         # TODO: Should this be here?
         pass
@@ -101,10 +93,9 @@ class FanoutBase(object):
         # print "    properties:", properties
 
         if reader not in self.readers:
-            self.read_pos[reader] = 0
-            self.write_pos[reader] = 0
-            self.tentative_read_pos[reader] = 0
-            self.fifo.setdefault(reader, [Token(0)] * self.N)
+            # Starts at position 0 in all positions
+            self._add_peer(reader)
+            self.fifo.setdefault(reader, RingBuffer(self.N))
             self.readers.append(reader)
             # self.readers.sort()
         if len(self.readers) > self.nbr_peers:
@@ -116,9 +107,7 @@ class FanoutBase(object):
         # the queue. Returns False if no such reader
         if reader not in self.readers:
             return False
-        del self.read_pos[reader]
-        del self.tentative_read_pos[reader]
-        del self.write_pos[reader]
+        self._remove_peer(reader)
         del self.fifo[reader]
         self.readers.remove(reader)
         self.nbr_peers -= 1
@@ -170,6 +159,7 @@ class FanoutBase(object):
         return data
 
     def commit(self, metadata):
+        self.fifo[metadata].release(self.read_pos[metadata], self.tentative_read_pos[metadata])
         self.read_pos[metadata] = self.tentative_read_pos[metadata]
         return False
 
@@ -209,6 +199,7 @@ class FanoutBase(object):
             return COMMIT_RESPONSE.invalid
         if self.read_pos[reader] < self.tentative_read_pos[reader]:
             if sequence_nbr == self.read_pos[reader]:
+                self.fifo[reader].release(sequence_nbr, sequence_nbr + 1)
                 self.read_pos[reader] += 1
                 return COMMIT_RESPONSE.handled
             else:
@@ -220,8 +211,8 @@ class FanoutBase(object):
             reader: peer_id
             sequence_nbr: token sequence_nbr
         """
-        if (sequence_nbr >= self.tentative_read_pos[reader] and
-            sequence_nbr < self.reader_pos[reader]):
+        if (sequence_nbr >= self.tentative_read_pos[reader] or
+            sequence_nbr < self.read_pos[reader]):
             return COMMIT_RESPONSE.invalid
         self.tentative_read_pos[reader] = sequence_nbr
         return COMMIT_RESPONSE.handled
@@ -14,36 +14,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from calvin.runtime.north.calvin_token import Token
 from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.queue_base import QueueBase, RingBuffer
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities import calvinlogger
 
 _log = calvinlogger.get_logger(__name__)
 
-class FanoutFIFO(object):
+class FanoutFIFO(QueueBase):
 
     """
     Default FIFO, all tokens to all peers
     """
 
     def __init__(self, port_properties, peer_port_properties):
-        super(FanoutFIFO, self).__init__()
-        # Set default queue length to 4 if not specified
-        length = port_properties.get('queue_length', 4)
-        # Compensate length for FIFO having an unused slot
-        length += 1
-        self.fifo = [Token(0)] * length
-        self.N = length
+        super(FanoutFIFO, self).__init__(port_properties, peer_port_properties)
+        self.fifo = RingBuffer(self.N)
         self.direction = port_properties.get('direction', None)
-        self.nbr_peers = port_properties.get('nbr_peers', 1)
         self.readers = set()
         # NOTE: For simplicity, modulo operation is only used in fifo access,
         #       all read and write positions are monotonousy increasing
         self.write_pos = 0
-        self.read_pos = {}
-        self.tentative_read_pos = {}
-        self.reader_offset = {}
+        self.read_pos = self._positions()
+        self.tentative_read_pos = self._positions()
+        self.reader_offset = self._positions()
         self._type = "fanout_fifo"
         self.writer = None  # Not part of state, assumed not needed in migrated information
         self.exhausted_tokens = {}
@@ -56,19 +50,19 @@ class FanoutFIFO(object):
         if remap is None:
             state = {
                 'queuetype': self._type,
-                'fifo': [t.encode() for t in self.fifo],
+                'fifo': self.fifo.encode(self._tail(), self.write_pos),
                 'N': self.N,
                 'readers': list(self.readers),
                 'write_pos': self.write_pos,
-                'read_pos': self.read_pos,
-                'tentative_read_pos': self.tentative_read_pos,
-                'reader_offset': self.reader_offset
+                'read_pos': self.read_pos.copy(),
+                'tentative_read_pos': self.tentative_read_pos.copy(),
+                'reader_offset': self.reader_offset.copy()
             }
         else:
             # Remapping of port ids, also implies reset of tokens
             state = {
                 'queuetype': self._type,
-                'fifo': [Token(0).encode()] * len(self.fifo),
+                'fifo': RingBuffer(self.N).encode(0, 0),
                 'N': self.N,
                 'readers': [remap[pid] if pid in remap else pid for pid in self.readers],
                 'write_pos': 0,
@@ -80,17 +74,26 @@ class FanoutFIFO(object):
 
     def _set_state(self, state):
         self._type = state.get('queuetype',"fanout_fifo")
-        self.fifo = [Token.decode(d) for d in state['fifo']]
         self.N = state['N']
         self.readers = set(state['readers'])
         self.write_pos = state['write_pos']
-        self.read_pos = state['read_pos']
-        self.tentative_read_pos = state['tentative_read_pos']
-        self.reader_offset = state.get('reader_offset', {pid: 0 for pid in self.readers})
-
-    @property
-    def queue_type(self):
-        return self._type
+        self._set_peers(self.readers, [
+            (self.read_pos, state['read_pos']),
+            (self.tentative_read_pos, state['tentative_read_pos']),
+            (self.reader_offset, state.get('reader_offset', {}))])
+        self.fifo = RingBuffer.decode(self.N, state['fifo'], self._tail(), self.write_pos)
+
+    def _tail(self):
+        """ Position of the oldest token that may still be read """
+        if self.readers and len(self.readers) >= self.nbr_peers:
+            return min(self.read_pos.values())
+        # Readers still to connect start from position 0
+        return max(0, self.write_pos - self.N + 1)
+
+    def _release(self, tail):
+        """ Drop the tokens all readers have read since the oldest position was tail """
+        if self.readers and len(self.readers) >= self.nbr_peers:
+            self.fifo.release(tail, self._tail())
 
     def add_writer(self, writer, properties):
         self.writer = writer
@@ -109,22 +112,22 @@ class FanoutFIFO(object):
             # Replicated actor connect for first time, start from oldest possible
             oldest = min(self.read_pos.values())
             #_log.info("ADD_READER %s %s %d" % (reader, str(id(self)), oldest))
+            self._add_peer(reader)
             self.reader_offset[reader] = oldest
             self.read_pos[reader] = oldest
             self.tentative_read_pos[reader] = oldest
         else:
-            self.reader_offset[reader] = 0
-            self.read_pos[reader] = 0
-            self.tentative_read_pos[reader] = 0
+            # Starts at position 0 in all positions
+            self._add_peer(reader)
 
     def remove_reader(self, reader):
         if reader not in self.readers:
             return
-        del self.read_pos[reader]
-        del self.tentative_read_pos[reader]
-        del self.reader_offset[reader]
+        tail = self._tail()
+        self._remove_peer(reader)
         self.readers.discard(reader)
         self.nbr_peers -= 1
+        self._release(tail)
 
     def is_exhausting(self, peer_id=None):
         if peer_id is None:
@@ -237,7 +240,9 @@ class FanoutFIFO(object):
 
     def commit(self, metadata):
         _log.debug("COMMIT EXHAUSTING???")
+        tail = self._tail()
         self.read_pos[metadata] = self.tentative_read_pos[metadata]
+        self._release(tail)
         remove = []
         for peer_id, exhausted_tokens in self.exhausted_tokens.items():
             if self._transfer_exhaust_tokens(peer_id, self.exhausted_tokens[peer_id]):
@@ -294,7 +299,9 @@ class FanoutFIFO(object):
             return COMMIT_RESPONSE.invalid
         if self.read_pos[reader] < self.tentative_read_pos[reader]:
             if sequence_nbr == self.read_pos[reader]:
+                tail = self._tail()
                 self.read_pos[reader] += 1
+                self._release(tail)
                 return COMMIT_RESPONSE.handled
             else:
                 return COMMIT_RESPONSE.unhandled
@@ -306,8 +313,8 @@ class FanoutFIFO(object):
             sequence_nbr: token sequence_nbr
         """
         sequence_nbr += self.reader_offset[reader]
-        if (sequence_nbr >= self.tentative_read_pos[reader] and
-            sequence_nbr < self.reader_pos[reader]):
+        if (sequence_nbr >= self.tentative_read_pos[reader] or
+            sequence_nbr < self.read_pos[reader]):
             return COMMIT_RESPONSE.invalid
         self.tentative_read_pos[reader] = sequence_nbr
         return COMMIT_RESPONSE.handled
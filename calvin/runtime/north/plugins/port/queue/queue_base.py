@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2017 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from calvin.runtime.north.calvin_token import Token
+
+
+class RingBuffer(object):
+
+    """
+    Token slots of a queue, the token at position pos is kept in slot pos % N.
+    Slots are allocated when first written and release drops the tokens that
+    have been read, so only queued tokens are referenced.
+    """
+
+    __slots__ = ('N', 'slots')
+
+    def __init__(self, N):
+        self.N = N
+        self.slots = []
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return self.slots[pos]
+        return self.slots[pos % self.N]
+
+    def __setitem__(self, pos, token):
+        slot = pos % self.N
+        if slot >= len(self.slots):
+            self.slots.extend([None] * (slot + 1 - len(self.slots)))
+        self.slots[slot] = token
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def __str__(self):
+        return str(self.slots)
+
+    def release(self, start, end):
+        """ Drop the tokens at positions start to end """
+        for pos in xrange(max(start, end - self.N), end):
+            self.slots[pos % self.N] = None
+
+    def encode(self, start, end):
+        """
+        All N slots as kept in a queue state, with the tokens at positions start to end encoded.
+        The other slots are not read from a state, they are all the same empty token.
+        """
+        encoded = [Token(0).encode()] * self.N
+        for pos in xrange(max(start, end - self.N), end):
+            token = self.slots[pos % self.N]
+            if token is not None:
+                encoded[pos % self.N] = token.encode()
+        return encoded
+
+    @classmethod
+    def decode(cls, N, encoded, start, end):
+        """ Slots from a queue state, only the tokens at positions start to end are decoded """
+        ring = cls(N)
+        for pos in xrange(max(start, end - N), end):
+            ring[pos] = Token.decode(encoded[pos % N])
+        return ring
+
+
+class Positions(object):
+
+    """
+    Positions of the peers of a queue, kept in a list indexed by the peer's index in the queue.
+    Read and written like a dict from peer id to position, with the peers that the queue knows.
+    """
+
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, index):
+        # Shared by all positions of a queue, see QueueBase
+        self._index = index
+        self._values = []
+
+    def __getitem__(self, peer):
+        return self._values[self._index[peer]]
+
+    def __setitem__(self, peer, pos):
+        self._values[self._index[peer]] = pos
+
+    def __contains__(self, peer):
+        return peer in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __str__(self):
+        return str(self.copy())
+
+    def get(self, peer, default=None):
+        index = self._index.get(peer)
+        return default if index is None else self._values[index]
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return [self._values[index] for index in self._index.itervalues()]
+
+    def items(self):
+        return [(peer, self._values[index]) for peer, index in self._index.iteritems()]
+
+    def copy(self):
+        """ The positions as a dict, as kept in a queue state """
+        return dict(self.items())
+
+    def update(self, positions):
+        for peer, pos in positions.iteritems():
+            self[peer] = pos
+
+
+class QueueBase(object):
+
+    """
+    Common base of the fanout and collect queues.
+
+    Tokens are kept in RingBuffer slots and the read and write positions of the peers
+    in Positions, all positions of a queue share one index of its peers.
+    """
+
+    def __init__(self, port_properties, peer_port_properties):
+        super(QueueBase, self).__init__()
+        # Set default queue length to 4 if not specified
+        length = port_properties.get('queue_length', 4)
+        # Compensate length for FIFO having an unused slot
+        self.N = length + 1
+        self.nbr_peers = port_properties.get('nbr_peers', 1)
+        # Peer id -> index in the position lists
+        self._peer_index = {}
+        self._peer_positions = []
+        # No type in base class
+        self._type = None
+
+    @property
+    def queue_type(self):
+        return self._type
+
+    def _positions(self):
+        positions = Positions(self._peer_index)
+        self._peer_positions.append(positions)
+        return positions
+
+    def _add_peer(self, peer):
+        """ Add peer with position 0 in all positions """
+        if peer in self._peer_index:
+            return
+        self._peer_index[peer] = len(self._peer_index)
+        for positions in self._peer_positions:
+            positions._values.append(0)
+
+    def _remove_peer(self, peer):
+        """ Remove peer from all positions, the last peer takes its index """
+        index = self._peer_index.pop(peer)
+        last = len(self._peer_index)
+        for other, other_index in self._peer_index.iteritems():
+            if other_index == last:
+                self._peer_index[other] = index
+                break
+        for positions in self._peer_positions:
+            value = positions._values.pop()
+            if index < last:
+                positions._values[index] = value
+
+    def _set_peers(self, peers, states):
+        """ Replace all peers, states are (Positions, dict of positions as kept in a queue state) """
+        self._peer_index.clear()
+        for positions in self._peer_positions:
+            del positions._values[:]
+        for peer in peers:
+            self._add_peer(peer)
+        for positions, state in states:
+            for peer in state:
+                self._add_peer(peer)
+        for positions, state in states:
+            positions.update(state)
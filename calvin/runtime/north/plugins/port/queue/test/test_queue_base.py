@@ -0,0 +1,103 @@
+import unittest
+import pytest
+
+pytest_unittest = pytest.mark.unittest
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port.queue.common import COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.queue_base import RingBuffer
+from calvin.runtime.north.plugins.port.queue.fanout_fifo import FanoutFIFO
+from calvin.runtime.north.plugins.port.queue.fanout_round_robin_fifo import FanoutRoundRobinFIFO
+from calvin.runtime.north.plugins.port.queue.collect_unordered import CollectUnordered
+
+
+@pytest_unittest
+class TestRingBuffer(unittest.TestCase):
+
+    def testAllocatedWhenWritten(self):
+        ring = RingBuffer(5)
+        self.assertEqual(ring.slots, [])
+        ring[0] = Token(1)
+        ring[1] = Token(2)
+        self.assertEqual(len(ring.slots), 2)
+        ring[5] = Token(3)
+        self.assertEqual([t.value for t in ring[:2]], [3, 2])
+
+    def testEncodeQueued(self):
+        ring = RingBuffer(4)
+        for pos in range(6):
+            ring[pos] = Token(pos)
+        ring.release(2, 4)
+        self.assertEqual(ring[2], None)
+        encoded = ring.encode(4, 6)
+        self.assertEqual(len(encoded), 4)
+        self.assertEqual([e['value'] for e in encoded], [4, 5, 0, 0])
+        decoded = RingBuffer.decode(4, encoded, 4, 6)
+        self.assertEqual([t.value for t in decoded[:2]], [4, 5])
+
+
+@pytest_unittest
+class TestQueueBase(unittest.TestCase):
+
+    def testFanoutReleaseRead(self):
+        queue = FanoutFIFO({'queue_length': 4, 'nbr_peers': 2}, {})
+        queue.add_reader("reader-1", {})
+        for i in range(3):
+            queue.write(Token(i), None)
+        queue.peek("reader-1")
+        queue.commit("reader-1")
+        # Not read by reader-2 which has not connected yet
+        self.assertEqual(queue.fifo[0].value, 0)
+        queue.add_reader("reader-2", {})
+        queue.peek("reader-2")
+        queue.commit("reader-2")
+        self.assertEqual(queue.fifo[0], None)
+        self.assertEqual(queue.fifo[1].value, 1)
+        seq, token = queue.com_peek("reader-2")
+        self.assertEqual(queue.com_commit("reader-2", seq), COMMIT_RESPONSE.handled)
+        self.assertEqual(queue.fifo[1].value, 1)
+        self.assertEqual(queue.com_commit("reader-1", seq), COMMIT_RESPONSE.invalid)
+        queue.peek("reader-1")
+        queue.commit("reader-1")
+        self.assertEqual(queue.fifo[1], None)
+
+    def testComCancel(self):
+        queue = FanoutFIFO({'queue_length': 4, 'nbr_peers': 1}, {})
+        queue.add_reader("reader", {})
+        for i in range(3):
+            queue.write(Token(i), None)
+        seqs = [queue.com_peek("reader")[0] for _ in range(3)]
+        self.assertEqual(queue.com_commit("reader", seqs[0]), COMMIT_RESPONSE.handled)
+        # Cancels from the second token, the tentative position goes back to it
+        self.assertEqual(queue.com_cancel("reader", seqs[1]), COMMIT_RESPONSE.handled)
+        self.assertEqual(queue.tentative_read_pos["reader"], seqs[1])
+        self.assertEqual(queue.com_cancel("reader", seqs[0]), COMMIT_RESPONSE.invalid)
+        self.assertEqual(queue.com_peek("reader")[1].value, 1)
+
+    def testRemovePeerKeepsPositions(self):
+        queue = CollectUnordered({'queue_length': 4, 'nbr_peers': 3}, {})
+        for i in range(3):
+            queue.add_writer("writer-%d" % i, {})
+            for _ in range(i):
+                queue.write(Token(i), "writer-%d" % i)
+        queue.remove_writer("writer-0")
+        self.assertEqual(queue.write_pos.copy(), {"writer-1": 1, "writer-2": 2})
+        queue.add_writer("writer-3", {})
+        self.assertEqual(queue.write_pos.copy(), {"writer-1": 1, "writer-2": 2, "writer-3": 0})
+
+    def testStateQueuedTokens(self):
+        queue = FanoutRoundRobinFIFO({'queue_length': 4, 'nbr_peers': 2, 'routing': 'round-robin'}, {})
+        queue.add_reader("reader-1", {})
+        queue.add_reader("reader-2", {})
+        for i in range(4):
+            queue.write(Token(i), None)
+        queue.peek("reader-1")
+        queue.commit("reader-1")
+        state = queue._state()
+        # All slots are kept in the state, as before
+        self.assertEqual(len(state['fifo']["reader-1"]), queue.N)
+        self.assertEqual(state['read_pos'], {"reader-1": 1, "reader-2": 0})
+        restored = FanoutRoundRobinFIFO({'queue_length': 4, 'nbr_peers': 2, 'routing': 'round-robin'}, {})
+        restored._set_state(state)
+        self.assertEqual(restored.fifo["reader-1"][0], None)
+        self.assertEqual([restored.peek(r).value for r in ["reader-1", "reader-2", "reader-2"]], [2, 1, 3])
@@ -17,6 +17,8 @@
 from calvin.utilities import dynops
 
 req_type = "placement"
+# Result depends on the actor, it can't be shared with other actors having the same requirements
+actor_dependent = True
 
 def req_op(node, actor_id=None, component=None):
     """ Returns any nodes that have replicas of actor """
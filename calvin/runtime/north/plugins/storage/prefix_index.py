@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from calvin.runtime.south.plugins.async import async
+
+
+class PrefixIndex(object):
+    """
+        Index values by prefix, kept in memory in this runtime.
+
+        An index entry is stored once at its full index string, e.g. /node/attribute/a/b,
+        together with the index strings of its queryable prefixes (see Storage._index_strings).
+        Each prefix maps to a count of the values in its subtree, hence adding and removing an
+        entry updates one count per level and a prefix query is a single lookup.
+
+        Used by the local storage plugin and the local only storage, the SQLite plugin has an
+        index of its own. The DHT and proxy storage plugins have no index capability, there
+        the index levels are kept as sets in the registry, see Storage.add_index.
+
+        The add_index, remove_index, delete_index and get_index methods make up the index
+        capability of storage plugins, they are async and call cb(key=<index string>, value=...)
+        like the other storage plugin methods.
+    """
+
+    def __init__(self):
+        super(PrefixIndex, self).__init__()
+        # full index string -> {value: tuple of prefix index strings}
+        self._entries = {}
+        # prefix index string -> {value: number of entries in subtree}
+        self._counts = {}
+
+    def add(self, indexes, value):
+        """ Add value at indexes[-1], queryable at each of the index strings in indexes """
+        entries = self._entries.setdefault(indexes[-1], {})
+        if value in entries:
+            return
+        entries[value] = tuple(indexes)
+        for prefix in indexes:
+            counts = self._counts.setdefault(prefix, {})
+            counts[value] = counts.get(value, 0) + 1
+
+    def remove(self, indexes, value):
+        """ Remove value from indexes[-1], returns False when not present """
+        entries = self._entries.get(indexes[-1])
+        if not entries or value not in entries:
+            return False
+        for prefix in entries.pop(value):
+            counts = self._counts[prefix]
+            counts[value] -= 1
+            if not counts[value]:
+                del counts[value]
+                if not counts:
+                    del self._counts[prefix]
+        if not entries:
+            del self._entries[indexes[-1]]
+        return True
+
+    def delete(self, indexes, below=True):
+        """ Remove all values at indexes[-1], and below it unless below is False """
+        index = indexes[-1]
+        if not below:
+            for value in self._entries.get(index, {}).keys():
+                self.remove([index], value)
+            return
+        subtree = index + "/"
+        for key in [k for k in self._entries if k == index or k.startswith(subtree)]:
+            for value in self._entries[key].keys():
+                self.remove([key], value)
+
+    def get(self, index):
+        """ Values at index or below it """
+        return self._counts.get(index, {}).keys()
+
+    def dump(self):
+        return {prefix: counts.keys() for prefix, counts in self._counts.iteritems()}
+
+    ### Storage plugin index capability ###
+
+    def supports_index(self):
+        return True
+
+    def add_index(self, indexes, value, cb=None):
+        self.add(indexes, value)
+        if cb:
+            async.DelayedCall(0, cb, key=indexes[-1], value=True)
+
+    def remove_index(self, indexes, value, cb=None):
+        self.remove(indexes, value)
+        if cb:
+            async.DelayedCall(0, cb, key=indexes[-1], value=True)
+
+    def delete_index(self, indexes, cb=None, below=True):
+        self.delete(indexes, below=below)
+        if cb:
+            async.DelayedCall(0, cb, key=indexes[-1], value=True)
+
+    def get_index(self, index, cb=None):
+        if cb:
+            async.DelayedCall(0, cb, key=index, value=self.get(index))
@@ -34,6 +34,11 @@ class StorageProxy(StorageBase):
         self.node = node
         self.tunnel = None
         self.replies = {}
+        # Set when the master tells that it handles BATCH and PIPELINE requests
+        self.batch = False
+        self.pipeline = False
+        # Requests waiting to be sent in one PIPELINE message
+        self.pending = []
         _log.info("PROXY init for %s", self.master_uri)
         super(StorageProxy, self).__init__()
 
@@ -113,14 +118,41 @@ class StorageProxy(StorageBase):
     def tunnel_recv_handler(self, payload):
         """ Gets called when a storage master replies"""
         _log.analyze(self.node.id, "+ CLIENT", {'payload': payload})
-        if 'msg_uuid' in payload and payload['msg_uuid'] in self.replies and 'cmd' in payload and payload['cmd']=='REPLY':
-            self.replies.pop(payload['msg_uuid'])(**{k: v for k, v in payload.iteritems() if k in ('key', 'value')})
+        if payload.get('cmd') == 'REPLIES':
+            for reply in payload['replies']:
+                self.tunnel_recv_handler(reply)
+        elif 'msg_uuid' in payload and payload['msg_uuid'] in self.replies and 'cmd' in payload and payload['cmd']=='REPLY':
+            self.batch = payload.get('batch', False)
+            self.pipeline = payload.get('pipeline', False)
+            self.replies.pop(payload['msg_uuid'])(**{k: v for k, v in payload.iteritems() if k in ('key', 'value', 'values')})
 
     def send(self, cmd, msg, cb):
         msg_id = calvinuuid.uuid("MSGID")
         self.replies[msg_id] = cb
         msg['msg_uuid'] = msg_id
-        self.tunnel.send(dict(msg, cmd=cmd, msg_uuid=msg_id))
+        if not self.pipeline:
+            self.tunnel.send(dict(msg, cmd=cmd, msg_uuid=msg_id))
+            return
+        # Send all requests made during this reactor turn together
+        if not self.pending:
+            async.DelayedCall(0, self._send_pending)
+        self.pending.append(dict(msg, cmd=cmd, msg_uuid=msg_id))
+
+    def _send_pending(self):
+        pending, self.pending = self.pending, []
+        if not self.tunnel:
+            # Tunnel went down, fail the requests
+            for msg in pending:
+                cb = self.replies.pop(msg['msg_uuid'])
+                if 'ops' in msg:
+                    cb(values=[{'key': op['key'], 'value': None} for op in msg['ops']])
+                else:
+                    cb(key=msg['key'], value=None)
+            return
+        if len(pending) == 1:
+            self.tunnel.send(pending[0])
+        elif pending:
+            self.tunnel.send({'cmd': 'PIPELINE', 'requests': pending})
 
     def set(self, key, value, cb=None):
         """
@@ -151,6 +183,36 @@ class StorageProxy(StorageBase):
         _log.analyze(self.node.id, "+ CLIENT", {'key': key, 'value': value})
         self.send(cmd='REMOVE',msg={'key':key, 'value': value}, cb=cb)
 
+    def _send_batch(self, cmd, items, cb):
+        self.send(cmd='BATCH', msg={'ops': [{'cmd': cmd, 'key': key, 'value': value} for key, value in items]},
+                  cb=CalvinCB(self._batch_reply, org_cb=cb))
+
+    def _batch_reply(self, values, org_cb):
+        if org_cb:
+            for reply in values:
+                org_cb(key=reply['key'], value=reply['value'])
+
+    def set_many(self, items, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'items': items})
+        if self.batch:
+            self._send_batch('SET', items, cb)
+        else:
+            super(StorageProxy, self).set_many(items, cb=cb)
+
+    def append_many(self, items, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'items': items})
+        if self.batch:
+            self._send_batch('APPEND', items, cb)
+        else:
+            super(StorageProxy, self).append_many(items, cb=cb)
+
+    def remove_many(self, items, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'items': items})
+        if self.batch:
+            self._send_batch('REMOVE', items, cb)
+        else:
+            super(StorageProxy, self).remove_many(items, cb=cb)
+
     def bootstrap(self, addrs, cb=None):
         _log.analyze(self.node.id, "+ CLIENT", None)
 
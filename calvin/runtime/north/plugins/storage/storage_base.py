@@ -74,6 +74,58 @@ class StorageBase(object):
     def remove(self, key, value, cb=None):
         raise NotImplementedError()
 
+    def set_many(self, items, cb=None):
+        """
+            Set several (key, value) pairs, cb is called once per key as for set.
+            Plugins that can send several operations in one request override these.
+        """
+        for key, value in items:
+            self.set(key=key, value=value, cb=cb)
+
+    def append_many(self, items, cb=None):
+        """
+            Append to several keys, items are (key, value) pairs as for append
+        """
+        for key, value in items:
+            self.append(key=key, value=value, cb=cb)
+
+    def remove_many(self, items, cb=None):
+        """
+            Remove from several keys, items are (key, value) pairs as for remove
+        """
+        for key, value in items:
+            self.remove(key=key, value=value, cb=cb)
+
+    def supports_index(self):
+        """
+            True when the plugin implements the index methods below,
+            otherwise the index is kept with append and remove on each index level
+        """
+        return False
+
+    def add_index(self, indexes, value, cb=None):
+        """
+            Add value at index string indexes[-1], queryable at each of the index strings in indexes
+        """
+        raise NotImplementedError()
+
+    def remove_index(self, indexes, value, cb=None):
+        raise NotImplementedError()
+
+    def delete_index(self, indexes, cb=None, below=True):
+        """
+            Remove the values at index string indexes[-1] and below it.
+            With below False only the values added at exactly indexes[-1] are removed,
+            as when deleting the set of one index level without an index capability.
+        """
+        raise NotImplementedError()
+
+    def get_index(self, index, cb=None):
+        """
+            Gets the values at index string index and below it
+        """
+        raise NotImplementedError()
+
     def bootstrap(self, addrs, cb=None):
         raise NotImplementedError()
 
@@ -15,6 +15,7 @@
 # limitations under the License.
 
 from calvin.runtime.south.plugins.async import async
+from calvin.runtime.north.plugins.storage.prefix_index import PrefixIndex
 
 
 class StorageLocal(object):
@@ -43,6 +44,7 @@ class StorageLocal(object):
     """
     def __init__(self, node=None):
         self._data = {}
+        self._index = PrefixIndex()
 
     def _dummy_cb(self, *args, **kwargs):
         pass
@@ -55,13 +57,16 @@ class StorageLocal(object):
         cb = cb or self._dummy_cb
         async.DelayedCall(0, cb, True)
 
+    def _set(self, key, value):
+        self._data[key] = value
+        return True
+
     def set(self, key, value, cb=None):
         """
             Set a key, value pair in the storage
         """
         cb = cb or self._dummy_cb
-        self._data[key] = value
-        async.DelayedCall(0, cb, key, True)
+        async.DelayedCall(0, cb, key, self._set(key, value))
 
     def get(self, key, cb=None):
         """
@@ -78,33 +83,68 @@ class StorageLocal(object):
             Gets a value from the storage
         """
         cb = cb or self._dummy_cb
-        if key in self._data and isinstance(self._data[key], list()):
+        if key in self._data and isinstance(self._data[key], list):
             async.DelayedCall(0, cb, key, self._data[key])
         else:
             async.DelayedCall(0, cb, key, None)
 
-    def append(self, key, value, cb=None):
-        cb = cb or self._dummy_cb
+    def _append(self, key, value):
         if key not in self._data:
             self._data[key] = [value]
         else:
             self._data[key] = list(set(self._data[key] + [value]))
-        async.DelayedCall(0, cb, key, True)
+        return True
 
-    def remove(self, key, value, cb=None):
+    def append(self, key, value, cb=None):
         cb = cb or self._dummy_cb
+        async.DelayedCall(0, cb, key, self._append(key, value))
+
+    def _remove(self, key, value):
         if key not in self._data:
-            async.DelayedCall(0, cb, key, False)
-        else:
-            if isinstance(self._data[key], list()):
-                if value in self._data[key]:
-                    self._data[key].remove(value)
-                    async.DelayedCall(0, cb, key, True)
-                else:
-                    async.DelayedCall(0, cb, key, False)
-            else:
-                self._data.pop(key)
-                async.DelayedCall(0, cb, key, True)
+            return False
+        if isinstance(self._data[key], list):
+            if value in self._data[key]:
+                self._data[key].remove(value)
+                return True
+            return False
+        self._data.pop(key)
+        return True
+
+    def remove(self, key, value, cb=None):
+        cb = cb or self._dummy_cb
+        async.DelayedCall(0, cb, key, self._remove(key, value))
+
+    def _many(self, op, items, cb):
+        results = [(key, op(key, value)) for key, value in items]
+        async.DelayedCall(0, self._many_cb, results, cb or self._dummy_cb)
+
+    def _many_cb(self, results, cb):
+        for key, status in results:
+            cb(key, status)
+
+    def set_many(self, items, cb=None):
+        self._many(self._set, items, cb)
+
+    def append_many(self, items, cb=None):
+        self._many(self._append, items, cb)
+
+    def remove_many(self, items, cb=None):
+        self._many(self._remove, items, cb)
+
+    def supports_index(self):
+        return True
+
+    def add_index(self, indexes, value, cb=None):
+        self._index.add_index(indexes, value, cb=cb)
+
+    def remove_index(self, indexes, value, cb=None):
+        self._index.remove_index(indexes, value, cb=cb)
+
+    def delete_index(self, indexes, cb=None, below=True):
+        self._index.delete_index(indexes, cb=cb, below=below)
+
+    def get_index(self, index, cb=None):
+        self._index.get_index(index, cb=cb)
 
     def bootstrap(self, addrs, cb=None):
         cb = cb or self._dummy_cb
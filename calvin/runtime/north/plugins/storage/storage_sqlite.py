@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import sqlite3
+from calvin.runtime.north.plugins.storage.storage_base import StorageBase
+from calvin.runtime.south.plugins.async import async
+from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
+
+_conf = calvinconfig.get()
+_log = calvinlogger.get_logger(__name__)
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS sets (key TEXT, value TEXT, PRIMARY KEY (key, value))",
+    # Index entries at their full index string, root is the shortest queryable prefix
+    "CREATE TABLE IF NOT EXISTS idx (path TEXT, value TEXT, root TEXT, PRIMARY KEY (path, value))"
+]
+
+
+def _canonical(item):
+    # Rows are keyed by the item's JSON, equal dicts must give the same string
+    return json.dumps(item, sort_keys=True)
+
+
+class StorageSQLite(StorageBase):
+    """
+        Registry kept in an SQLite database file in WAL mode, survives restarts of the runtime.
+        Intended for storage_type sqlite on stand alone runtimes and storage proxy masters.
+
+        Operations are executed directly, the database is committed once per reactor turn
+        and the callbacks are called after that. Set values (append/remove) are kept as one
+        row per item and index entries as one row per value, prefix queries are range scans.
+    """
+
+    def __init__(self, node=None):
+        super(StorageSQLite, self).__init__(node)
+        self.path = _conf.get('global', 'storage_sqlite_path')
+        self.db = None
+        self.commit_delayedcall = None
+        self.pending_cbs = []
+
+    def _dummy_cb(self, *args, **kwargs):
+        pass
+
+    def start(self, iface='', network='', bootstrap=[], cb=None, name=None, nodeid=None):
+        """
+            Opens the database, default location is ~/.calvin/storage/<runtime name>.db
+        """
+        cb = cb or self._dummy_cb
+        path = self.path
+        if not path:
+            path = os.path.join(os.path.expanduser("~"), ".calvin", "storage", "%s.db" % (name or nodeid))
+        try:
+            path = os.path.expanduser(path)
+            if path != ":memory:" and not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+                os.makedirs(os.path.dirname(os.path.abspath(path)))
+            self.open(path)
+        except Exception:
+            _log.exception("Failed to open registry database %s" % path)
+            async.DelayedCall(0, cb, False)
+            return
+        _log.info("Registry database %s" % path)
+        async.DelayedCall(0, cb, True)
+
+    def open(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.text_factory = str
+        if path != ":memory:":
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self.db.execute(statement)
+        self.db.commit()
+
+    def _done(self, cb, key, value):
+        # Callbacks are called when the changes are committed
+        if cb:
+            self.pending_cbs.append((cb, key, value))
+        if self.commit_delayedcall is None:
+            self.commit_delayedcall = async.DelayedCall(0, self._commit)
+
+    def _commit(self):
+        self.commit_delayedcall = None
+        committed = True
+        try:
+            self.db.commit()
+        except Exception:
+            _log.exception("Failed to commit registry database")
+            committed = False
+            try:
+                self.db.rollback()
+            except Exception:
+                pass
+        pending_cbs, self.pending_cbs = self.pending_cbs, []
+        for cb, key, value in pending_cbs:
+            # The changes are lost when the commit failed
+            cb(key=key, value=value and committed)
+
+    def _decode_items(self, value):
+        return [_canonical(item) for item in json.loads(value)]
+
+    def _set(self, key, value):
+        self.db.execute("DELETE FROM sets WHERE key=?", (key,))
+        if value is None:
+            self.db.execute("DELETE FROM kv WHERE key=?", (key,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
+        return True
+
+    def _append(self, key, value):
+        self.db.executemany("INSERT OR IGNORE INTO sets (key, value) VALUES (?, ?)",
+                            [(key, item) for item in self._decode_items(value)])
+        return True
+
+    def _remove(self, key, value):
+        self.db.executemany("DELETE FROM sets WHERE key=? AND value=?",
+                            [(key, item) for item in self._decode_items(value)])
+        return True
+
+    def _many(self, op, items, cb):
+        for key, value in items:
+            self._done(cb, key, op(key, value))
+
+    def set(self, key, value, cb=None):
+        """
+            Set a key, value pair in the storage
+        """
+        self._done(cb, key, self._set(key, value))
+
+    def set_many(self, items, cb=None):
+        self._many(self._set, items, cb)
+
+    def _get_concat(self, key):
+        items = [json.loads(row[0]) for row in self.db.execute("SELECT value FROM sets WHERE key=?", (key,))]
+        return json.dumps(items) if items else None
+
+    def get(self, key, cb=None):
+        """
+            Gets a value from the storage
+        """
+        row = self.db.execute("SELECT value FROM kv WHERE key=?", (key,)).fetchone()
+        value = row[0] if row else self._get_concat(key)
+        async.DelayedCall(0, cb or self._dummy_cb, key, value)
+
+    def get_concat(self, key, cb=None):
+        """
+            Gets the items appended to key
+        """
+        async.DelayedCall(0, cb or self._dummy_cb, key, self._get_concat(key))
+
+    def append(self, key, value, cb=None):
+        self._done(cb, key, self._append(key, value))
+
+    def append_many(self, items, cb=None):
+        self._many(self._append, items, cb)
+
+    def remove(self, key, value, cb=None):
+        self._done(cb, key, self._remove(key, value))
+
+    def remove_many(self, items, cb=None):
+        self._many(self._remove, items, cb)
+
+    def supports_index(self):
+        return True
+
+    def add_index(self, indexes, value, cb=None):
+        self.db.execute("INSERT OR IGNORE INTO idx (path, value, root) VALUES (?, ?, ?)",
+                        (indexes[-1], _canonical(value), indexes[0]))
+        self._done(cb, indexes[-1], True)
+
+    def remove_index(self, indexes, value, cb=None):
+        self.db.execute("DELETE FROM idx WHERE path=? AND value=?", (indexes[-1], _canonical(value)))
+        self._done(cb, indexes[-1], True)
+
+    def delete_index(self, indexes, cb=None, below=True):
+        index = indexes[-1]
+        if below:
+            # Paths below index are in the range [index + "/", index + "0"), "0" follows "/"
+            self.db.execute("DELETE FROM idx WHERE path=? OR (path>=? AND path<?)", (index, index + "/", index + "0"))
+        else:
+            self.db.execute("DELETE FROM idx WHERE path=?", (index,))
+        self._done(cb, index, True)
+
+    def get_index(self, index, cb=None):
+        # Only entries that are queryable at index, i.e. with a root at or above it
+        rows = self.db.execute("SELECT DISTINCT value FROM idx WHERE (path=? OR (path>=? AND path<?)) AND "
+                               "substr(?, 1, length(root))=root", (index, index + "/", index + "0", index))
+        async.DelayedCall(0, cb or self._dummy_cb, key=index, value=[json.loads(row[0]) for row in rows])
+
+    def bootstrap(self, addrs, cb=None):
+        async.DelayedCall(0, cb or self._dummy_cb, True)
+
+    def stop(self, cb=None):
+        if self.commit_delayedcall is not None:
+            self.commit_delayedcall.cancel()
+            self._commit()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        if cb:
+            async.DelayedCall(0, cb, True)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import deque
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+
+class ActionProfile(object):
+    """Call count and firing latency of one action"""
+
+    # Number of latency samples kept for percentiles
+    SAMPLES = 1000
+
+    def __init__(self):
+        super(ActionProfile, self).__init__()
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=self.SAMPLES)
+
+    def fired(self, duration):
+        self.count += 1
+        self.total += duration
+        self.samples.append(duration)
+
+    def info(self):
+        samples = sorted(self.samples)
+        n = len(samples)
+        return {
+            'count': self.count,
+            'total': self.total,
+            'p50': samples[n // 2] if n else 0.0,
+            'p99': samples[min(n - 1, n * 99 // 100)] if n else 0.0
+        }
+
+
+class Profiler(object):
+    """
+    Runtime profiling, toggled through the control API.
+    Hooks in the actor, scheduler and tunnel endpoints check enabled before calling
+    the profiler, so a disabled profiler costs an attribute lookup.
+    """
+
+    def __init__(self):
+        super(Profiler, self).__init__()
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.start_time = time.time()
+        # actor id -> action name -> ActionProfile
+        self.actions = {}
+        self.actor_names = {}
+        self.loop_count = 0
+        self.loop_time = 0.0
+        self.loop_max = 0.0
+        # port id -> [tokens sent, tokens received]
+        self.tunnels = {}
+
+    def enable(self):
+        if not self.enabled:
+            self.reset()
+            self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def action_fired(self, actor, action_name, duration):
+        actions = self.actions.get(actor._id)
+        if actions is None:
+            actions = self.actions[actor._id] = {}
+            self.actor_names[actor._id] = actor._name
+        profile = actions.get(action_name)
+        if profile is None:
+            profile = actions[action_name] = ActionProfile()
+        profile.fired(duration)
+
+    def loop(self, duration):
+        self.loop_count += 1
+        self.loop_time += duration
+        if duration > self.loop_max:
+            self.loop_max = duration
+
+    def tokens_sent(self, port_id, count):
+        self.tunnels.setdefault(port_id, [0, 0])[0] += count
+
+    def tokens_received(self, port_id, count):
+        self.tunnels.setdefault(port_id, [0, 0])[1] += count
+
+    def _queue_fill(self, queue):
+        # FIXME uses internal queue attributes, the queue types keep either one write position or one per peer
+        write_pos = getattr(queue, 'write_pos', None)
+        read_pos = getattr(queue, 'read_pos', None)
+        if write_pos is None or not read_pos:
+            return 0
+        if isinstance(write_pos, (int, long)):
+            return write_pos - min(read_pos.values())
+        return max(write_pos[p] - read_pos.get(p, write_pos[p]) for p in write_pos) if write_pos else 0
+
+    def ports(self, actors):
+        """Current queue fill of all ports of actors"""
+        ports = {}
+        for actor in actors:
+            for port in actor.inports.values() + actor.outports.values():
+                try:
+                    ports[port.id] = {
+                        'actor_id': actor._id,
+                        'name': port.name,
+                        'direction': port.direction,
+                        'fill': self._queue_fill(port.queue),
+                        'length': port.queue.N - 1
+                    }
+                except Exception:
+                    _log.debug("No queue info for port %s" % port.id)
+        return ports
+
+    def snapshot(self, actors=None):
+        """JSON serializable snapshot of the profile"""
+        duration = max(time.time() - self.start_time, 1e-9)
+        return {
+            'enabled': self.enabled,
+            'duration': duration,
+            'scheduler': {
+                'iterations': self.loop_count,
+                'loop_time': self.loop_time,
+                'avg_iteration': self.loop_time / self.loop_count if self.loop_count else 0.0,
+                'max_iteration': self.loop_max,
+                'idle_ratio': max(0.0, 1.0 - self.loop_time / duration)
+            },
+            'actors': {actor_id: {'name': self.actor_names[actor_id],
+                                  'actions': {name: p.info() for name, p in actions.items()}}
+                       for actor_id, actions in self.actions.items()},
+            'tunnels': {port_id: {'sent': c[0], 'received': c[1],
+                                  'sent_rate': c[0] / duration, 'received_rate': c[1] / duration}
+                        for port_id, c in self.tunnels.items()},
+            'ports': self.ports(actors or [])
+        }
+
+    def collapsed_stacks(self, root="runtime"):
+        """
+        Firing time in the collapsed stack format used by flame graph tools,
+        one line per action: <root>;<actor name>;<action name> <microseconds>
+        """
+        lines = []
+        for actor_id, actions in self.actions.items():
+            for name, profile in actions.items():
+                lines.append("%s;%s;%s %d" % (root, self.actor_names[actor_id], name, int(profile.total * 1e6)))
+        return "\n".join(sorted(lines)) + "\n"
+
+
+_profiler = Profiler()
+
+
+def get_profiler():
+    """ Returns the Profiler singleton
+    """
+    return _profiler
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import OrderedDict
+
+
+class RegistryCache(object):
+    """
+    Bounded LRU cache of registry values with a time to live per key prefix.
+    Keys whose prefix has no time to live are never cached.
+    """
+
+    def __init__(self, size, ttls):
+        super(RegistryCache, self).__init__()
+        self.size = size
+        # Longest prefix first
+        self.ttls = sorted(ttls.items(), key=lambda p: len(p[0]), reverse=True)
+        self.entries = OrderedDict()
+        # key -> generation of its last invalidation, the oldest are dropped
+        # and then reflected in the generation of keys not invalidated since
+        self.generations = OrderedDict()
+        self._generation = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _ttl(self, key):
+        for prefix, ttl in self.ttls:
+            if key.startswith(prefix):
+                return ttl
+        return 0
+
+    def get(self, key):
+        """Return cached value of key, or None when not cached or expired"""
+        entry = self.entries.pop(key, None)
+        if entry is None or entry[0] < time.time():
+            if entry is not None or self._ttl(key) > 0:
+                self.misses += 1
+            return None
+        # Most recently used last
+        self.entries[key] = entry
+        self.hits += 1
+        return entry[1]
+
+    def generation(self, key):
+        """Return a token to pass to put with a value read from storage,
+           the value is then not cached when key was invalidated after the token was taken
+        """
+        return self.generations.get(key, self._floor)
+
+    def put(self, key, value, generation=None):
+        ttl = self._ttl(key)
+        if not self.size or ttl <= 0:
+            return
+        if generation is not None and generation != self.generation(key):
+            return
+        self.entries.pop(key, None)
+        self.entries[key] = (time.time() + ttl, value)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+        self._generation += 1
+        self.generations.pop(key, None)
+        self.generations[key] = self._generation
+        if len(self.generations) > self.size:
+            _, self._floor = self.generations.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.generations.clear()
+        self._generation += 1
+        self._floor = self._generation
+
+    def info(self):
+        return {'size': len(self.entries), 'max_size': self.size, 'hits': self.hits, 'misses': self.misses}
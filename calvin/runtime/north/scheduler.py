@@ -17,20 +17,28 @@
 import sys
 import time
 import random
+from collections import deque
 
 from calvin.runtime.south.plugins.async import async
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.calvinlogger import get_logger
 from calvin.utilities import calvinconfig
+from calvin.runtime.north.profiler import get_profiler
 
 _log = get_logger(__name__)
 _conf = calvinconfig.get()
+_profiler = get_profiler()
 
 
 class Scheduler(object):
 
     """docstring for Scheduler"""
 
+    # Time (in seconds) spent firing actors before letting the event loop run again
+    ROUND_TIME = 0.100
+    # Upper limit of the time slice given to cheap actors, see ActorCost.time_slice
+    MAX_FIRE_TIME_SLICE = 0.050
+
     def __init__(self, node, actor_mgr, monitor):
         super(Scheduler, self).__init__()
         self.actor_mgr = actor_mgr
@@ -56,6 +64,14 @@ class Scheduler(object):
         self.done = True
 
     def loop_once(self, all_=False):
+        if _profiler.enabled:
+            start_time = time.time()
+            self._loop_once_body(all_)
+            _profiler.loop(time.time() - start_time)
+        else:
+            self._loop_once_body(all_)
+
+    def _loop_once_body(self, all_):
         try:
             activity = self.monitor.loop(self)
         except:
@@ -88,7 +104,10 @@ class Scheduler(object):
         """ Trigger the loop_once potentially after waiting delay seconds """
         if delay > 0:
             _log.debug("Delayed trigger %s" % delay)
-            async.DelayedCall(delay, self.loop_once, True)
+            if actor_ids is None:
+                async.DelayedCall(delay, self.loop_once, True)
+            else:
+                async.DelayedCall(delay, self.trigger_loop, 0, actor_ids)
         else:
             # Never have more then one outstanding loop_once
             if actor_ids is None:
@@ -105,6 +124,10 @@ class Scheduler(object):
                 if self._loop_once is None:
                     self._loop_once = async.DelayedCall(0, self.loop_once)
 
+    def endpoints_communicated(self, endpoints):
+        """ Called by the monitor with the endpoints that transferred tokens during its loop """
+        pass
+
     def _log_exception_during_fire(self, e):
         _log.exception(e)
 
@@ -119,19 +142,10 @@ class Scheduler(object):
         start_time = time.time()
         timeout = False
         for actor in actors:
-            try:
-                _log.debug("Fire actor %s (%s, %s)" % (actor.name, actor._type, actor.id))
-                did_fire |= actor.fire()
-                actor_ids.add(actor.id)
-            except Exception as e:
-                self._log_exception_during_fire(e)
-
-            pressure = actor.get_pressure().values()
-            pressure_values = [p for _, _, p in pressure]
-            if self.actor_pressures.get(actor.id, False) != pressure_values:
-                self.actor_pressures[actor.id] = pressure_values
-
-            timeout = time.time() - start_time > 0.100
+            did_fire |= self._fire_actor(actor, start_time)
+            actor_ids.add(actor.id)
+
+            timeout = time.time() - start_time > self.ROUND_TIME
             if timeout:
                 break
 
@@ -140,6 +154,26 @@ class Scheduler(object):
 
         return (did_fire, timeout, actor_ids)
 
+    def _fire_actor(self, actor, start_time):
+        """
+        Fire actor with a time slice sized from its firing cost, but not beyond what is left of the
+        round started at start_time. Returns True if any action fired.
+        """
+        did_fire = False
+        time_slice = actor.cost.time_slice(actor.FIRE_TIME_SLICE, self.MAX_FIRE_TIME_SLICE)
+        time_slice = max(0.0, min(time_slice, start_time + self.ROUND_TIME - time.time()))
+        try:
+            _log.debug("Fire actor %s (%s, %s)" % (actor.name, actor._type, actor.id))
+            did_fire = actor.fire(time_slice)
+        except Exception as e:
+            self._log_exception_during_fire(e)
+
+        pressure = actor.get_pressure().values()
+        pressure_values = [p for _, _, p in pressure]
+        if self.actor_pressures.get(actor.id, False) != pressure_values:
+            self.actor_pressures[actor.id] = pressure_values
+        return did_fire
+
     def maintenance_loop(self):
         # Migrate denied actors
         for actor in self.actor_mgr.migratable_actors():
@@ -162,6 +196,76 @@ class Scheduler(object):
             self._maintenance_loop = async.DelayedCall(0, self.maintenance_loop)
 
 
+class ReadyQueueScheduler(Scheduler):
+    """
+    Scheduler that only fires actors that have been marked runnable.
+
+    Actors are marked runnable when tokens arrive on or leave their ports (see
+    endpoints_communicated and the tunnel endpoints), by calvinsys events and timers
+    triggering with actor ids, and after each firing. Runnable actors are kept in a
+    FIFO ready queue which is served round robin within the same 100 ms time slice
+    as the full sweep scheduler. A trigger without actor ids still results in a full
+    sweep of all enabled actors, since the caller can't tell which actor to wake up.
+    """
+
+    def __init__(self, node, actor_mgr, monitor):
+        super(ReadyQueueScheduler, self).__init__(node, actor_mgr, monitor)
+        self._ready = deque()
+        self._ready_ids = set()
+
+    def trigger_loop(self, delay=0, actor_ids=None):
+        """ Mark actor_ids runnable and trigger the loop_once potentially after waiting delay seconds """
+        if delay > 0 or actor_ids is None:
+            super(ReadyQueueScheduler, self).trigger_loop(delay, actor_ids)
+            return
+        self.mark_runnable(actor_ids)
+        if self._loop_once is None:
+            self._loop_once = async.DelayedCall(0, self.loop_once)
+
+    def mark_runnable(self, actor_ids):
+        """ Append actor_ids to the ready queue, actors already queued keep their place """
+        for actor_id in actor_ids:
+            if actor_id is None or actor_id in self._ready_ids:
+                continue
+            self._ready_ids.add(actor_id)
+            self._ready.append(actor_id)
+
+    def endpoints_communicated(self, endpoints):
+        for endpoint in endpoints:
+            self.mark_runnable(endpoint.runnable_actor_ids())
+
+    def fire_actors(self, actor_ids=None):
+        if actor_ids is None:
+            # Full sweep requested, e.g. by heartbeat or a trigger without actor ids
+            self.mark_runnable([actor.id for actor in self.actor_mgr.enabled_actors()])
+
+        did_fire = False
+        fired_ids = set()
+        start_time = time.time()
+        timeout = False
+        # Only fire actors queued before this round, actors marked during the round are fired
+        # in the next round after the monitor has let the endpoints transfer their tokens
+        for _ in range(len(self._ready)):
+            actor_id = self._ready.popleft()
+            self._ready_ids.discard(actor_id)
+            actor = self.actor_mgr.actors.get(actor_id)
+            if actor is None or not actor.enabled():
+                continue
+            if self._fire_actor(actor, start_time):
+                did_fire = True
+                # Fired actors are requeued at the tail by loop_once, giving round robin
+                fired_ids.add(actor.id)
+
+            timeout = time.time() - start_time > self.ROUND_TIME
+            if timeout:
+                break
+
+        self.idle = False if timeout else not did_fire
+
+        # Actors left in the ready queue need another loop, same as when the time slice ran out
+        return (did_fire, timeout or bool(self._ready), fired_ids)
+
+
 class DebugScheduler(Scheduler):
     """This is an instrumented version of the scheduler for use in debugging runs."""
 
@@ -185,3 +289,18 @@ class DebugScheduler(Scheduler):
         from infi.traceback import traceback_context
         traceback_context()
         return super(DebugScheduler, self).fire_actors(actor_ids)
+
+
+def scheduler_class(debug=False):
+    """
+    Return the scheduler class selected with the global config option 'scheduler',
+    one of 'default', 'debug' or 'ready_queue'. When not set the debug scheduler is
+    used if debug is True, otherwise the default scheduler.
+    """
+    name = _conf.get(None, 'scheduler')
+    if name is None:
+        return DebugScheduler if debug else Scheduler
+    schedulers = {'default': Scheduler, 'debug': DebugScheduler, 'ready_queue': ReadyQueueScheduler}
+    if name not in schedulers:
+        _log.error("Unknown scheduler '%s', using default scheduler" % name)
+    return schedulers.get(name, Scheduler)
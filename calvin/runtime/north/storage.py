@@ -15,6 +15,7 @@
 # limitations under the License.
 
 from calvin.runtime.north.plugins.storage import storage_factory
+from calvin.runtime.north.plugins.storage.prefix_index import PrefixIndex
 from calvin.runtime.north.plugins.coders.messages import message_coder_factory
 from calvin.csparser.port_property_syntax import list_port_property_capabilities
 from calvin.runtime.south.plugins.async import async
@@ -28,6 +29,7 @@ from calvin.utilities.security import Security, security_enabled
 from calvin.utilities import dynops
 from calvin.runtime.north.calvinsys import get_calvinsys
 from calvin.runtime.north.calvinlib import get_calvinlib
+from calvin.runtime.north.registry_cache import RegistryCache
 import re
 
 _log = calvinlogger.get_logger(__name__)
@@ -40,6 +42,11 @@ class Storage(object):
     All functions in this class should be async and never block.
     """
 
+    # Max number of keys written in one multi-key storage operation when flushing
+    FLUSH_BATCH_SIZE = 100
+    # Seconds before a proxy client gets the reply to a BATCH request with the operations done so far
+    BATCH_TIMEOUT = 5.0
+
     def __init__(self, node, override_storage=None):
         self.localstore = {}
         self.localstore_sets = {}
@@ -55,7 +62,18 @@ class Storage(object):
             self.storage = override_storage
         else:
             self.storage = storage_factory.get(storage_type, node)
+        if self.storage is None:
+            # Local only storage, keep the index in this runtime
+            self.index_backend = PrefixIndex()
+        elif self.storage.supports_index():
+            self.index_backend = self.storage
+        else:
+            # E.g. DHT or proxy storage, index levels are kept as sets with append and remove, see add_index
+            self.index_backend = None
         self.coder = message_coder_factory.get("json")  # TODO: always json? append/remove requires json at the moment
+        # Encoded values retrieved from storage, tagged with the operation (get or get_concat) that retrieved them
+        self.cache = RegistryCache(_conf.get('global', 'storage_cache_size') or 0,
+                                   _conf.get('global', 'storage_cache_ttl') or {})
         self.flush_delayedcall = None
         self.reset_flush_timeout()
 
@@ -82,32 +100,22 @@ class Storage(object):
         if self.flush_timeout < 600:
             self.flush_timeout = self.flush_timeout * 2
         self.flush_delayedcall = None
-        for key in self.localstore:
-            _log.debug("Flush key %s: %s" % (key, self.localstore[key]))
-            self.storage.set(key=key, value=self.localstore[key],
-                             cb=CalvinCB(func=self.set_cb, org_key=None, org_value=None, org_cb=None, silent=True))
-
-        for key, value in self.localstore_sets.iteritems():
-            self._flush_append(key, value['+'])
-            self._flush_remove(key, value['-'])
-
-    def _flush_append(self, key, value):
-        if not value:
-            return
-
-        _log.debug("Flush append on key %s: %s" % (key, list(value)))
-        coded_value = self.coder.encode(list(value))
-        self.storage.append(key=key, value=coded_value,
-                            cb=CalvinCB(func=self.append_cb, org_key=None, org_value=None, org_cb=None, silent=True))
-
-    def _flush_remove(self, key, value):
-        if not value:
-            return
-
-        _log.debug("Flush remove on key %s: %s" % (key, list(value)))
-        coded_value = self.coder.encode(list(value))
-        self.storage.remove(key=key, value=coded_value,
-                            cb=CalvinCB(func=self.remove_cb, org_key=None, org_value=None, org_cb=None, silent=True))
+        _log.debug("Flush keys %s" % self.localstore.keys())
+        self._flush_batches(self.storage.set_many, self.localstore.items(), self.set_cb)
+
+        appends = [(key, self.coder.encode(list(value['+'])))
+                   for key, value in self.localstore_sets.iteritems() if value['+']]
+        removes = [(key, self.coder.encode(list(value['-'])))
+                   for key, value in self.localstore_sets.iteritems() if value['-']]
+        _log.debug("Flush append on keys %s" % [key for key, _ in appends])
+        self._flush_batches(self.storage.append_many, appends, self.append_cb)
+        _log.debug("Flush remove on keys %s" % [key for key, _ in removes])
+        self._flush_batches(self.storage.remove_many, removes, self.remove_cb)
+
+    def _flush_batches(self, func, items, cb):
+        for i in xrange(0, len(items), self.FLUSH_BATCH_SIZE):
+            func(items=items[i:i + self.FLUSH_BATCH_SIZE],
+                 cb=CalvinCB(func=cb, org_key=None, org_value=None, org_cb=None, silent=True))
 
     def started_cb(self, *args, **kwargs):
         """ Called when storage has started, flushes localstore
@@ -129,7 +137,10 @@ class Storage(object):
             fp.write("[")
             json.dump({k: json.loads(v) for k, v in self.localstore.items()}, fp)
             fp.write(", ")
-            json.dump({k: list(v['+']) for k, v in self.localstore_sets.items()}, fp)
+            sets = {k: list(v['+']) for k, v in self.localstore_sets.items()}
+            if isinstance(self.index_backend, PrefixIndex):
+                sets.update({"index-" + k: v for k, v in self.index_backend.dump().items()})
+            json.dump(sets, fp)
             fp.write("]")
             name = fp.name
         return name
@@ -153,13 +164,18 @@ class Storage(object):
     def _init_proxy(self):
         _log.analyze(self.node.id, "+ SERVER", None)
         # We are not proxy client, so we can be proxy bridge/master
-        self._proxy_cmds = {'GET': self.get,
-                            'SET': self.set,
-                            'GET_CONCAT': self.get_concat,
-                            'APPEND': self.append,
-                            'REMOVE': self.remove,
-                            'DELETE': self.delete,
+        self._proxy_cmds = {'GET': self._proxy_get,
+                            'SET': self._proxy_set,
+                            'GET_CONCAT': self._proxy_get_concat,
+                            'APPEND': self._proxy_append,
+                            'REMOVE': self._proxy_remove,
+                            'DELETE': self._proxy_delete,
                             'REPLY': self._proxy_reply}
+        # In progress GET and GET_CONCAT lookups, (cmd, key) -> reply callbacks
+        self._proxy_flights = {}
+        # Ids of tunnels sending PIPELINE requests and their replies waiting to be sent
+        self._proxy_pipelined = set()
+        self._proxy_replies = {}
         try:
             self.node.proto.register_tunnel_handler('storage', CalvinCB(self.tunnel_request_handles))
         except:
@@ -178,6 +194,18 @@ class Storage(object):
 
     ### Storage operations ###
 
+    def _cached(self, op, key):
+        entry = self.cache.get(key)
+        if entry is None or entry[0] != op:
+            return None
+        return entry[1]
+
+    def invalidate(self, prefix, key):
+        """ Drop registry key: prefix+key from the read cache,
+            e.g. when the cached value turned out to be stale.
+        """
+        self.cache.invalidate(prefix + key)
+
     def set_cb(self, key, value, org_key, org_value, org_cb, silent=False):
         """ set callback, on error store in localstore and retry after flush_timeout
         """
@@ -207,7 +235,10 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Set key %s, value %s" % (prefix + key, value))
-        value = self.coder.encode(value) if value else value
+        self._set_encoded(prefix, key, self.coder.encode(value) if value else value, cb)
+
+    def _set_encoded(self, prefix, key, value, cb):
+        self.cache.invalidate(prefix + key)
 
         if prefix + key in self.localstore_sets:
             del self.localstore_sets[prefix + key]
@@ -238,25 +269,38 @@ class Storage(object):
         """
         if not cb:
             return
+        self._get_encoded(prefix + key, CalvinCB(func=self.get_cb, org_cb=cb, org_key=key))
 
-        if prefix + key in self.localstore:
-            value = self.localstore[prefix + key]
-            if value:
-                value = self.coder.decode(value)
+    def _get_encoded(self, key, cb):
+        """ Get the encoded value of registry key from local data, cache or storage,
+            callback cb with signature cb(key=key, value=<encoded value>/None/False)
+        """
+        if key in self.localstore:
+            async.DelayedCall(0, cb, key=key, value=self.localstore[key])
+            return
+        value = self._cached('get', key)
+        if value is not None:
             async.DelayedCall(0, cb, key=key, value=value)
-        else:
-            try:
-                self.storage.get(key=prefix + key, cb=CalvinCB(func=self.get_cb, org_cb=cb, org_key=key))
-            except:
-                if self.started:
-                    _log.error("Failed to get: %s" % key)
-                async.DelayedCall(0, cb, key=key, value=False)
+            return
+        try:
+            self.storage.get(key=key, cb=CalvinCB(func=self._get_encoded_cb, org_cb=cb,
+                                                  generation=self.cache.generation(key)))
+        except:
+            if self.started:
+                _log.error("Failed to get: %s" % key)
+            async.DelayedCall(0, cb, key=key, value=False)
+
+    def _get_encoded_cb(self, key, value, org_cb, generation=None):
+        if value:
+            self.cache.put(key, ('get', value), generation)
+        org_cb(key=key, value=value)
 
-    def get_iter_cb(self, key, value, it, org_key, include_key=False):
+    def get_iter_cb(self, key, value, it, org_key, include_key=False, generation=None):
         """ get callback
         """
         _log.analyze(self.node.id, "+ BEGIN", {'value': value, 'key': org_key})
         if value:
+            self.cache.put(key, ('get', value), generation)
             value = self.coder.decode(value)
             it.append((key, value) if include_key else value)
             _log.analyze(self.node.id, "+", {'value': value, 'key': org_key})
@@ -288,20 +332,27 @@ class Storage(object):
                     value = self.coder.decode(value)
                 _log.analyze(self.node.id, "+", {'value': value, 'key': key})
                 it.append((key, value) if include_key else value)
+                return
+            value = self._cached('get', prefix + key)
+            if value is not None:
+                value = self.coder.decode(value)
+                it.append((key, value) if include_key else value)
             else:
                 try:
                     self.storage.get(key=prefix + key,
-                                     cb=CalvinCB(func=self.get_iter_cb, it=it, org_key=key, include_key=include_key))
+                                     cb=CalvinCB(func=self.get_iter_cb, it=it, org_key=key, include_key=include_key,
+                                                 generation=self.cache.generation(prefix + key)))
                 except:
                     if self.started:
                         _log.analyze(self.node.id, "+", {'value': 'FailedElement', 'key': key})
                         _log.error("Failed to get: %s" % key)
                     it.append((key, dynops.FailedElement) if include_key else dynops.FailedElement)
 
-    def get_concat_cb(self, key, value, org_cb, org_key, local_list):
+    def get_concat_cb(self, key, value, org_cb, org_key, local_list, generation=None):
         """ get callback
         """
         if value:
+            self.cache.put(key, ('get_concat', value), generation)
             value = self.coder.decode(value)
             if isinstance(value, (list, tuple, set)):
                 org_cb(org_key, list(set(value + local_list)))
@@ -336,19 +387,47 @@ class Storage(object):
             local_list = list(value['+'])
         else:
             local_list = []
+        value = self._cached('get_concat', prefix + key)
+        if value is not None:
+            async.DelayedCall(0, self.get_concat_cb, key=prefix + key, value=value, org_cb=cb, org_key=key,
+                              local_list=local_list)
+            return
         try:
             self.storage.get_concat(key=prefix + key,
-                                    cb=CalvinCB(func=self.get_concat_cb, org_cb=cb, org_key=key, local_list=local_list))
+                                    cb=CalvinCB(func=self.get_concat_cb, org_cb=cb, org_key=key, local_list=local_list,
+                                                generation=self.cache.generation(prefix + key)))
         except:
             if self.started:
                 _log.error("Failed to get: %s" % key, exc_info=True)
             async.DelayedCall(0, cb, key=key, value=local_list if local_list else None)
 
-    def get_concat_iter_cb(self, key, value, org_key, include_key, it):
+    def _get_concat_encoded(self, key, cb):
+        """ Get the encoded values stored at registry key, without local additions,
+            callback cb with signature cb(key=key, value=<encoded list>/None)
+        """
+        value = self._cached('get_concat', key)
+        if value is not None:
+            async.DelayedCall(0, cb, key=key, value=value)
+            return
+        try:
+            self.storage.get_concat(key=key, cb=CalvinCB(func=self._get_concat_encoded_cb, org_cb=cb,
+                                                         generation=self.cache.generation(key)))
+        except:
+            if self.started:
+                _log.error("Failed to get: %s" % key, exc_info=True)
+            async.DelayedCall(0, cb, key=key, value=None)
+
+    def _get_concat_encoded_cb(self, key, value, org_cb, generation=None):
+        if value:
+            self.cache.put(key, ('get_concat', value), generation)
+        org_cb(key=key, value=value)
+
+    def get_concat_iter_cb(self, key, value, org_key, include_key, it, generation=None):
         """ get callback
         """
         _log.analyze(self.node.id, "+ BEGIN", {'key': org_key, 'value': value, 'iter': str(it)})
         if value:
+            self.cache.put(key, ('get_concat', value), generation)
             value = self.coder.decode(value)
             _log.analyze(self.node.id, "+ VALUE", {'value': value, 'key': org_key})
             if isinstance(value, (list, tuple, set)):
@@ -388,10 +467,16 @@ class Storage(object):
         if include_key:
             local_list = [(key, v) for v in local_list]
         it = dynops.List(local_list)
+        value = self._cached('get_concat', prefix + key)
+        if value is not None:
+            self.get_concat_iter_cb(key=prefix + key, value=value, org_key=key, include_key=include_key, it=it)
+            _log.analyze(self.node.id, "+ END CACHED", {'key': key, 'iter': str(it)})
+            return it
         try:
             self.storage.get_concat(key=prefix + key,
                             cb=CalvinCB(func=self.get_concat_iter_cb, org_key=key,
-                                        include_key=include_key, it=it))
+                                        include_key=include_key, it=it,
+                                        generation=self.cache.generation(prefix + key)))
         except:
             if self.started:
                 _log.error("Failed to get: %s" % key, exc_info=True)
@@ -428,6 +513,7 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Append key %s, value %s" % (prefix + key, value))
+        self.cache.invalidate(prefix + key)
         # Keep local storage for sets updated until confirmed
         if (prefix + key) in self.localstore_sets:
             # Append value items
@@ -474,6 +560,7 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Remove key %s, value %s" % (prefix + key, value))
+        self.cache.invalidate(prefix + key)
         # Keep local storage for sets updated until confirmed
         if (prefix + key) in self.localstore_sets:
             # Don't append value items any more
@@ -501,6 +588,7 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Deleting key %s" % prefix + key)
+        self.cache.invalidate(prefix + key)
         if prefix + key in self.localstore:
             del self.localstore[prefix + key]
         if (prefix + key) in self.localstore_sets:
@@ -877,6 +965,12 @@ class Storage(object):
         indexes = ['/'+'/'.join(items[:l]) for l in range(1,len(items)+1)]
         return indexes
 
+    def _index_changed(self):
+        # Requirement matching is evaluated on the indexes
+        req_match_cache = getattr(self.node, 'req_match_cache', None)
+        if req_match_cache is not None:
+            req_match_cache.invalidate()
+
     def add_index(self, index, value, root_prefix_level=3, cb=None):
         """
         Add single value (e.g. a node id) to a set stored in registry
@@ -894,14 +988,18 @@ class Storage(object):
             value indicate success.
         """
 
-        # TODO this implementation will store the value to each level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
+        # Without an index capable storage backend the value is stored to each level of the index.
+        # A prefix hash table on top of the DHT would need the same number of updates but
+        # more lookups for a query.
 
         _log.debug("add index %s: %s" % (index, value))
 
         indexes = self._index_strings(index, root_prefix_level)
+        self._index_changed()
+
+        if self.index_backend:
+            self.index_backend.add_index(indexes, value, cb=cb)
+            return
 
         # make copy of indexes since altered in callbacks
         for i in indexes[:]:
@@ -926,10 +1024,7 @@ class Storage(object):
             value indicate success.
         """
 
-        # TODO this implementation will delete the value to each level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
+        # Without an index capable storage backend the value is deleted from each level of the index.
 
         # TODO Currently we don't go deeper than the specified index for a remove,
         # e.g. node/affiliation/owner/com.ericsson would remove the value from
@@ -938,6 +1033,11 @@ class Storage(object):
         _log.debug("remove index %s: %s" % (index, value))
 
         indexes = self._index_strings(index, root_prefix_level)
+        self._index_changed()
+
+        if self.index_backend:
+            self.index_backend.remove_index(indexes, value, cb=cb)
+            return
 
         # make copy of indexes since altered in callbacks
         for i in indexes[:]:
@@ -959,9 +1059,19 @@ class Storage(object):
         cb: Callback with signature cb(key=key, value=True/False)
             note that the key here is without the prefix and
             value indicate success.
+
+        With an index backend the entries at index and below it are removed. Without one,
+        the set of each level from the root prefix level down to index is deleted, including
+        values added at other indexes below those levels. The two are the same when the root
+        prefix level is the full index.
         """
 
         indexes = self._index_strings(index, root_prefix_level)
+        self._index_changed()
+
+        if self.index_backend:
+            self.index_backend.delete_index(indexes, cb=cb)
+            return
 
         # make copy of indexes since altered in callbacks
         for i in indexes[:]:
@@ -989,10 +1099,7 @@ class Storage(object):
         not yet distributed.
         """
 
-        # TODO this implementation will get the value from the level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
+        # Without an index capable storage backend the values are retrieved from the level of the index.
 
         if isinstance(index, list):
             index = "/".join(index)
@@ -1000,8 +1107,15 @@ class Storage(object):
         if not index.startswith("/"):
             index = "/" + index
         _log.debug("get index %s" % (index))
+        if self.index_backend:
+            if cb:
+                self.index_backend.get_index(index, cb=CalvinCB(self._get_index_cb, org_cb=cb))
+            return
         self.get_concat(prefix="index-", key=index, cb=cb)
 
+    def _get_index_cb(self, key, value, org_cb):
+        org_cb(key, value if value else None)
+
     def get_index_iter(self, index, include_key=False):
         """
         Get multiple values from the registry stored at the index level or
@@ -1030,10 +1144,7 @@ class Storage(object):
         not yet distributed.
         """
 
-        # TODO this implementation will get the value from the level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
+        # Without an index capable storage backend the values are retrieved from the level of the index.
 
         if isinstance(index, list):
             index = "/".join(index)
@@ -1041,8 +1152,17 @@ class Storage(object):
         if not index.startswith("/"):
             index = "/" + index
         _log.debug("get index iter %s" % (index))
+        if self.index_backend:
+            it = dynops.List()
+            self.index_backend.get_index(index, cb=CalvinCB(self._get_index_iter_cb, it=it, include_key=include_key))
+            return it
         return self.get_concat_iter(prefix="index-", key=index, include_key=include_key)
 
+    def _get_index_iter_cb(self, key, value, it, include_key):
+        if value:
+            it.extend([(key, v) for v in value] if include_key else value)
+        it.final()
+
     ### Storage proxy server ###
 
     def tunnel_request_handles(self, tunnel):
@@ -1059,6 +1179,8 @@ class Storage(object):
     def tunnel_down(self, tunnel):
         """ Callback that the tunnel is not accepted or is going down """
         _log.analyze(self.node.id, "+ SERVER", {'tunnel_id': tunnel.id})
+        self._proxy_pipelined.discard(tunnel.id)
+        self._proxy_replies.pop(tunnel.id, None)
         # We should always return True which sends an ACK on the destruction of the tunnel
         return True
 
@@ -1068,35 +1190,176 @@ class Storage(object):
         # We should always return True which sends an ACK on the destruction of the tunnel
         return True
 
-    def _proxy_reply(self, cb, *args, **kwargs):
+    def _proxy_reply(self, payload, cb):
         # Should not get any replies to the server but log it just in case
-        _log.analyze(self.node.id, "+ SERVER", {args: args, 'kwargs': kwargs})
+        _log.analyze(self.node.id, "+ SERVER", {'payload': payload})
 
     def tunnel_recv_handler(self, tunnel, payload):
         """ Gets called when a storage client request"""
         _log.debug("Storage proxy request %s" % payload)
         _log.analyze(self.node.id, "+ SERVER", {'payload': payload})
-        if 'cmd' in payload and payload['cmd'] in self._proxy_cmds:
-            if 'value' in payload:
-                if payload['cmd'] == 'SET' and payload['value'] is None:
-                    # We detected a delete operation, since a set op with unencoded None is a delete
-                    payload['cmd'] = 'DELETE'
-                    payload.pop('value')
-                else:
-                    # Normal set op, but it will be encoded again in the set func when external storage, hence decode
-                    payload['value']=self.coder.decode(payload['value'])
-            # Call this nodes storage methods, which could be local or DHT,
-            # prefix is empty since that is already in the key (due to these calls come from the storage plugin level).
-            # If we are doing a get or get_concat then the result needs to be encoded, to correspond with what the
-            # client's higher level expect from storage plugin level.
-            self._proxy_cmds[payload['cmd']](cb=CalvinCB(self._proxy_send_reply, tunnel=tunnel,
-                                                        encode=True if payload['cmd'] in ('GET', 'GET_CONCAT') else False,
-                                                        msgid=payload['msg_uuid']),
-                                             prefix="",
-                                             **{k: v for k, v in payload.iteritems() if k in ('key', 'value')})
+        cmd = payload.get('cmd')
+        if cmd == 'BATCH':
+            self._proxy_batch(tunnel, payload)
+        elif cmd == 'PIPELINE':
+            # Independent requests sent together, replies are sent together as well
+            self._proxy_pipelined.add(tunnel.id)
+            for request in payload['requests']:
+                self._proxy_request(request, CalvinCB(self._proxy_send_reply, tunnel=tunnel,
+                                                      msgid=request['msg_uuid']))
+        elif cmd in self._proxy_cmds:
+            self._proxy_request(payload, CalvinCB(self._proxy_send_reply, tunnel=tunnel, msgid=payload['msg_uuid']))
+        else:
+            _log.error("Unknown storage proxy request %s" % cmd)
+
+    def _proxy_request(self, payload, cb):
+        """
+        Call this nodes storage methods, which could be local or DHT.
+        The key already has its prefix (due to these calls come from the storage plugin level)
+        and values are kept encoded as the client's storage plugin level expects.
+        Concurrent identical GET and GET_CONCAT requests share one lookup,
+        until a write to the key, later requests then need a lookup of their own.
+        """
+        cmd = payload['cmd']
+        if cmd in ('GET', 'GET_CONCAT'):
+            flight = (cmd, payload['key'])
+            if flight in self._proxy_flights:
+                self._proxy_flights[flight].append(cb)
+                return
+            waiters = self._proxy_flights[flight] = [cb]
+            cb = CalvinCB(self._proxy_flight_cb, flight=flight, waiters=waiters)
+        elif cmd != 'REPLY':
+            self._proxy_flights.pop(('GET', payload['key']), None)
+            self._proxy_flights.pop(('GET_CONCAT', payload['key']), None)
+        self._proxy_cmds[cmd](payload, cb)
+
+    def _proxy_flight_cb(self, key, value, flight, waiters):
+        # A write may have ended the flight, and a new one started for the same key
+        if self._proxy_flights.get(flight) is waiters:
+            del self._proxy_flights[flight]
+        for cb in waiters:
+            cb(key=key, value=value)
+
+    def _proxy_get(self, payload, cb):
+        self._get_encoded(payload['key'], cb)
+
+    def _proxy_set(self, payload, cb):
+        if payload['value'] is None:
+            # A set op with unencoded None is a delete
+            self._proxy_delete(payload, cb)
+        else:
+            self._set_encoded("", payload['key'], payload['value'], cb)
+
+    def _proxy_index_path(self, key):
+        # Index levels from clients go to the index backend, when there is one
+        if self.index_backend and key.startswith("index-"):
+            return key[len("index-"):]
+        return None
+
+    def _proxy_index_changed(self, key):
+        if key.startswith("index-"):
+            self._index_changed()
+
+    def _proxy_get_concat(self, payload, cb):
+        key = payload['key']
+        path = self._proxy_index_path(key)
+        if path:
+            self.index_backend.get_index(path, cb=CalvinCB(self._proxy_encode_cb, org_key=key, org_cb=cb))
+        elif key in self.localstore_sets and self.localstore_sets[key]['+']:
+            # Local additions need to be merged with the stored value
+            self.get_concat("", key, cb=CalvinCB(self._proxy_encode_cb, org_key=key, org_cb=cb))
+        else:
+            self._get_concat_encoded(key, cb)
+
+    def _proxy_encode_cb(self, key, value, org_key, org_cb):
+        org_cb(key=org_key, value=self.coder.encode(value) if value else None)
+
+    def _proxy_index_cb(self, key, value, org_key, org_cb):
+        org_cb(key=org_key, value=value)
+
+    def _proxy_append(self, payload, cb):
+        self._proxy_index_changed(payload['key'])
+        path = self._proxy_index_path(payload['key'])
+        if path:
+            for value in self.coder.decode(payload['value']):
+                self.index_backend.add_index([path], value)
+            async.DelayedCall(0, cb, key=payload['key'], value=True)
+        else:
+            self.append("", payload['key'], self.coder.decode(payload['value']), cb)
+
+    def _proxy_remove(self, payload, cb):
+        self._proxy_index_changed(payload['key'])
+        path = self._proxy_index_path(payload['key'])
+        if path:
+            for value in self.coder.decode(payload['value']):
+                self.index_backend.remove_index([path], value)
+            async.DelayedCall(0, cb, key=payload['key'], value=True)
         else:
-            _log.error("Unknown storage proxy request %s" % payload['cmd'] if 'cmd' in payload else "")
+            self.remove("", payload['key'], self.coder.decode(payload['value']), cb)
+
+    def _proxy_delete(self, payload, cb):
+        self._proxy_index_changed(payload['key'])
+        path = self._proxy_index_path(payload['key'])
+        if path:
+            # A client deletes one index level at a time, hence leave the levels below it
+            self.index_backend.delete_index([path], below=False,
+                                            cb=CalvinCB(self._proxy_index_cb, org_key=payload['key'], org_cb=cb))
+        else:
+            self.delete("", payload['key'], cb)
 
-    def _proxy_send_reply(self, key, value, tunnel, encode, msgid):
+    def _proxy_batch(self, tunnel, payload):
+        """
+        Several storage operations in one request, replied to when all are done or
+        after BATCH_TIMEOUT, operations not done by then are replied to with value None
+        """
+        ops = [op for op in payload['ops'] if op.get('cmd') in self._proxy_cmds and op['cmd'] != 'REPLY']
+        if not ops:
+            self._proxy_send_batch_reply(tunnel, payload['msg_uuid'], [])
+            return
+        batch = {'ops': ops, 'values': [None] * len(ops), 'pending': len(ops)}
+        batch['timeout'] = async.DelayedCall(self.BATCH_TIMEOUT, self._proxy_batch_timeout, tunnel=tunnel,
+                                             msgid=payload['msg_uuid'], batch=batch)
+        for index, op in enumerate(ops):
+            self._proxy_request(op, CalvinCB(self._proxy_batch_cb, tunnel=tunnel, msgid=payload['msg_uuid'],
+                                             batch=batch, index=index))
+
+    def _proxy_batch_cb(self, key, value, tunnel, msgid, batch, index):
+        if batch['values'] is None:
+            # Already replied to after the timeout
+            return
+        batch['values'][index] = {'key': key, 'value': value}
+        batch['pending'] -= 1
+        if not batch['pending']:
+            batch['timeout'].cancel()
+            self._proxy_send_batch_reply(tunnel, msgid, batch['values'])
+            batch['values'] = None
+
+    def _proxy_batch_timeout(self, tunnel, msgid, batch):
+        _log.warning("Storage proxy batch %s timed out with %d of %d operations not done" %
+                     (msgid, batch['pending'], len(batch['ops'])))
+        values = [value or {'key': op.get('key'), 'value': None} for op, value in zip(batch['ops'], batch['values'])]
+        self._proxy_send_batch_reply(tunnel, msgid, values)
+        batch['values'] = None
+
+    def _proxy_send_batch_reply(self, tunnel, msgid, values):
+        _log.analyze(self.node.id, "+ SERVER", {'msgid': msgid, 'values': values})
+        tunnel.send({'cmd': 'REPLY', 'msg_uuid': msgid, 'values': values, 'batch': True, 'pipeline': True})
+
+    def _proxy_send_reply(self, key, value, tunnel, msgid):
         _log.analyze(self.node.id, "+ SERVER", {'msgid': msgid, 'key': key, 'value': value})
-        tunnel.send({'cmd': 'REPLY', 'msg_uuid': msgid, 'key': key, 'value': self.coder.encode(value) if encode else value})
+        # batch and pipeline tells the client that BATCH and PIPELINE requests are handled
+        reply = {'cmd': 'REPLY', 'msg_uuid': msgid, 'key': key, 'value': value, 'batch': True, 'pipeline': True}
+        if tunnel.id not in self._proxy_pipelined:
+            tunnel.send(reply)
+            return
+        replies = self._proxy_replies.setdefault(tunnel.id, [])
+        if not replies:
+            async.DelayedCall(0, self._proxy_send_replies, tunnel)
+        replies.append(reply)
+
+    def _proxy_send_replies(self, tunnel):
+        replies = self._proxy_replies.pop(tunnel.id, [])
+        if len(replies) == 1:
+            tunnel.send(replies[0])
+        elif replies:
+            tunnel.send({'cmd': 'REPLIES', 'replies': replies})
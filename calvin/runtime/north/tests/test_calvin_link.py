@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north import calvin_network
+from calvin.runtime.north.calvin_network import CalvinLink
+
+pytestmark = pytest.mark.unittest
+
+
+@patch('calvin.runtime.north.calvin_network.async')
+class TestCalvinLinkBatching(unittest.TestCase):
+
+    def create_link(self, batching=True, supports_batch=True):
+        transport = Mock()
+        transport.get_rtt.return_value = 0.1
+        transport.supports_batch.return_value = supports_batch
+        with patch.object(calvin_network._conf, 'get', return_value=batching):
+            return CalvinLink('rt1', 'rt2', transport)
+
+    def test_not_batching(self, async):
+        for link in [self.create_link(batching=False), self.create_link(supports_batch=False)]:
+            link.send({'cmd': 'A'})
+            assert link.transport.send.call_count == 1
+            assert not async.DelayedCall.called
+
+    def test_batch_in_order(self, async):
+        link = self.create_link()
+        link.send({'cmd': 'A'})
+        link.send_with_reply(Mock(), {'cmd': 'B'})
+        assert not link.transport.send.called
+        # One flush scheduled for next reactor tick
+        flush = [c for c in async.DelayedCall.call_args_list if c[0][0] == 0]
+        assert len(flush) == 1
+        link.flush_batch()
+        payload = link.transport.send.call_args[0][0]
+        assert payload['cmd'] == 'BATCH'
+        assert [m['cmd'] for m in payload['msgs']] == ['A', 'B']
+        assert payload['msgs'][1]['msg_uuid'] in link.replies
+        # Nothing left to send
+        link.flush_batch()
+        assert link.transport.send.call_count == 1
+
+    def test_single_message_not_wrapped(self, async):
+        link = self.create_link()
+        link.send({'cmd': 'A'})
+        link.flush_batch()
+        assert link.transport.send.call_args[0][0]['cmd'] == 'A'
+
+    def test_max_batch(self, async):
+        link = self.create_link()
+        for i in range(calvin_network.MAX_BATCH_MSGS):
+            link.send({'cmd': 'A', 'i': i})
+        assert link.transport.send.call_count == 1
+        assert len(link.transport.send.call_args[0][0]['msgs']) == calvin_network.MAX_BATCH_MSGS
+        assert link.batch_flush is None
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2015 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+
+from calvin.runtime.north.calvin_token import Token, ExceptionToken, EOSToken
+
+pytestmark = pytest.mark.unittest
+
+
+class TestToken(unittest.TestCase):
+
+    def test_slots(self):
+        for token in [Token(1), ExceptionToken(), EOSToken()]:
+            assert not hasattr(token, '__dict__')
+            with self.assertRaises(AttributeError):
+                token.foo = 1
+
+    def test_encode_decode(self):
+        for token in [Token(1, origin='o', timestamp=1.0, port_tag='p'), ExceptionToken(), EOSToken()]:
+            decoded = Token.decode(token.encode())
+            assert type(decoded) is type(token)
+            assert decoded.value == token.value
+            assert decoded.metadata == token.metadata
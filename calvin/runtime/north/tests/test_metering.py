@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north.metering import Metering, ActorLog
+
+pytestmark = pytest.mark.unittest
+
+
+def create_actor(actor_id):
+    def action_a(): pass
+    def action_b(): pass
+    for action in [action_a, action_b]:
+        action.action_input = []
+        action.action_output = []
+    actor = Mock()
+    actor.id = actor_id
+    actor.__class__ = type('TestActor', (object,), {'action_priority': [action_a, action_b]})
+    return actor
+
+
+class TestActorLog(unittest.TestCase):
+
+    def test_ring_buffer(self):
+        log = ActorLog(['a', 'b'], 4)
+        for i in range(6):
+            log.log(100.0 + i, 'a' if i % 2 else 'b')
+        assert log.count == 6
+        # Only the last 4 are kept
+        assert log.since(0, 0.0) == [[102.0, 'b'], [103.0, 'a'], [104.0, 'b'], [105.0, 'a']]
+        assert log.since(5, 0.0) == [[105.0, 'a']]
+        assert log.since(0, 103.5) == [[104.0, 'b'], [105.0, 'a']]
+
+    def test_rates(self):
+        log = ActorLog(['a', 'b'], 4)
+        for second in range(1000, 1010):
+            for i in range(second - 1000):
+                log.log(second + 0.5, 'a')
+        rates = log.rates(1010.2)
+        assert rates['a']['max'] == 9
+        assert rates['a']['mean'] == 45.0 / (ActorLog.HISTOGRAM_SECONDS - 1)
+        assert rates['b']['max'] == 0
+        # Current second is not complete and not included
+        log.log(1010.5, 'b')
+        assert log.rates(1010.7)['b']['max'] == 0
+        assert log.rates(1011.0)['b']['max'] == 1
+
+
+class TestMetering(unittest.TestCase):
+
+    def setUp(self):
+        self.metering = Metering(Mock())
+        self.metering.timeout = 10.0
+        self.metering.add_actor_info(create_actor('actor1'))
+
+    @patch('calvin.runtime.north.metering.time')
+    def test_timed_meter_cursors(self, time):
+        time.time.return_value = 100.0
+        user1 = self.metering.register()
+        time.time.return_value = 100.5
+        self.metering.fired('actor1', 'action_a')
+        time.time.return_value = 101.0
+        user2 = self.metering.register()
+        self.metering.fired('actor1', 'action_b')
+        assert self.metering.get_timed_meter(user1) == {'actor1': [[100.5, 'action_a'], [101.0, 'action_b']]}
+        assert self.metering.get_timed_meter(user2) == {'actor1': [[101.0, 'action_b']]}
+        assert self.metering.get_timed_meter(user1) == {'actor1': []}
+        # Older than timeout
+        self.metering.fired('actor1', 'action_a')
+        time.time.return_value = 112.0
+        assert self.metering.get_timed_meter(user2) == {'actor1': []}
+        assert self.metering.get_rates(user1)['actor1']['action_a']['max'] == 1
+
+    def test_not_logged_without_users(self):
+        self.metering.fired('actor1', 'action_a')
+        assert self.metering.actors_log['actor1'].count == 0
+        # No buffer until a firing is logged
+        assert self.metering.actors_log['actor1'].times is None
+        user = self.metering.register()
+        assert self.metering.get_rates(user)['actor1']['action_a']['max'] == 0
+        self.metering.fired('actor1', 'action_a')
+        assert len(self.metering.actors_log['actor1'].times) == self.metering.log_size
+        self.metering.unregister(user)
+        assert self.metering.actors_log['actor1'].count == 0
+        assert self.metering.actors_log['actor1'].times is None
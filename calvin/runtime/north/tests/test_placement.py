@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+import random
+import timeit
+from mock import Mock, patch
+
+from calvin.runtime.north import placement
+from calvin.runtime.north.placement import PlacementEngine, node_cost
+from calvin.runtime.north.appmanager import AppManager
+
+pytestmark = pytest.mark.unittest
+
+ENGINES = ['numpy', 'python']
+
+
+def create_engine(kind, actor_ids, node_ids):
+    if kind == 'numpy' and placement.numpy is None:
+        pytest.skip("NumPy not available")
+    engine = PlacementEngine(actor_ids, node_ids)
+    return engine._placement_numpy if kind == 'numpy' else engine._placement_python, engine
+
+
+@pytest.mark.parametrize('kind', ENGINES)
+def test_connected_actors_colocated(kind):
+    placement_, engine = create_engine(kind, ['a1', 'a2', 'a3'], ['n1', 'n2', 'n3'])
+    engine.set_possible('a1', ['n1', 'n2', 'n3'])
+    engine.set_possible('a2', ['n2'])
+    engine.set_possible('a3', ['n1', 'n3'])
+    engine.connect('a1', 'a2')
+    engine.connect('a3', 'unknown')
+    result = placement_()
+    assert result['a1'][0] == 'n2'
+    assert set(result['a1']) == set(['n1', 'n2', 'n3'])
+    assert result['a2'] == ['n2']
+    # No connectivity nor cost, descending node id order
+    assert result['a3'] == ['n3', 'n1']
+
+
+@pytest.mark.parametrize('kind', ENGINES)
+def test_cost_decides_equal_connectivity(kind):
+    placement_, engine = create_engine(kind, ['a1', 'a2'], ['n1', 'n2', 'n3'])
+    engine.set_possible('a1', ['n1', 'n2', 'n3'])
+    engine.set_possible('a2', ['n1', 'n2'])
+    engine.connect('a1', 'a2')
+    engine.set_cost('n1', node_cost(cpu_avail=100, mem_avail=100, rtt=0.05))
+    engine.set_cost('n2', node_cost(cpu_avail=25, mem_avail=50))
+    engine.set_cost('n3', node_cost())
+    result = placement_()
+    # Cost never outweighs a connection
+    assert result['a1'][2] == 'n3'
+    assert result['a1'][:2] == ['n1', 'n2']
+    assert result['a2'] == ['n1', 'n2']
+
+
+def test_node_cost():
+    assert node_cost() == 0.0
+    assert node_cost(cpu_avail=100, mem_avail=100, rtt=0) == 0.0
+    assert node_cost(cpu_avail=0, rtt=10.0) == pytest.approx(PlacementEngine.MAX_COST)
+    assert node_cost(cpu_avail="50") == pytest.approx(PlacementEngine.LOAD_WEIGHT / 2)
+
+
+def test_engines_agree():
+    if placement.numpy is None:
+        pytest.skip("NumPy not available")
+    random.seed(4711)
+    actor_ids = ["a%d" % i for i in range(200)]
+    node_ids = ["n%d" % i for i in range(30)]
+    engine = PlacementEngine(actor_ids, node_ids)
+    for actor_id in actor_ids:
+        engine.set_possible(actor_id, random.sample(node_ids, random.randint(1, 10)))
+        engine.connect(actor_id, random.choice(actor_ids))
+    for i, node_id in enumerate(node_ids):
+        engine.set_cost(node_id, node_cost(cpu_avail=25 * (i % 5), rtt=0.01 * (i % 3)))
+    assert engine._placement_numpy() == engine._placement_python()
+
+
+class App(object):
+    """Application with a chain of local actors a1 -> a2 -> a3"""
+
+    def __init__(self):
+        self.id = "app"
+        self.actors = {'a1': 'src', 'a2': 'mid', 'a3': 'snk'}
+        self.actor_placement = {}
+        self.actor_placement_nbr = 3
+        self._org_cb = Mock()
+
+    def get_actors(self):
+        return ['a1', 'a2', 'a3']
+
+
+def create_node():
+    node = Mock()
+    node.id = 'n1'
+    node.am.actors = {'a1': Mock(), 'a2': Mock(), 'a3': Mock()}
+    connections = {
+        'a1': {'inports': {}, 'outports': {'p1': [('n1', 'p2')]}},
+        'a2': {'inports': {'p2': [('n1', 'p1')]}, 'outports': {'p3': [('n2', 'p4')]}},
+        'a3': {'inports': {'p4': [('n1', 'p3')]}, 'outports': {}}
+    }
+    owners = {'p1': 'a1', 'p2': 'a2', 'p3': 'a2'}
+    node.am.connections.side_effect = lambda actor_id: connections[actor_id]
+
+    def local_port(port_id):
+        port = Mock()
+        port.owner.id = owners[port_id]
+        return port
+    node.pm._get_local_port.side_effect = local_port
+    node.network.link_get.return_value.get_rtt.return_value = 0.02
+    return node
+
+
+def test_collect_placement_uses_storage_for_remote_peers():
+    node = create_node()
+    storage = node.storage
+    storage.get_port.side_effect = lambda port_id, cb: cb(key=port_id, value={'actor_id': 'a3'})
+    storage.get.side_effect = lambda prefix, key, cb: cb(key=key, value=100 if key == 'n2' else 25)
+    appmanager = AppManager(node)
+    app = App()
+    org_cb = app._org_cb
+    appmanager.collect_placement(app, 'a1', set(['n1', 'n2']), None)
+    appmanager.collect_placement(app, 'a2', set(['n1', 'n2']), None)
+    appmanager.collect_placement(app, 'a3', set(['n2']), None)
+    storage.get_port.assert_called_once_with('p4', cb=storage.get_port.call_args[1]['cb'])
+    placement_ = org_cb.call_args[1]['placement']
+    assert org_cb.call_args[1]['status']
+    # a2 is connected to a3 found in storage, and n2 is the least loaded node
+    assert placement_ == {'a1': ['n2', 'n1'], 'a2': ['n2', 'n1'], 'a3': ['n2']}
+    # All actors go to n2 in one batch
+    node.am.migrate_batch.assert_called_once()
+    args, kwargs = node.am.migrate_batch.call_args
+    assert sorted(args[0]) == ['a1', 'a2', 'a3'] and args[1] == 'n2'
+    assert not node.am.robust_migrate.called
+    assert not hasattr(app, '_org_cb')
+    # A failed batch falls back to the remaining placements of each actor
+    actors = [{'actor_id': actor_id, 'state': {}, 'actor_type': 'std.Identity', 'ports': {}} for actor_id in args[0]]
+    kwargs['callback'](status=False, actors=actors)
+    assert node.am.robust_migrate.call_count == 3
+    node.am.robust_migrate.assert_any_call('a1', ['n1'], None, state={}, actor_type='std.Identity', ports={})
+
+
+def test_perf():
+    # Run with -s to see the numbers
+    random.seed(4711)
+    actor_ids = ["a%d" % i for i in range(2000)]
+    node_ids = ["n%d" % i for i in range(200)]
+    engine = PlacementEngine(actor_ids, node_ids)
+    for i, actor_id in enumerate(actor_ids):
+        engine.set_possible(actor_id, random.sample(node_ids, 50))
+        engine.connect(actor_id, actor_ids[i - 1])
+    kinds = [k for k in ENGINES if k == 'python' or placement.numpy is not None]
+    times = {}
+    print
+    for kind in kinds:
+        times[kind] = min(timeit.repeat(getattr(engine, '_placement_' + kind), number=1, repeat=3))
+        print "%-8s %8.2fms" % (kind, 1000 * times[kind])
+    if 'numpy' in times:
+        assert times['numpy'] < times['python']
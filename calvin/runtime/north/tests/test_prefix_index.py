@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north.plugins.storage.prefix_index import PrefixIndex
+from calvin.runtime.north.plugins.storage.storage_dict_local import StorageLocal
+from calvin.runtime.north import storage
+from calvin.tests import DummyNode
+
+pytestmark = pytest.mark.unittest
+
+
+def _call(delay, cb, *args, **kwargs):
+    cb(*args, **kwargs)
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex()
+
+    def test_prefix_query(self):
+        self.index.add(['/node/a', '/node/a/b', '/node/a/b/c'], 'n1')
+        self.index.add(['/node/a', '/node/a/b', '/node/a/b/d'], 'n2')
+        self.index.add(['/node/a', '/node/a/e'], 'n3')
+        assert sorted(self.index.get('/node/a')) == ['n1', 'n2', 'n3']
+        assert sorted(self.index.get('/node/a/b')) == ['n1', 'n2']
+        assert self.index.get('/node/a/b/d') == ['n2']
+        assert self.index.get('/node') == []
+
+    def test_remove(self):
+        self.index.add(['/node/a', '/node/a/b'], 'n1')
+        self.index.add(['/node/a', '/node/a/c'], 'n1')
+        self.index.add(['/node/a', '/node/a/b'], 'n1')
+        # Removed with other queryable prefixes than when added
+        assert self.index.remove(['/node/a/b'], 'n1')
+        assert self.index.get('/node/a') == ['n1']
+        assert self.index.get('/node/a/b') == []
+        assert not self.index.remove(['/node/a/b'], 'n1')
+        assert self.index.remove(['/node/a', '/node/a/c'], 'n1')
+        assert self.index.dump() == {}
+
+    def test_delete(self):
+        self.index.add(['/replicas/actors', '/replicas/actors/r1'], 'a1')
+        self.index.add(['/replicas/actors', '/replicas/actors/r1'], 'a2')
+        self.index.add(['/replicas/actors', '/replicas/actors/r2'], 'a3')
+        self.index.delete(['/replicas/actors', '/replicas/actors/r1'])
+        assert self.index.get('/replicas/actors') == ['a3']
+        assert self.index.get('/replicas/actors/r1') == []
+
+    def test_delete_level(self):
+        self.index.add(['/node/a'], 'n1')
+        self.index.add(['/node/a', '/node/a/b'], 'n2')
+        self.index.delete(['/node/a'], below=False)
+        assert self.index.get('/node/a') == ['n2']
+        assert self.index.get('/node/a/b') == ['n2']
+
+
+@patch('calvin.runtime.north.plugins.storage.prefix_index.async')
+class TestStorageIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = StorageLocal()
+        self.storage = storage.Storage(DummyNode(), override_storage=self.plugin)
+
+    def test_add_get(self, async):
+        async.DelayedCall.side_effect = _call
+        cb = Mock()
+        self.storage.add_index(['node', 'attribute', 'owner', 'org', 'dept'], 'n1', root_prefix_level=2, cb=cb)
+        cb.assert_called_once_with(key='/node/attribute/owner/org/dept', value=True)
+        self.storage.add_index(['node', 'attribute', 'owner', 'other'], 'n2', root_prefix_level=2)
+        self.storage.get_index(['node', 'attribute', 'owner'], cb)
+        assert sorted(cb.call_args[0][1]) == ['n1', 'n2']
+        self.storage.get_index(['node', 'attribute', 'name'], cb)
+        cb.assert_called_with('/node/attribute/name', None)
+        it = self.storage.get_index_iter('node/attribute/owner/org', include_key=True)
+        assert list(it) == [('/node/attribute/owner/org', 'n1')]
+
+    def test_remove_delete(self, async):
+        async.DelayedCall.side_effect = _call
+        self.storage.add_index(['node', 'capabilities', 'c1'], 'n1', root_prefix_level=3)
+        self.storage.add_index(['node', 'capabilities', 'c1'], 'n2', root_prefix_level=3)
+        self.storage.remove_index(['node', 'capabilities', 'c1'], 'n1', root_prefix_level=3)
+        assert list(self.storage.get_index_iter(['node', 'capabilities', 'c1'])) == ['n2']
+        self.storage.delete_index(['node', 'capabilities', 'c1'], root_prefix_level=3)
+        assert list(self.storage.get_index_iter(['node', 'capabilities', 'c1'])) == []
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock
+
+from calvin.runtime.north.profiler import Profiler
+from calvin.runtime.north.plugins.port.queue.collect_unordered import CollectUnordered
+
+pytestmark = pytest.mark.unittest
+
+
+def create_actor(actor_id, name):
+    actor = Mock()
+    actor._id = actor_id
+    actor._name = name
+    actor.inports = {}
+    actor.outports = {}
+    return actor
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = Profiler()
+        self.actor = create_actor('a1', 'src')
+
+    def test_enable_resets(self):
+        self.profiler.enable()
+        self.profiler.action_fired(self.actor, 'action', 0.001)
+        self.profiler.disable()
+        assert not self.profiler.enabled
+        assert self.profiler.snapshot()['actors']['a1']['actions']['action']['count'] == 1
+        self.profiler.enable()
+        assert self.profiler.enabled
+        assert self.profiler.snapshot()['actors'] == {}
+
+    def test_action_percentiles(self):
+        for i in range(1, 101):
+            self.profiler.action_fired(self.actor, 'action', i * 0.001)
+        info = self.profiler.snapshot()['actors']['a1']['actions']['action']
+        assert info['count'] == 100
+        assert info['total'] == pytest.approx(5.050)
+        assert info['p50'] == pytest.approx(0.051)
+        assert info['p99'] == pytest.approx(0.100)
+
+    def test_scheduler_and_tunnels(self):
+        self.profiler.loop(0.002)
+        self.profiler.loop(0.004)
+        self.profiler.tokens_sent('p1', 10)
+        self.profiler.tokens_received('p1', 3)
+        snapshot = self.profiler.snapshot()
+        assert snapshot['scheduler']['iterations'] == 2
+        assert snapshot['scheduler']['max_iteration'] == 0.004
+        assert 0.0 <= snapshot['scheduler']['idle_ratio'] <= 1.0
+        assert snapshot['tunnels']['p1']['sent'] == 10
+        assert snapshot['tunnels']['p1']['received'] == 3
+
+    def test_port_fill(self):
+        port = Mock()
+        port.id = 'p2'
+        port.name = 'token'
+        port.direction = 'out'
+        port.queue.write_pos = 7
+        port.queue.read_pos = {'peer1': 5, 'peer2': 3}
+        port.queue.N = 5
+        self.actor.outports = {'token': port}
+        ports = self.profiler.snapshot([self.actor])['ports']
+        assert ports['p2']['fill'] == 4
+        assert ports['p2']['length'] == 4
+
+    def test_port_fill_per_peer(self):
+        port = Mock()
+        port.id = 'p3'
+        port.name = 'token'
+        port.direction = 'in'
+        port.queue = CollectUnordered({'queue_length': 4}, {})
+        port.queue.add_writer('peer1', {})
+        port.queue.add_writer('peer2', {})
+        for data, peer in [(1, 'peer1'), (2, 'peer1'), (3, 'peer2')]:
+            port.queue.write(data, peer)
+        self.actor.inports = {'token': port}
+        ports = self.profiler.snapshot([self.actor])['ports']
+        assert ports['p3']['fill'] == 2
+        assert ports['p3']['length'] == 4
+
+    def test_collapsed_stacks(self):
+        self.profiler.action_fired(self.actor, 'b', 0.000002)
+        self.profiler.action_fired(self.actor, 'a', 0.000001)
+        assert self.profiler.collapsed_stacks("node") == "node;src;a 1\nnode;src;b 2\n"
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north.registry_cache import RegistryCache
+from calvin.runtime.north import storage
+from calvin.utilities import dynops
+from calvin.tests import DummyNode
+
+pytestmark = pytest.mark.unittest
+
+
+@patch('calvin.runtime.north.registry_cache.time')
+class TestRegistryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = RegistryCache(2, {'node-': 60.0, 'port-': 2.0})
+
+    def test_ttl(self, time):
+        time.time.return_value = 100.0
+        self.cache.put('node-1', 'n')
+        self.cache.put('port-1', 'p')
+        self.cache.put('actor-1', 'a')
+        time.time.return_value = 101.0
+        assert self.cache.get('port-1') == 'p'
+        assert self.cache.get('actor-1') is None
+        time.time.return_value = 103.0
+        assert self.cache.get('port-1') is None
+        assert self.cache.get('node-1') == 'n'
+        assert self.cache.info() == {'size': 1, 'max_size': 2, 'hits': 2, 'misses': 1}
+
+    def test_lru(self, time):
+        time.time.return_value = 100.0
+        self.cache.put('node-1', 1)
+        self.cache.put('node-2', 2)
+        self.cache.get('node-1')
+        self.cache.put('node-3', 3)
+        assert self.cache.get('node-2') is None
+        assert self.cache.get('node-1') == 1
+        assert self.cache.get('node-3') == 3
+
+    def test_invalidate(self, time):
+        time.time.return_value = 100.0
+        self.cache.put('node-1', 1)
+        self.cache.invalidate('node-1')
+        assert self.cache.get('node-1') is None
+
+    def test_generation(self, time):
+        time.time.return_value = 100.0
+        generation = self.cache.generation('node-1')
+        self.cache.invalidate('node-1')
+        self.cache.put('node-1', 1, generation)
+        assert self.cache.get('node-1') is None
+        self.cache.put('node-1', 1, self.cache.generation('node-1'))
+        assert self.cache.get('node-1') == 1
+        # Dropped generations still fail older tokens
+        generation = self.cache.generation('node-2')
+        for key in ('node-2', 'node-3', 'node-4'):
+            self.cache.invalidate(key)
+        assert 'node-2' not in self.cache.generations
+        self.cache.put('node-2', 2, generation)
+        assert self.cache.get('node-2') is None
+
+
+@patch('calvin.runtime.north.storage.async')
+class TestStorageReadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = Mock()
+        self.plugin.supports_index.return_value = False
+        self.storage = storage.Storage(DummyNode(), override_storage=self.plugin)
+        self.storage.started = True
+
+    def _remote_get(self, key, value):
+        cb = self.plugin.get.call_args[1]['cb']
+        cb(key=key, value=self.storage.coder.encode(value))
+
+    def test_get_cached(self, async):
+        cb = Mock()
+        self.storage.get_port("p1", cb)
+        self._remote_get("port-p1", {'node_id': 'n1'})
+        cb.assert_called_with("p1", {'node_id': 'n1'})
+        async.DelayedCall.side_effect = lambda delay, func, *args, **kwargs: func(*args, **kwargs)
+        cb.reset_mock()
+        self.storage.get_port("p1", cb)
+        assert self.plugin.get.call_count == 1
+        cb.assert_called_once_with("p1", {'node_id': 'n1'})
+
+    def test_failed_get_not_cached(self, async):
+        cb = Mock()
+        self.storage.get_port("p1", cb)
+        self.plugin.get.call_args[1]['cb'](key="port-p1", value=None)
+        self.storage.get_port("p1", cb)
+        assert self.plugin.get.call_count == 2
+
+    def test_set_invalidates(self, async):
+        self.storage.get_port("p1", Mock())
+        self._remote_get("port-p1", {'node_id': 'n1'})
+        self.storage.set("port-", "p1", {'node_id': 'n2'}, None)
+        # Flushed
+        del self.storage.localstore["port-p1"]
+        self.storage.get_port("p1", Mock())
+        assert self.plugin.get.call_count == 2
+
+    def test_invalidated_during_get(self, async):
+        self.storage.get_port("p1", Mock())
+        self.storage.set("port-", "p1", {'node_id': 'n2'}, None)
+        del self.storage.localstore["port-p1"]
+        # Read before the set, hence not cached
+        self._remote_get("port-p1", {'node_id': 'n1'})
+        self.storage.get_port("p1", Mock())
+        assert self.plugin.get.call_count == 2
+
+    def test_get_iter_cached(self, async):
+        self.storage.get_port("p1", Mock())
+        self._remote_get("port-p1", {'node_id': 'n1'})
+        it = dynops.List()
+        self.storage.get_iter("port-", "p1", it)
+        assert self.plugin.get.call_count == 1
+        assert list(it.list) == [{'node_id': 'n1'}]
+        assert self.storage.cache.info()['hits'] == 1
+
+    def test_get_concat_cached(self, async):
+        cb = Mock()
+        self.storage.get_index(['node', 'name', 'a'], cb)
+        self.plugin.get_concat.call_args[1]['cb'](key="index-/node/name/a", value=self.storage.coder.encode(['n1']))
+        cb.assert_called_with("/node/name/a", ['n1'])
+        self.storage.get_index(['node', 'name', 'a'], cb)
+        assert self.plugin.get_concat.call_count == 1
+        assert async.DelayedCall.call_args[1]['value'] == self.storage.coder.encode(['n1'])
+        self.storage.add_index(['node', 'name', 'a'], 'n2', root_prefix_level=1)
+        self.storage.get_index(['node', 'name', 'a'], cb)
+        assert self.plugin.get_concat.call_count == 2
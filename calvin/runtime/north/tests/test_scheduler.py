@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2015 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north.scheduler import ReadyQueueScheduler
+
+pytestmark = pytest.mark.unittest
+
+
+def create_actor(actor_id, fires=True):
+    actor = Mock()
+    actor.id = actor_id
+    actor.name = actor_id
+    actor.enabled.return_value = True
+    actor.fire.return_value = fires
+    actor.get_pressure.return_value = {}
+    actor.FIRE_TIME_SLICE = 0.020
+    actor.cost.time_slice.return_value = 0.020
+    return actor
+
+
+@patch('calvin.runtime.north.scheduler.async')
+class TestReadyQueueScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.actors = {'a1': create_actor('a1'), 'a2': create_actor('a2'), 'a3': create_actor('a3', fires=False)}
+        self.actor_mgr = Mock()
+        self.actor_mgr.actors = self.actors
+        self.actor_mgr.enabled_actors.return_value = self.actors.values()
+        self.scheduler = ReadyQueueScheduler(Mock(), self.actor_mgr, Mock())
+
+    def test_fire_only_runnable(self, async):
+        self.scheduler.trigger_loop(actor_ids=['a2'])
+        did_fire, more, fired = self.scheduler.fire_actors(set())
+        assert did_fire
+        assert fired == set(['a2'])
+        assert not self.actors['a1'].fire.called
+        assert not self.actors['a3'].fire.called
+        assert not more
+
+    def test_full_sweep(self, async):
+        did_fire, _, fired = self.scheduler.fire_actors(None)
+        assert did_fire
+        assert fired == set(['a1', 'a2'])
+        for actor in self.actors.values():
+            assert actor.fire.called
+
+    def test_round_robin(self, async):
+        self.scheduler.trigger_loop(actor_ids=['a1', 'a2', 'a1'])
+        assert list(self.scheduler._ready) == ['a1', 'a2']
+        self.scheduler.fire_actors(set())
+        self.scheduler.trigger_loop(actor_ids=['a2', 'a1'])
+        assert list(self.scheduler._ready) == ['a2', 'a1']
+
+    def test_marked_during_round_fires_next_round(self, async):
+        def fire(time_slice):
+            self.scheduler.trigger_loop(actor_ids=['a2'])
+            return True
+        self.actors['a1'].fire.side_effect = fire
+        self.scheduler.trigger_loop(actor_ids=['a1'])
+        _, more, fired = self.scheduler.fire_actors(set())
+        assert fired == set(['a1'])
+        assert more
+        assert not self.actors['a2'].fire.called
+        _, _, fired = self.scheduler.fire_actors(set())
+        assert fired == set(['a2'])
+
+    def test_disabled_actor_not_fired(self, async):
+        self.actors['a1'].enabled.return_value = False
+        self.scheduler.trigger_loop(actor_ids=['a1', 'unknown'])
+        did_fire, _, _ = self.scheduler.fire_actors(set())
+        assert not did_fire
+        assert not self.actors['a1'].fire.called
+
+    def test_time_slice_from_cost(self, async):
+        self.actors['a1'].cost.time_slice.return_value = 0.0
+        self.scheduler.trigger_loop(actor_ids=['a1', 'a2'])
+        self.scheduler.fire_actors(set())
+        self.actors['a1'].fire.assert_called_with(0.0)
+        time_slice = self.actors['a2'].fire.call_args[0][0]
+        assert 0.0 < time_slice <= 0.020
+
+    def test_endpoints_communicated(self, async):
+        endpoint = Mock()
+        endpoint.runnable_actor_ids.return_value = ['a3', 'a1']
+        self.scheduler.endpoints_communicated([endpoint])
+        assert list(self.scheduler._ready) == ['a3', 'a1']
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north import storage
+from calvin.runtime.north.plugins.storage.storage_dict_local import StorageLocal
+from calvin.runtime.north.plugins.storage.proxy import StorageProxy
+from calvin.tests import DummyNode
+
+pytestmark = pytest.mark.unittest
+
+
+def _call(delay, cb, *args, **kwargs):
+    # Calls in the next reactor turn are made at once, timeouts never expire
+    if not delay:
+        cb(*args, **kwargs)
+    return Mock()
+
+
+@patch('calvin.runtime.north.storage.async')
+class TestFlush(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = Mock()
+        self.plugin.supports_index.return_value = False
+        self.storage = storage.Storage(DummyNode(), override_storage=self.plugin)
+        self.storage.FLUSH_BATCH_SIZE = 2
+
+    def test_flush_batches(self, async):
+        for i in range(3):
+            self.storage.set("actor-", str(i), {'i': i}, None)
+        self.storage.append("index-", "/a", ['n1'], None)
+        self.storage.remove("index-", "/b", ['n2'], None)
+        self.storage.started = True
+        self.storage.flush_localdata()
+        assert self.plugin.set_many.call_count == 2
+        keys = [k for c in self.plugin.set_many.call_args_list for k, _ in c[1]['items']]
+        assert sorted(keys) == ['actor-0', 'actor-1', 'actor-2']
+        assert not self.plugin.set.called
+        self.plugin.append_many.assert_called_once()
+        assert self.plugin.append_many.call_args[1]['items'] == [('index-/a', '["n1"]')]
+        assert self.plugin.remove_many.call_args[1]['items'] == [('index-/b', '["n2"]')]
+        # Successful writes leave the local store
+        set_cb = self.plugin.set_many.call_args_list[0][1]['cb']
+        for key, _ in self.plugin.set_many.call_args_list[0][1]['items']:
+            set_cb(key, True)
+        assert len(self.storage.localstore) == 1
+
+
+@patch('calvin.runtime.north.plugins.storage.storage_dict_local.async')
+def test_local_set_many(async):
+    async.DelayedCall.side_effect = _call
+    plugin = StorageLocal()
+    cb = Mock()
+    plugin.set_many([('a', 1), ('b', 2)], cb=cb)
+    assert async.DelayedCall.call_count == 1
+    assert [c[0] for c in cb.call_args_list] == [('a', True), ('b', True)]
+    plugin.remove_many([('a', 1)], cb=cb)
+    cb.assert_called_with('a', True)
+    assert plugin._data == {'b': 2}
+
+
+@patch('calvin.runtime.north.storage.async')
+def test_proxy_server_batch(async):
+    async.DelayedCall.side_effect = _call
+    plugin = Mock()
+    plugin.supports_index.return_value = False
+    server = storage.Storage(DummyNode(), override_storage=plugin)
+    server._init_proxy()
+    tunnel = Mock()
+    server.tunnel_recv_handler(tunnel, {'cmd': 'BATCH', 'msg_uuid': 'm1',
+                                        'ops': [{'cmd': 'SET', 'key': 'actor-1', 'value': '{"a": 1}'},
+                                                {'cmd': 'SET', 'key': 'actor-2', 'value': None},
+                                                {'cmd': 'APPEND', 'key': 'index-/a', 'value': '["n1"]'}]})
+    tunnel.send.assert_called_once_with({'cmd': 'REPLY', 'msg_uuid': 'm1', 'batch': True, 'pipeline': True,
+                                         'values': [{'key': 'actor-1', 'value': True},
+                                                    {'key': 'actor-2', 'value': True},
+                                                    {'key': 'index-/a', 'value': True}]})
+    assert server.localstore['actor-1'] == '{"a": 1}'
+    assert server.localstore_sets['index-/a']['+'] == set(['n1'])
+
+
+@patch('calvin.runtime.north.storage.async')
+def test_proxy_server_batch_timeout(async):
+    timeouts = []
+
+    def delayed_call(delay, cb, *args, **kwargs):
+        if delay:
+            timeouts.append((delay, cb, kwargs))
+        else:
+            cb(*args, **kwargs)
+        return Mock()
+    async.DelayedCall.side_effect = delayed_call
+    plugin = Mock()
+    plugin.supports_index.return_value = False
+    # Only the set of actor-1 calls back
+    plugin.set.side_effect = lambda key, value, cb: cb(key=key, value=True) if key == 'actor-1' else None
+    server = storage.Storage(DummyNode(), override_storage=plugin)
+    server.started = True
+    server._init_proxy()
+    tunnel = Mock()
+    server.tunnel_recv_handler(tunnel, {'cmd': 'BATCH', 'msg_uuid': 'm1',
+                                        'ops': [{'cmd': 'SET', 'key': 'actor-1', 'value': '"a"'},
+                                                {'cmd': 'SET', 'key': 'actor-2', 'value': '"b"'}]})
+    assert not tunnel.send.called
+    delay, cb, kwargs = timeouts.pop()
+    assert delay == server.BATCH_TIMEOUT
+    cb(**kwargs)
+    tunnel.send.assert_called_once_with({'cmd': 'REPLY', 'msg_uuid': 'm1', 'batch': True, 'pipeline': True,
+                                         'values': [{'key': 'actor-1', 'value': True},
+                                                    {'key': 'actor-2', 'value': None}]})
+    # A late callback is not replied to again
+    plugin.set.call_args[1]['cb'](key='actor-2', value=True)
+    tunnel.send.assert_called_once()
+
+
+def test_proxy_client_batch():
+    node = Mock()
+    client = StorageProxy(node)
+    client.tunnel = Mock()
+    cb = Mock()
+    client.set_many([('k1', 'v1'), ('k2', 'v2')], cb=cb)
+    # Master not known to handle BATCH, one request per key
+    assert client.tunnel.send.call_count == 2
+    msg = client.tunnel.send.call_args[0][0]
+    client.tunnel_recv_handler({'cmd': 'REPLY', 'msg_uuid': msg['msg_uuid'], 'key': 'k2', 'value': True,
+                                'batch': True})
+    cb.assert_called_with(key='k2', value=True)
+    client.set_many([('k1', 'v1'), ('k2', 'v2')], cb=cb)
+    assert client.tunnel.send.call_count == 3
+    msg = client.tunnel.send.call_args[0][0]
+    assert msg['cmd'] == 'BATCH'
+    assert msg['ops'] == [{'cmd': 'SET', 'key': 'k1', 'value': 'v1'}, {'cmd': 'SET', 'key': 'k2', 'value': 'v2'}]
+    client.tunnel_recv_handler({'cmd': 'REPLY', 'msg_uuid': msg['msg_uuid'], 'batch': True,
+                                'values': [{'key': 'k1', 'value': True}, {'key': 'k2', 'value': False}]})
+    cb.assert_called_with(key='k2', value=False)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north import storage
+from calvin.runtime.north.plugins.storage.storage_dict_local import StorageLocal
+from calvin.runtime.north.plugins.storage.proxy import StorageProxy
+from calvin.tests import DummyNode
+
+pytestmark = pytest.mark.unittest
+
+
+def create_tunnel(tunnel_id):
+    tunnel = Mock()
+    tunnel.id = tunnel_id
+    return tunnel
+
+
+class DelayedCalls(object):
+    """Collects delayed calls to run them when the test decides"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, delay, func, *args, **kwargs):
+        self.calls.append((func, args, kwargs))
+
+    def run(self):
+        while self.calls:
+            func, args, kwargs = self.calls.pop(0)
+            func(*args, **kwargs)
+
+
+@patch('calvin.runtime.north.storage.async')
+class TestProxyServer(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = Mock()
+        self.plugin.supports_index.return_value = False
+        self.server = storage.Storage(DummyNode(), override_storage=self.plugin)
+        self.server.started = True
+        self.server._init_proxy()
+
+    def test_single_flight(self, async):
+        tunnel1, tunnel2 = create_tunnel('t1'), create_tunnel('t2')
+        self.server.tunnel_recv_handler(tunnel1, {'cmd': 'GET', 'key': 'node-1', 'msg_uuid': 'm1'})
+        self.server.tunnel_recv_handler(tunnel2, {'cmd': 'GET', 'key': 'node-1', 'msg_uuid': 'm2'})
+        assert self.plugin.get.call_count == 1
+        self.plugin.get.call_args[1]['cb'](key='node-1', value='{"uris": []}')
+        for tunnel, msgid in ((tunnel1, 'm1'), (tunnel2, 'm2')):
+            reply = tunnel.send.call_args[0][0]
+            assert reply['msg_uuid'] == msgid
+            # Encoded value passed through
+            assert reply['value'] == '{"uris": []}'
+        # Done, next request does a new lookup (or hits the cache)
+        self.server.tunnel_recv_handler(tunnel1, {'cmd': 'GET_CONCAT', 'key': 'index-/a', 'msg_uuid': 'm3'})
+        assert self.plugin.get_concat.call_count == 1
+
+    def test_write_ends_flight(self, async):
+        tunnel1, tunnel2 = create_tunnel('t1'), create_tunnel('t2')
+        self.server.tunnel_recv_handler(tunnel1, {'cmd': 'GET', 'key': 'actor-1', 'msg_uuid': 'm1'})
+        get_cb = self.plugin.get.call_args[1]['cb']
+        self.server.tunnel_recv_handler(tunnel1, {'cmd': 'SET', 'key': 'actor-1', 'value': '{"name":"b"}',
+                                                  'msg_uuid': 'm2'})
+        self.server.tunnel_recv_handler(tunnel2, {'cmd': 'GET', 'key': 'actor-1', 'msg_uuid': 'm3'})
+        # The lookup started before the write only answers the request made before it
+        get_cb(key='actor-1', value='{"name":"a"}')
+        assert tunnel1.send.call_args_list[0][0][0]['value'] == '{"name":"a"}'
+        assert all(c[0][0]['msg_uuid'] != 'm3' or c[0][0]['value'] == '{"name":"b"}'
+                   for c in tunnel2.send.call_args_list)
+
+    def test_tunnel_down(self, async):
+        tunnel = create_tunnel('t1')
+        self.server.tunnel_recv_handler(tunnel, {'cmd': 'PIPELINE', 'msg_uuid': 'p1', 'requests': [
+            {'cmd': 'SET', 'key': 'actor-1', 'value': '{"name":"a"}', 'msg_uuid': 'm1'}]})
+        self.plugin.set.call_args[1]['cb'](key='actor-1', value=True)
+        assert tunnel.id in self.server._proxy_pipelined
+        assert self.server._proxy_replies[tunnel.id]
+        self.server.tunnel_down(tunnel)
+        assert tunnel.id not in self.server._proxy_pipelined
+        assert tunnel.id not in self.server._proxy_replies
+
+    def test_set_pass_through(self, async):
+        tunnel = create_tunnel('t1')
+        self.server.tunnel_recv_handler(tunnel, {'cmd': 'SET', 'key': 'actor-1', 'value': '{"name":"a"}',
+                                                 'msg_uuid': 'm1'})
+        assert self.plugin.set.call_args[1]['value'] == '{"name":"a"}'
+        self.server.tunnel_recv_handler(tunnel, {'cmd': 'SET', 'key': 'actor-1', 'value': None, 'msg_uuid': 'm2'})
+        assert self.plugin.set.call_args[1]['value'] is None
+
+    def test_pipeline(self, async):
+        async.DelayedCall.side_effect = delayed = DelayedCalls()
+        tunnel = create_tunnel('t1')
+        self.server.localstore['node-1'] = '"a"'
+        self.server.localstore['node-2'] = '"b"'
+        self.server.tunnel_recv_handler(tunnel, {'cmd': 'PIPELINE', 'requests': [
+            {'cmd': 'GET', 'key': 'node-1', 'msg_uuid': 'm1'},
+            {'cmd': 'GET', 'key': 'node-2', 'msg_uuid': 'm2'}]})
+        delayed.run()
+        tunnel.send.assert_called_once()
+        msg = tunnel.send.call_args[0][0]
+        assert msg['cmd'] == 'REPLIES'
+        assert [(r['msg_uuid'], r['value']) for r in msg['replies']] == [('m1', '"a"'), ('m2', '"b"')]
+
+
+@patch('calvin.runtime.north.storage.async')
+@patch('calvin.runtime.north.plugins.storage.storage_dict_local.async')
+@patch('calvin.runtime.north.plugins.storage.prefix_index.async')
+def test_proxy_server_index_backend(index_async, local_async, async):
+    for a in (index_async, local_async, async):
+        a.DelayedCall.side_effect = lambda delay, func, *args, **kwargs: func(*args, **kwargs)
+    server = storage.Storage(DummyNode(), override_storage=StorageLocal())
+    server._init_proxy()
+    tunnel = create_tunnel('t1')
+    server.add_index(['node', 'attr', 'x'], 'n1', root_prefix_level=1)
+    server.tunnel_recv_handler(tunnel, {'cmd': 'APPEND', 'key': 'index-/node/attr', 'value': '["n2"]',
+                                        'msg_uuid': 'm1'})
+    server.tunnel_recv_handler(tunnel, {'cmd': 'GET_CONCAT', 'key': 'index-/node/attr', 'msg_uuid': 'm2'})
+    reply = tunnel.send.call_args[0][0]
+    assert reply['key'] == 'index-/node/attr'
+    assert sorted(server.coder.decode(reply['value'])) == ['n1', 'n2']
+    # A client deletes one index level, the levels below it are kept
+    server.tunnel_recv_handler(tunnel, {'cmd': 'APPEND', 'key': 'index-/node/attr/y', 'value': '["n3"]',
+                                        'msg_uuid': 'm3'})
+    server.tunnel_recv_handler(tunnel, {'cmd': 'DELETE', 'key': 'index-/node/attr', 'msg_uuid': 'm4'})
+    server.tunnel_recv_handler(tunnel, {'cmd': 'GET_CONCAT', 'key': 'index-/node/attr', 'msg_uuid': 'm5'})
+    assert server.coder.decode(tunnel.send.call_args[0][0]['value']) == ['n1']
+    server.tunnel_recv_handler(tunnel, {'cmd': 'GET_CONCAT', 'key': 'index-/node/attr/y', 'msg_uuid': 'm6'})
+    assert server.coder.decode(tunnel.send.call_args[0][0]['value']) == ['n3']
+
+
+@patch('calvin.runtime.north.plugins.storage.proxy.async')
+def test_proxy_client_pipeline(async):
+    async.DelayedCall.side_effect = delayed = DelayedCalls()
+    client = StorageProxy(Mock())
+    client.tunnel = Mock()
+    client.pipeline = True
+    cb1, cb2 = Mock(), Mock()
+    client.get('node-1', cb=cb1)
+    client.get('node-2', cb=cb2)
+    assert not client.tunnel.send.called
+    delayed.run()
+    msg = client.tunnel.send.call_args[0][0]
+    assert msg['cmd'] == 'PIPELINE'
+    assert [r['key'] for r in msg['requests']] == ['node-1', 'node-2']
+    client.tunnel_recv_handler({'cmd': 'REPLIES', 'replies': [
+        {'cmd': 'REPLY', 'msg_uuid': r['msg_uuid'], 'key': r['key'], 'value': '"v"', 'pipeline': True}
+        for r in msg['requests']]})
+    cb1.assert_called_once_with(key='node-1', value='"v"')
+    cb2.assert_called_once_with(key='node-2', value='"v"')
+    assert not client.replies
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.runtime.north.plugins.storage.storage_sqlite import StorageSQLite
+
+pytestmark = pytest.mark.unittest
+
+
+def _call(delay, cb, *args, **kwargs):
+    cb(*args, **kwargs)
+
+
+@patch('calvin.runtime.north.plugins.storage.storage_sqlite.async')
+class TestStorageSQLite(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "registry", "rt1.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _start(self):
+        storage = StorageSQLite()
+        storage.path = self.path
+        cb = Mock()
+        storage.start(cb=cb, name="rt1")
+        cb.assert_called_with(True)
+        return storage
+
+    def _result(self, func, *args):
+        cb = Mock()
+        func(*args, cb=cb)
+        return cb.call_args[1]['value'] if cb.call_args[1] else cb.call_args[0][1]
+
+    def test_set_get_delete(self, async):
+        async.DelayedCall.side_effect = _call
+        storage = self._start()
+        cb = Mock()
+        storage.set("actor-1", '{"name": "a"}', cb=cb)
+        cb.assert_called_with(key="actor-1", value=True)
+        assert self._result(storage.get, "actor-1") == '{"name": "a"}'
+        storage.set("actor-1", None)
+        assert self._result(storage.get, "actor-1") is None
+        storage.stop()
+
+    def test_dict_items_canonical(self, async):
+        async.DelayedCall.side_effect = _call
+        storage = self._start()
+        # "a" and "i" collide in a small dict, the key order follows the insertion order
+        storage.append("replicas-r1", '[{"a": 1, "i": 2}]')
+        storage.append("replicas-r1", '[{"i": 2, "a": 1}]')
+        assert json.loads(self._result(storage.get_concat, "replicas-r1")) == [{"a": 1, "i": 2}]
+        storage.remove("replicas-r1", '[{"i": 2, "a": 1}]')
+        assert self._result(storage.get_concat, "replicas-r1") is None
+        storage.add_index(['/node/attribute'], json.loads('{"a": 1, "i": 2}'))
+        storage.remove_index(['/node/attribute'], json.loads('{"i": 2, "a": 1}'))
+        assert self._result(storage.get_index, '/node/attribute') == []
+        storage.stop()
+
+    def test_commit_failed(self, async):
+        async.DelayedCall.side_effect = _call
+        storage = self._start()
+        db = storage.db
+        storage.db = Mock(wraps=db)
+        storage.db.commit.side_effect = sqlite3.OperationalError("disk I/O error")
+        cb = Mock()
+        storage.set("actor-1", '{"name": "a"}', cb=cb)
+        cb.assert_called_with(key="actor-1", value=False)
+        storage.db = db
+        assert self._result(storage.get, "actor-1") is None
+        storage.stop()
+
+    def test_sets(self, async):
+        async.DelayedCall.side_effect = _call
+        storage = self._start()
+        storage.append_many([("replicas-r1", '["a1", "a2"]'), ("replicas-r2", '["a3"]')])
+        storage.append("replicas-r1", '["a2", "a4"]')
+        storage.remove("replicas-r1", '["a1"]')
+        assert sorted(json.loads(self._result(storage.get_concat, "replicas-r1"))) == ["a2", "a4"]
+        assert self._result(storage.get_concat, "replicas-r3") is None
+        storage.stop()
+
+    def test_index(self, async):
+        async.DelayedCall.side_effect = _call
+        storage = self._start()
+        storage.add_index(['/node/capabilities/c1'], "n1")
+        storage.add_index(['/node/attribute', '/node/attribute/owner', '/node/attribute/owner/org'], "n1")
+        storage.add_index(['/node/attribute', '/node/attribute/name'], "n2")
+        assert sorted(self._result(storage.get_index, '/node/attribute')) == ["n1", "n2"]
+        assert self._result(storage.get_index, '/node/attribute/owner') == ["n1"]
+        # Not queryable above its root
+        assert self._result(storage.get_index, '/node') == []
+        storage.remove_index(['/node/attribute/owner/org'], "n1")
+        assert self._result(storage.get_index, '/node/attribute') == ["n2"]
+        storage.add_index(['/node/attribute', '/node/attribute/name'], "n3")
+        storage.add_index(['/node/attribute'], "n3")
+        storage.delete_index(['/node/attribute'], below=False)
+        assert sorted(self._result(storage.get_index, '/node/attribute')) == ["n2", "n3"]
+        storage.delete_index(['/node/attribute'])
+        assert self._result(storage.get_index, '/node/attribute/name') == []
+        assert self._result(storage.get_index, '/node/capabilities/c1') == ["n1"]
+        storage.stop()
+
+    def test_warm_restart(self, async):
+        async.DelayedCall.side_effect = _call
+        storage = self._start()
+        storage.set_many([("node-1", '{"uris": []}'), ("node-2", '{"uris": []}')])
+        storage.add_index(['/node/capabilities/c1'], "n1")
+        storage.stop()
+        storage = self._start()
+        assert self._result(storage.get, "node-2") == '{"uris": []}'
+        assert self._result(storage.get_index, '/node/capabilities/c1') == ["n1"]
+        storage.stop()
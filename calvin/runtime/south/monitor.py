@@ -35,4 +35,7 @@ class Event_Monitor(object):
 
     def loop(self, scheduler):
         # Communicate endpoint, see if anyone sent anything
-        return any([endp.communicate() for endp in self.endpoints])
+        active = [endp for endp in self.endpoints if endp.communicate()]
+        if active:
+            scheduler.endpoints_communicated(active)
+        return bool(active)
@@ -32,8 +32,9 @@ from kademlia.node import Node
 from kademlia import version as kademlia_version
 from collections import Counter
 
-from twisted.python import log
+from twisted.python import log, failure
 from calvin.utilities import calvinlogger
+from calvin.runtime.north.registry_cache import RegistryCache
 import base64
 
 _log = calvinlogger.get_logger(__name__)
@@ -55,8 +56,14 @@ class KademliaProtocolAppend(KademliaProtocol):
 
     def __init__(self, *args, **kwargs):
         self.set_keys = kwargs.pop('set_keys', set([]))
+        self.value_cache = kwargs.pop('value_cache', None)
         KademliaProtocol.__init__(self, *args, **kwargs)
 
+    def _invalidate(self, key):
+        # Values stored here by other nodes supersede what was found earlier
+        if self.value_cache is not None:
+            self.value_cache.invalidate(key)
+
     ###############################################################################
     # TODO remove this when kademlia v0.6 available, bug fixes, see upstream Kademlia
     def handleCallResponse(self, result, node):
@@ -93,6 +100,7 @@ class KademliaProtocolAppend(KademliaProtocol):
         self.maybeTransferKeyValues(source)
         self.router.addContact(source)
         self.log.debug("got a store request from %s, storing value" % str(sender))
+        self._invalidate(key)
         self.storage[key] = value
         return True
 
@@ -155,6 +163,7 @@ class KademliaProtocolAppend(KademliaProtocol):
         self.maybeTransferKeyValues(source)
         self.router.addContact(source)
 
+        self._invalidate(key)
         try:
             pvalue = json.loads(value)
             self.set_keys.add(key)
@@ -184,6 +193,7 @@ class KademliaProtocolAppend(KademliaProtocol):
         self.maybeTransferKeyValues(source)
         self.router.addContact(source)
 
+        self._invalidate(key)
         try:
             pvalue = json.loads(value)
             self.set_keys.add(key)
@@ -204,14 +214,86 @@ class KademliaProtocolAppend(KademliaProtocol):
         d = self.remove(address, self.sourceNode.id, key, value)
         return d.addCallback(self.handleCallResponse, nodeToAsk)
 
+    def rpc_many(self, sender, nodeid, op, items):
+        """ Several store, append or remove operations in one request, returns a list of their results """
+        rpc = {'store': self.rpc_store, 'append': self.rpc_append, 'remove': self.rpc_remove}[op]
+        return [rpc(sender, nodeid, key, value) for key, value in items]
+
+    def callMany(self, nodeToAsk, op, items):
+        """
+        Send several (key, value) items for op to one node, the result is (reached, list of results).
+        Nodes not answering, e.g. older ones without rpc_many, get one request per item instead.
+        """
+        address = (nodeToAsk.ip, nodeToAsk.port)
+        d = self.many(address, self.sourceNode.id, op, items)
+        return d.addCallback(self._callManyResponse, nodeToAsk, op, items)
+
+    def _callManyResponse(self, result, nodeToAsk, op, items):
+        if result[0]:
+            return self.handleCallResponse(result, nodeToAsk)
+        call = {'store': self.callStore, 'append': self.callAppend, 'remove': self.callRemove}[op]
+        d = defer.gatherResults([call(nodeToAsk, key, value) for key, value in items])
+        return d.addCallback(lambda results: (any(r[0] for r in results), [r[1] for r in results]))
+
+
+class ValueCache(RegistryCache):
+    """
+    Node-local cache of values found on other nodes, keyed by operation and digest.
+    Values are kept at most ttl seconds and the cache is cleared each time the
+    server republishes its keys, since that is when the values held by the network
+    are refreshed. Only the size most recently found values are kept.
+    """
+
+    OPS = ('get', 'get_concat')
+
+    def __init__(self, size, ttl):
+        super(ValueCache, self).__init__(size, {'': ttl})
+        self.ttl = ttl
+
+    def get(self, op, dkey):
+        """Return (True, value) for a fresh entry, otherwise (False, None)"""
+        value = super(ValueCache, self).get(op + ":" + dkey)
+        return value is not None, value
+
+    def put(self, op, dkey, value):
+        super(ValueCache, self).put(op + ":" + dkey, value)
+
+    def invalidate(self, dkey):
+        for op in self.OPS:
+            super(ValueCache, self).invalidate(op + ":" + dkey)
+
+    def info(self):
+        info = super(ValueCache, self).info()
+        info['ttl'] = self.ttl
+        return info
+
 
 class AppendServer(Server):
 
-    def __init__(self, ksize=20, alpha=3, id=None, storage=None):
+    # Interval used by kademlia's refreshTable to republish keys older than it
+    REPUBLISH_INTERVAL = 3600
+    # Found values are cached for a fraction of the republish interval, values
+    # changed by other nodes between republishes are visible after at most this time
+    CACHE_TTL = REPUBLISH_INTERVAL / 360.0
+    CACHE_SIZE = 1000
+    # Maximum number of spider crawls for lookups in progress at the same time
+    MAX_CRAWLS = 16
+    # Bytes of keys and values sent in one request of set_many, append_many or remove_many,
+    # rpcudp limits a request to 8K
+    MANY_REQUEST_SIZE = 4096
+
+    def __init__(self, ksize=20, alpha=3, id=None, storage=None, cache_ttl=None, cache_size=None):
         storage = storage or ForgetfulStorageFix()
+        # Created before Server.__init__ which runs the first refreshTable
+        self.value_cache = ValueCache(self.CACHE_SIZE if cache_size is None else cache_size,
+                                      self.CACHE_TTL if cache_ttl is None else cache_ttl)
+        # Deferreds waiting for a crawl in progress, keyed by (op, dkey)
+        self.crawls = {}
+        self.crawl_limit = defer.DeferredSemaphore(self.MAX_CRAWLS)
         Server.__init__(self, ksize, alpha, id, storage=storage)
         self.set_keys=set([])
-        self.protocol = KademliaProtocolAppend(self.node, self.storage, ksize, set_keys=self.set_keys)
+        self.protocol = KademliaProtocolAppend(self.node, self.storage, ksize, set_keys=self.set_keys,
+                                               value_cache=self.value_cache)
         if kademlia_version != '0.5':
             _log.error("#################################################")
             _log.error("### EXPECTING VERSION 0.5 of kademlia package ###")
@@ -232,6 +314,67 @@ class AppendServer(Server):
             _log.debug("AppendServer.bootstrap(%s)" % addrs)
             return Server.bootstrap(self, addrs)
 
+    def refreshTable(self):
+        # Republishing refreshes the values in the network, drop what was found before
+        self.value_cache.clear()
+        return Server.refreshTable(self)
+
+    def _lookup(self, op, dkey, crawl):
+        """
+        Return a deferred with the cached value for (op, dkey), the result of a crawl
+        already in progress for it, or else the result of a new crawl started with crawl().
+        """
+        found, value = self.value_cache.get(op, dkey)
+        if found:
+            return defer.succeed(value)
+        flight = (op, dkey)
+        if flight in self.crawls:
+            d = defer.Deferred()
+            self.crawls[flight].append(d)
+            return d
+        self.crawls[flight] = []
+        return self.crawl_limit.run(crawl).addBoth(self._lookup_done, flight)
+
+    def _lookup_done(self, result, flight):
+        waiting = self.crawls.pop(flight, [])
+        failed = isinstance(result, failure.Failure)
+        if not failed and result is not None:
+            self.value_cache.put(flight[0], flight[1], result)
+        for d in waiting:
+            if failed:
+                d.errback(result)
+            else:
+                d.callback(result)
+        return result
+
+    def _local_append(self, dkey, value):
+        try:
+            pvalue = json.loads(value)
+            self.set_keys.add(dkey)
+            if dkey not in self.storage:
+                _log.debug("%s local append key: %s not in storage set value: %s" % (base64.b64encode(self.node.id), base64.b64encode(dkey), pvalue))
+                self.storage[dkey] = value
+            else:
+                old_value_ = self.storage[dkey]
+                old_value = json.loads(old_value_)
+                new_value = list(set(old_value + pvalue))
+                _log.debug("%s local append key: %s old: %s add: %s new: %s" % (base64.b64encode(self.node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
+                self.storage[dkey] = json.dumps(new_value)
+        except:
+            _log.debug("Trying to append something not a JSON coded list %s" % value, exc_info=True)
+
+    def _local_remove(self, dkey, value):
+        try:
+            pvalue = json.loads(value)
+            self.set_keys.add(dkey)
+            if dkey in self.storage:
+                old_value = json.loads(self.storage[dkey])
+                new_value = list(set(old_value) - set(pvalue))
+                self.storage[dkey] = json.dumps(new_value)
+                _log.debug("%s local remove key: %s old: %s remove: %s new: %s" % (base64.b64encode(self.node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
+        except:
+            _log.debug("Trying to remove somthing not a JSON coded list %s" % value, exc_info=True)
+
     def append(self, key, value):
         """
         For the given key append the given list values to the set in the network.
@@ -239,23 +382,12 @@ class AppendServer(Server):
         dkey = digest(key)
         node = Node(dkey)
 
+        self.value_cache.invalidate(dkey)
+
         def append_(nodes):
             # if this node is close too, then store here as well
             if not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]):
-                try:
-                    pvalue = json.loads(value)
-                    self.set_keys.add(dkey)
-                    if dkey not in self.storage:
-                        _log.debug("%s local append key: %s not in storage set value: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), pvalue))
-                        self.storage[dkey] = value
-                    else:
-                        old_value_ = self.storage[dkey]
-                        old_value = json.loads(old_value_)
-                        new_value = list(set(old_value + pvalue))
-                        _log.debug("%s local append key: %s old: %s add: %s new: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
-                        self.storage[dkey] = json.dumps(new_value)
-                except:
-                    _log.debug("Trying to append something not a JSON coded list %s" % value, exc_info=True)
+                self._local_append(dkey, value)
             ds = [self.protocol.callAppend(n, dkey, value) for n in nodes]
             return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
 
@@ -275,6 +407,7 @@ class AppendServer(Server):
         _log.debug("setting '%s' = '%s' on network" % (key, value))
         dkey = digest(key)
         node = Node(dkey)
+        self.value_cache.invalidate(dkey)
 
         def store(nodes):
             _log.debug("setting '%s' to %s on %s" % (key, value, map(str, nodes)))
@@ -311,8 +444,10 @@ class AppendServer(Server):
         if len(nearest) == 0:
             self.log.warning("There are no known neighbors to get key %s" % key)
             return defer.succeed(None)
-        spider = ValueSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha)
-        return spider.find()
+
+        def crawl():
+            return ValueSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha).find()
+        return self._lookup('get', dkey, crawl)
 
     def remove(self, key, value):
         """
@@ -321,20 +456,12 @@ class AppendServer(Server):
         dkey = digest(key)
         node = Node(dkey)
         _log.debug("Server:remove %s" % base64.b64encode(dkey))
+        self.value_cache.invalidate(dkey)
 
         def remove_(nodes):
             # if this node is close too, then store here as well
             if not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]):
-                try:
-                    pvalue = json.loads(value)
-                    self.set_keys.add(dkey)
-                    if dkey in self.storage:
-                        old_value = json.loads(self.storage[dkey])
-                        new_value = list(set(old_value) - set(pvalue))
-                        self.storage[dkey] = json.dumps(new_value)
-                        _log.debug("%s local remove key: %s old: %s remove: %s new: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
-                except:
-                    _log.debug("Trying to remove somthing not a JSON coded list %s" % value, exc_info=True)
+                self._local_remove(dkey, value)
             ds = [self.protocol.callRemove(n, dkey, value) for n in nodes]
             return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
 
@@ -365,9 +492,87 @@ class AppendServer(Server):
                 return defer.succeed(value)
             self.log.warning("There are no known neighbors to get key %s" % key)
             return defer.succeed(None)
-        spider = ValueListSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha,
-                                      local_value=value if exists else None)
-        return spider.find()
+
+        def crawl():
+            return ValueListSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha,
+                                        local_value=value if exists else None).find()
+        return self._lookup('get_concat', dkey, crawl)
+
+    def set_many(self, items):
+        """
+        Set several (key, value) items in the network, each node closest to some of the keys gets
+        one request with all of its items. Returns a deferred with a list of (key, success).
+        """
+        return self._many('store', items)
+
+    def append_many(self, items):
+        """
+        For several (key, value) items append the list values to the set of key in the network
+        """
+        return self._many('append', items)
+
+    def remove_many(self, items):
+        """
+        For several (key, value) items remove the list values from the set of key in the network
+        """
+        return self._many('remove', items)
+
+    def _many(self, op, items):
+        dkeys = [digest(key) for key, _ in items]
+        crawls = []
+        for dkey in dkeys:
+            self.value_cache.invalidate(dkey)
+            node = Node(dkey)
+            nearest = self.protocol.router.findNeighbors(node)
+            if len(nearest) == 0:
+                _log.warning("There are no known neighbors to %s key %s" % (op, base64.b64encode(dkey)))
+                crawls.append(defer.succeed(None))
+            else:
+                crawls.append(NodeSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha).find())
+        return defer.gatherResults(crawls).addCallback(self._many_found, op, items, dkeys)
+
+    def _many_found(self, found, op, items, dkeys):
+        local = {'store': self.storage.__setitem__, 'append': self._local_append, 'remove': self._local_remove}[op]
+        # node id -> (node, list of (item index, dkey, value))
+        requests = {}
+        for i, (nodes, (_, value), dkey) in enumerate(zip(found, items, dkeys)):
+            if nodes is None:
+                continue
+            node = Node(dkey)
+            # if this node is close too, then store here as well
+            if (not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]) or
+                    (op == 'store' and dkey in self.storage)):
+                local(dkey, value)
+            for n in nodes:
+                requests.setdefault(n.id, (n, []))[1].append((i, dkey, value))
+        calls = []
+        for n, entries in requests.itervalues():
+            for chunk in self._many_chunks(entries):
+                d = self.protocol.callMany(n, op, [(dkey, value) for _, dkey, value in chunk])
+                calls.append(d.addCallback(lambda result, chunk=chunk: (chunk, result)))
+        return defer.gatherResults(calls).addCallback(self._many_done, items)
+
+    def _many_chunks(self, entries):
+        chunk, size = [], 0
+        for entry in entries:
+            entry_size = len(entry[1]) + len(entry[2])
+            if chunk and size + entry_size > self.MANY_REQUEST_SIZE:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(entry)
+            size += entry_size
+        if chunk:
+            yield chunk
+
+    def _many_done(self, responses, items):
+        # As for a single operation, an item succeeded when any of the nodes stored it
+        success = [False] * len(items)
+        for chunk, (reached, results) in responses:
+            if not reached:
+                continue
+            for (i, _, _), result in zip(chunk, results):
+                success[i] = success[i] or bool(result)
+        return [(key, ok) for (key, _), ok in zip(items, success)]
 
 class ValueListSpiderCrawl(ValueSpiderCrawl):
 
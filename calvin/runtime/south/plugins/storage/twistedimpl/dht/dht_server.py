@@ -215,6 +215,24 @@ class AutoDHTServer(StorageBase):
     def remove(self, key, value, cb=None):
         return TwistedWaitObject(self.dht_server.remove, key=key, value=value, cb=cb)
 
+    def _many(self, func, items, cb):
+        # One deferred for all items, cb is called per key with its success
+        def done(results):
+            if cb:
+                for key, success in results:
+                    cb(key, success)
+            return results
+        return func(items=items).addCallback(done)
+
+    def set_many(self, items, cb=None):
+        return self._many(self.dht_server.set_many, items, cb)
+
+    def append_many(self, items, cb=None):
+        return self._many(self.dht_server.append_many, items, cb)
+
+    def remove_many(self, items, cb=None):
+        return self._many(self.dht_server.remove_many, items, cb)
+
     def bootstrap(self, addrs, cb=None):
         return TwistedWaitObject(self.dht_server.bootstrap, addr=addrs, cb=cb)
 
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+import random
+import time
+
+from twisted.internet import reactor, defer
+
+from calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server import AppendServer
+
+# So it skips if we dont have twisted plugin
+def _dummy_inline(*args):
+    pass
+
+if not hasattr(pytest, 'inlineCallbacks'):
+    pytest.inlineCallbacks = _dummy_inline
+
+# Network sizes to measure lookup latency for
+NETWORK_SIZES = [4, 8, 16, 32]
+KEYS = 20
+LOOKUPS = 100
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    ordered = sorted(samples)
+    return [ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))] for p in points]
+
+
+@defer.inlineCallbacks
+def start_network(size):
+    """Start size in-process nodes on localhost, each bootstrapped from the ones started before it"""
+    nodes = []
+    ports = []
+    bootstrap = []
+    for _ in xrange(size):
+        server = AppendServer()
+        port = reactor.listenUDP(0, server.protocol, interface="127.0.0.1")
+        if bootstrap:
+            yield server.bootstrap(bootstrap)
+        bootstrap.append(("127.0.0.1", port.getHost().port))
+        nodes.append(server)
+        ports.append(port)
+    defer.returnValue((nodes, ports))
+
+
+@defer.inlineCallbacks
+def measure(nodes, keys, concat=False, cached=False):
+    """Latency percentiles in ms of lookups of random keys from random nodes"""
+    samples = []
+    if cached:
+        # Warm the caches of all nodes
+        for node in nodes:
+            for key in keys:
+                yield (node.get_concat if concat else node.get)(key)
+    for _ in xrange(LOOKUPS):
+        node = random.choice(nodes)
+        if not cached:
+            node.value_cache.clear()
+        lookup = node.get_concat if concat else node.get
+        start = time.time()
+        yield lookup(random.choice(keys))
+        samples.append((time.time() - start) * 1000.0)
+    defer.returnValue(percentiles(samples))
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(pytest.inlineCallbacks == _dummy_inline,
+                    reason="No inline twisted plugin enabled, please use --twisted to py.test")
+@pytest.inlineCallbacks
+def test_lookup_latency():
+    """Print lookup latency percentiles (ms) for growing networks of in-process nodes"""
+    rows = []
+    for size in NETWORK_SIZES:
+        nodes, ports = yield start_network(size)
+        try:
+            keys = ["bench-%d-%d" % (size, i) for i in xrange(KEYS)]
+            for key in keys:
+                assert (yield nodes[0].set(key, '"value"'))
+                assert (yield nodes[0].append(key + "-set", '["value"]'))
+            rows.append((size, "get", (yield measure(nodes, keys))))
+            rows.append((size, "get cached", (yield measure(nodes, keys, cached=True))))
+            rows.append((size, "get_concat", (yield measure(nodes, [k + "-set" for k in keys], concat=True))))
+            rows.append((size, "get_concat cached",
+                         (yield measure(nodes, [k + "-set" for k in keys], concat=True, cached=True))))
+        finally:
+            for port in ports:
+                yield port.stopListening()
+    print "\n%6s %-18s %8s %8s %8s" % ("nodes", "lookup", "p50", "p90", "p99")
+    for size, lookup, (p50, p90, p99) in rows:
+        print "%6d %-18s %8.2f %8.2f %8.2f" % (size, lookup, p50, p90, p99)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+from mock import Mock, patch
+from twisted.internet import defer
+
+from calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server import AppendServer, ValueCache
+from kademlia.utils import digest
+from kademlia.node import Node
+
+pytestmark = pytest.mark.unittest
+
+
+def create_server(cache_ttl=None):
+    server = AppendServer(cache_ttl=cache_ttl)
+    server.protocol.router.findNeighbors = Mock(return_value=[Node(digest("peer"), "127.0.0.1", 5000)])
+    return server
+
+
+@patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.ValueSpiderCrawl')
+def test_concurrent_gets_share_crawl(spider):
+    crawl = defer.Deferred()
+    spider.return_value.find.return_value = crawl
+    server = create_server()
+    results = []
+    server.get("key").addCallback(results.append)
+    server.get("key").addCallback(results.append)
+    assert spider.return_value.find.call_count == 1
+    crawl.callback("value")
+    assert results == ["value", "value"]
+    assert not server.crawls
+
+
+@patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.ValueSpiderCrawl')
+def test_found_value_cached(spider):
+    spider.return_value.find.side_effect = lambda: defer.succeed("value")
+    server = create_server()
+    results = []
+    server.get("key").addCallback(results.append)
+    server.get("key").addCallback(results.append)
+    assert results == ["value", "value"]
+    assert spider.return_value.find.call_count == 1
+    # A local write of the key drops the cached value
+    with patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.NodeSpiderCrawl'):
+        server.set("key", "new")
+    server.get("key").addCallback(results.append)
+    assert spider.return_value.find.call_count == 2
+
+
+@patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.ValueSpiderCrawl')
+def test_not_found_not_cached(spider):
+    spider.return_value.find.side_effect = lambda: defer.succeed(None)
+    server = create_server()
+    server.get("key")
+    server.get("key")
+    assert spider.return_value.find.call_count == 2
+
+
+@patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.ValueSpiderCrawl')
+def test_failed_crawl_reaches_all(spider):
+    crawl = defer.Deferred()
+    spider.return_value.find.return_value = crawl
+    server = create_server()
+    errors = []
+    server.get("key").addErrback(errors.append)
+    server.get("key").addErrback(errors.append)
+    crawl.errback(Exception("lost"))
+    assert len(errors) == 2
+    assert not server.value_cache.entries
+
+
+def test_remote_store_invalidates():
+    server = create_server()
+    dkey = digest("key")
+    server.value_cache.put('get', dkey, "old")
+    server.value_cache.put('get_concat', dkey, "[]")
+    server.protocol.router.addContact = Mock()
+    server.protocol.rpc_store(("127.0.0.1", 5000), digest("node"), dkey, "new")
+    assert not server.value_cache.entries
+
+
+def test_refresh_clears_cache():
+    server = create_server()
+    server.value_cache.put('get', digest("key"), "value")
+    server.refreshTable()
+    assert not server.value_cache.entries
+
+
+@patch('calvin.runtime.north.registry_cache.time')
+def test_cache_ttl_and_size(time):
+    time.time.return_value = 100.0
+    cache = ValueCache(2, 10.0)
+    cache.put('get', "a", 1)
+    cache.put('get', "b", 2)
+    cache.put('get', "c", 3)
+    assert cache.get('get', "a") == (False, None)
+    assert cache.get('get', "c") == (True, 3)
+    time.time.return_value = 111.0
+    assert cache.get('get', "c") == (False, None)
+    assert cache.info()['hits'] == 1
+    assert cache.info()['misses'] == 2
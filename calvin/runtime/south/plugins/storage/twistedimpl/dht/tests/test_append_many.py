@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import pytest
+from mock import Mock, patch
+from twisted.internet import defer
+
+from calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server import AppendServer
+from kademlia.utils import digest
+from kademlia.node import Node
+
+pytestmark = pytest.mark.unittest
+
+PEERS = [Node(digest("peer1"), "127.0.0.1", 5001), Node(digest("peer2"), "127.0.0.1", 5002)]
+
+
+def create_server():
+    server = AppendServer()
+    server.protocol.router.findNeighbors = Mock(return_value=PEERS)
+    return server
+
+
+@patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.NodeSpiderCrawl')
+def test_one_request_per_node(spider):
+    spider.return_value.find.side_effect = lambda: defer.succeed(PEERS)
+    server = create_server()
+    server.protocol.many = Mock(side_effect=lambda address, nodeid, op, items: defer.succeed((True, [True] * len(items))))
+    results = []
+    server.append_many([("a", '["1"]'), ("b", '["2"]'), ("c", '["3"]')]).addCallback(results.append)
+    assert results == [[("a", True), ("b", True), ("c", True)]]
+    assert server.protocol.many.call_count == len(PEERS)
+    for args, _ in server.protocol.many.call_args_list:
+        assert args[2] == 'append'
+        assert args[3] == [(digest("a"), '["1"]'), (digest("b"), '["2"]'), (digest("c"), '["3"]')]
+
+
+@patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.NodeSpiderCrawl')
+def test_success_from_any_node(spider):
+    spider.return_value.find.side_effect = lambda: defer.succeed(PEERS)
+    server = create_server()
+    replies = {PEERS[0].port: (True, [True, False]), PEERS[1].port: (False, None)}
+    server.protocol.many = Mock(side_effect=lambda address, nodeid, op, items: defer.succeed(replies[address[1]]))
+    # A node not answering the batch gets one request per item
+    server.protocol.callStore = Mock(return_value=defer.succeed((False, None)))
+    results = []
+    server.set_many([("a", "1"), ("b", "2")]).addCallback(results.append)
+    assert results == [[("a", True), ("b", False)]]
+    assert server.protocol.callStore.call_count == 2
+
+
+@patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.NodeSpiderCrawl')
+def test_requests_split(spider):
+    spider.return_value.find.side_effect = lambda: defer.succeed(PEERS[:1])
+    server = create_server()
+    server.MANY_REQUEST_SIZE = 50
+    server.protocol.many = Mock(side_effect=lambda address, nodeid, op, items: defer.succeed((True, [True] * len(items))))
+    results = []
+    server.remove_many([("key%d" % i, '["value"]') for i in range(5)]).addCallback(results.append)
+    assert all(success for _, success in results[0])
+    assert server.protocol.many.call_count == 5
+
+
+def test_no_neighbors():
+    server = AppendServer()
+    results = []
+    server.set_many([("a", "1")]).addCallback(results.append)
+    assert results == [[("a", False)]]
+
+
+def test_rpc_many():
+    server = AppendServer()
+    protocol = server.protocol
+    sender = ("127.0.0.1", 5001)
+    assert protocol.rpc_many(sender, PEERS[0].id, 'append', [("a", '["1"]'), ("b", '["2"]')]) == [True, True]
+    assert protocol.rpc_many(sender, PEERS[0].id, 'remove', [("a", '["1"]')]) == [True]
+    assert protocol.rpc_many(sender, PEERS[0].id, 'store', [("c", "3")]) == [True]
+    assert json.loads(server.storage["a"]) == []
+    assert json.loads(server.storage["b"]) == ["2"]
+    assert server.storage["c"] == "3"
@@ -19,6 +19,7 @@ from calvin.runtime.north.plugins.coders.messages import message_coder_factory
 
 from calvin.utilities import calvinlogger
 from urlparse import urlparse
+from collections import OrderedDict
 
 _log = calvinlogger.get_logger(__name__)
 
@@ -103,14 +104,20 @@ class BaseTransport(CalvinCBClass):
 
     def get_coders(self):
         """
-            Return the filtered coders on this transport
+            Return the filtered coders on this transport in priority order
                 can be a subset of the total in the system.
         """
-        coders = {}
+        coders = OrderedDict()
         for coder in message_coder_factory.get_prio_list():
             coders[coder] = message_coder_factory.get(coder)
         return coders
 
+    def supports_batch(self):
+        """
+            Return True when the peer unpacks BATCH messages, i.e. a list of messages in one payload
+        """
+        return False
+
     def send(self, payload, timeout=None):
         """
             Send data with a payload to the transport with a timepout
@@ -20,11 +20,12 @@ from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinuuid
 from calvin.runtime.south.plugins.transports import base_transport
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
 
 _log = calvinlogger.get_logger(__name__)
 
-_join_request_reply = {'cmd': 'JOIN_REPLY', 'id': None, 'sid': None, 'serializer': None}
-_join_request = {'cmd': 'JOIN_REQUEST', 'id': None, 'sid': None, 'serializers': []}
+_join_request_reply = {'cmd': 'JOIN_REPLY', 'id': None, 'sid': None, 'serializer': None, 'batch': True}
+_join_request = {'cmd': 'JOIN_REQUEST', 'id': None, 'sid': None, 'serializers': [], 'batch': True}
 
 
 class CalvinTransport(base_transport.BaseTransport):
@@ -48,6 +49,8 @@ class CalvinTransport(base_transport.BaseTransport):
         self._node_name = node_name
         self._remote_rt_id = None
         self._coder = None
+        # Peer unpacks BATCH messages, from the join handshake
+        self._peer_batch = False
         self._transport = transport(self._uri.hostname, self._uri.port, callbacks, proto=proto, node_name=self._node_name, server_node_name=server_node_name)
         self._rtt = None  # Init rtt in s
 
@@ -82,6 +85,9 @@ class CalvinTransport(base_transport.BaseTransport):
     def is_connected(self):
         return self._transport.is_connected()
 
+    def supports_batch(self):
+        return self._peer_batch
+
     def send(self, payload, timeout=None, coder=None):
         tcoder = coder or self._coder
         try:
@@ -112,6 +118,7 @@ class CalvinTransport(base_transport.BaseTransport):
         msg['id'] = self._rt_id
         msg['sid'] = self._get_msg_uuid()
         msg['serializers'] = self.get_coders().keys()
+        msg['coder_capabilities'] = message_coder_factory.get_capabilities()
         self._join_start = time.time()
         self.send(msg, coder=self._get_join_coder())
 
@@ -136,12 +143,14 @@ class CalvinTransport(base_transport.BaseTransport):
                 raise Exception('Not a valid package "%s"' % data_obj)
 
             sid = data_obj['sid']
+            self._peer_batch = data_obj.get('batch', False)
 
-            for coder in self.get_coders():
-                if coder in data_obj['serializers']:
-                    self._coder = self.get_coders()[coder]
-                    coder_name = coder
-                    break
+            coders = self.get_coders()
+            coder_name = message_coder_factory.select(data_obj['serializers'],
+                                                      data_obj.get('coder_capabilities'),
+                                                      prio_list=coders.keys())
+            if coder_name is not None:
+                self._coder = coders[coder_name]
 
             # Verify remote
             valid = self._verify_client(data_obj)
@@ -181,6 +190,8 @@ class CalvinTransport(base_transport.BaseTransport):
             if data_obj['serializer'] in self.get_coders():
                 self._coder = self.get_coders()[data_obj['serializer']]
 
+            self._peer_batch = data_obj.get('batch', False)
+
             if data_obj['id'] is not None:
                 # Request denied
                 self._remote_rt_id = data_obj['id']
@@ -234,7 +245,12 @@ class CalvinTransport(base_transport.BaseTransport):
             data_obj = self._coder.decode(data)
         except:
             _log.exception("Message decode failed")
-        self._callback_execute('data_received', self, data_obj)
+        if data_obj and data_obj.get('cmd') == 'BATCH':
+            # Coalesced messages, handle them in order
+            for msg in data_obj['msgs']:
+                self._callback_execute('data_received', self, msg)
+        else:
+            self._callback_execute('data_received', self, data_obj)
 
 
 class CalvinServer(base_transport.BaseServer):
@@ -20,7 +20,9 @@ from mock import Mock
 from calvin.tests import DummyNode, TestPort
 from calvin.runtime.north.actormanager import ActorManager
 from calvin.runtime.north.plugins.port.endpoint import LocalOutEndpoint, LocalInEndpoint
-from calvin.actor.actor import Actor
+from calvin.actor.actor import Actor, condition
+from calvin.actor.actorcost import ActorCost
+from calvin.runtime.north.calvin_token import Token, ExceptionToken
 from calvin.runtime.north.plugins.port import queue
 
 pytestmark = pytest.mark.unittest
@@ -37,6 +39,34 @@ def create_actor(node):
     return actor
 
 
+class BatchIdentity(Actor):
+    inport_properties = {'token': {}}
+    outport_properties = {'token': {}}
+
+    def init(self):
+        pass
+
+    @condition(['token'], ['token'], batch=3)
+    def forward(self, tokens):
+        return (tokens, )
+
+    action_priority = (forward, )
+
+
+def create_batch_actor():
+    actor = BatchIdentity('test.BatchIdentity')
+    actor.enable()
+    actor.check_authorization_decision = Mock(return_value=True)
+    actor.exception_handler = Mock(return_value=(ExceptionToken(), ))
+    inport = actor.inports['token']
+    inport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 8, 'direction': "in"}, {}))
+    inport.queue.add_reader(inport.id, {})
+    outport = actor.outports['token']
+    outport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+    outport.queue.add_reader('reader', {})
+    return actor
+
+
 @pytest.fixture
 def actor():
     return create_actor(DummyNode())
@@ -216,3 +246,87 @@ def test_requirements(actor):
     actor.requirements_add([6, 7], extend=True)
     assert actor.requirements_get()[:-1] == [4, 5, 6, 7]
     assert actor.requirements_get()[-1]['op'] == 'port_property_match'
+
+
+def test_fire_cost(actor):
+    actor.enable()
+    actor.check_authorization_decision = Mock(return_value=True)
+    inport = actor.inports['token']
+    for i in range(3):
+        inport.queue.write(Token(i), None)
+    assert actor.fire()
+    assert actor.cost.fire_count == 1
+    assert actor.cost.action_count == 3
+    assert actor.cost.token_count == 3
+    assert actor.cost.avg_tokens == 1.0
+    assert not actor.fire()
+    assert actor.cost.fire_count == 1
+
+
+def test_fire_single_action_time_slice(actor):
+    actor.enable()
+    actor.check_authorization_decision = Mock(return_value=True)
+    inport = actor.inports['token']
+    for i in range(3):
+        inport.queue.write(Token(i), None)
+    assert actor.fire(0.0)
+    assert actor.cost.action_count == 1
+
+
+def test_cost_time_slice():
+    cost = ActorCost()
+    assert cost.time_slice(0.02, 0.05) == 0.02
+    cost.update(0.0001, 10)
+    assert cost.time_slice(0.02, 0.05) == 0.05
+    cost = ActorCost()
+    cost.update(0.03, 1)
+    assert cost.time_slice(0.02, 0.05) == 0.0
+    cost = ActorCost()
+    cost.update(0.005, 1)
+    assert cost.time_slice(0.02, 0.05) == 0.02
+
+
+def test_batch_condition():
+    actor = create_batch_actor()
+    inport = actor.inports['token']
+    outport = actor.outports['token']
+    for i in range(5):
+        inport.queue.write(Token(i), None)
+    assert actor.fire(0.0)
+    assert actor.cost.token_count == 3
+    assert [outport.queue.peek('reader').value for _ in range(3)] == [0, 1, 2]
+    outport.queue.commit('reader')
+    # Two tokens left in inport, four free slots in outport
+    assert actor.fire(0.0)
+    assert [outport.queue.peek('reader').value for _ in range(2)] == [3, 4]
+    assert not inport.tokens_available(1)
+
+
+def test_batch_condition_limited_by_slots():
+    actor = create_batch_actor()
+    inport = actor.inports['token']
+    outport = actor.outports['token']
+    for i in range(6):
+        inport.queue.write(Token(i), None)
+    assert actor.fire()
+    # Outport queue holds 4 tokens
+    assert not outport.tokens_available(1)
+    assert inport.tokens_available(2)
+    assert not inport.tokens_available(3)
+
+
+def test_batch_condition_exception_token():
+    actor = create_batch_actor()
+    inport = actor.inports['token']
+    outport = actor.outports['token']
+    inport.queue.write(Token(0), None)
+    inport.queue.write(ExceptionToken(), None)
+    inport.queue.write(Token(2), None)
+    assert actor.fire(0.0)
+    assert outport.queue.peek('reader').value == 0
+    assert not outport.queue.tokens_available(1, 'reader')
+    assert actor.fire(0.0)
+    assert actor.exception_handler.called
+    assert isinstance(outport.queue.peek('reader'), ExceptionToken)
+    assert actor.fire(0.0)
+    assert outport.queue.peek('reader').value == 2
@@ -21,6 +21,7 @@ from mock import Mock, patch
 from calvin.tests import DummyNode
 from calvin.runtime.north.actormanager import ActorManager
 from calvin.runtime.north.plugins.port import queue
+import calvin.requests.calvinresponse as response
 
 pytestmark = pytest.mark.unittest
 
@@ -148,6 +149,75 @@ class ActorManagerTests(unittest.TestCase):
         self.assertEqual(cb.kwargs['ports'], actor.connections(self.am.node.id))
         self.am.node.control.log_actor_migrate.assert_called_once_with(actor_id, peer_node.id)
 
+    def test_migrate_batch(self):
+        callback_mock = Mock()
+        self.am.node.proto = Mock()
+        node_id = self.am.node.id
+        peer_node = DummyNode()
+        src, src_id = self._new_actor('std.Constant', {'data': 42})
+        snk, snk_id = self._new_actor('std.Identity', {})
+        src.connections = Mock(return_value={'actor_id': src_id, 'actor_name': '', 'inports': {},
+                                             'outports': {'p1': [(node_id, 'p2')]}})
+        snk.connections = Mock(return_value={'actor_id': snk_id, 'actor_name': '', 'inports': {'p2': [(node_id, 'p1')]},
+                                             'outports': {'p3': [('n3', 'p4')]}})
+
+        self.am.migrate_batch([src_id, snk_id], peer_node.id, callback_mock)
+
+        # All connections are collected before disconnecting
+        self.assertEqual(self.am.node.pm.disconnect.call_count, 2)
+        for args, kwargs in self.am.node.pm.disconnect.call_args_list:
+            kwargs['callback'](status=response.CalvinResponse(True))
+        self.assertEqual(len(self.am.actors), 0)
+        self.assertEqual(self.am.node.proto.actor_new_batch.call_count, 1)
+        args, kwargs = self.am.node.proto.actor_new_batch.call_args
+        self.assertEqual(args[0], peer_node.id)
+        actors = args[2]
+        self.assertEqual([a['actor_id'] for a in actors], [src_id, snk_id])
+        self.assertEqual(actors[0]['state']['managed']['data'], 42)
+        assert not callback_mock.called
+
+        # On failure connections between the actors are left for storage to find
+        args[1](status=response.CalvinResponse(False))
+        args, kwargs = callback_mock.call_args
+        self.assertEqual(kwargs['status'].status, 500)
+        self.assertEqual(kwargs['actors'][0]['ports']['outports'], {'p1': [(None, 'p2')]})
+        self.assertEqual(kwargs['actors'][1]['ports']['outports'], {'p3': [('n3', 'p4')]})
+
+    def test_migrate_batch_non_existing_actor_returns_false(self):
+        callback_mock = Mock()
+        actor, actor_id = self._new_actor('std.Constant', {'data': 42})
+
+        self.am.migrate_batch([actor_id, "123"], DummyNode().id, callback_mock)
+        args, kwargs = callback_mock.call_args
+        self.assertEqual(kwargs['status'].status, 500)
+        assert not self.am.node.pm.disconnect.called
+
+    def test_new_batch_from_migration(self):
+        callback_mock = Mock()
+        node_id = self.am.node.id
+
+        def new_from_migration(actor_type, state, callback):
+            self.am.actors[state['private']['_id']] = Mock()
+            callback(status=response.CalvinResponse(True), actor_id=state['private']['_id'])
+        self.am.new_from_migration = Mock(side_effect=new_from_migration)
+        actors = [
+            {'actor_type': 'std.Constant', 'actor_state': {'private': {'_id': 'a1'}},
+             'prev_connections': {'inports': {}, 'outports': {'p1': [('n1', 'p2')]}}},
+            {'actor_type': 'std.Identity', 'actor_state': {'private': {'_id': 'a2'}},
+             'prev_connections': {'inports': {'p2': [('n1', 'p1')]}, 'outports': {'p3': [('n3', 'p4')]}}}]
+
+        self.am.new_batch_from_migration(actors, callback_mock)
+
+        # Actors in the batch are connected once and locally
+        connects = sorted((kwargs['port_id'], kwargs['peer_node_id'], kwargs['peer_port_id'])
+                          for args, kwargs in self.am.node.pm.connect.call_args_list)
+        self.assertEqual(connects, [('p1', node_id, 'p2'), ('p3', 'n3', 'p4')])
+        assert not callback_mock.called
+        for args, kwargs in self.am.node.pm.connect.call_args_list:
+            kwargs['callback'](status=response.CalvinResponse(True), peer_port_id=kwargs['peer_port_id'])
+        args, kwargs = callback_mock.call_args
+        self.assertEqual(kwargs['status'].status, 200)
+
     def test_connect(self):
         actor, actor_id = self._new_actor('std.Constant', {'data': 42})
         connection_list = [['1', '2', '3', '4'], ['5', '6', '7', '8']]
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import json
+import pytest
+from mock import patch
+
+from calvin.csparser import cscompile
+from calvin.csparser.parser import calvin_parse, get_parser
+from calvin.actorstore.store import DocumentationStore
+from calvin.Tools import cscompiler
+
+pytestmark = pytest.mark.unittest
+
+script = """
+src : std.CountTimer()
+snk : io.Print()
+src.integer > snk.token
+"""
+
+
+def test_parser_reused():
+    assert get_parser() is get_parser()
+    _, it = calvin_parse("src : std.CountTimer()\nsrc.integer > \n")
+    assert it.error_count == 1
+    # Line numbers start over for each parse
+    _, it = calvin_parse("\n\nsrc : std.CountTimer()\nsrc.integer > \n")
+    assert it.error_count == 1
+    assert list(it.errors())[0]['line'] == 4
+
+
+def test_compile_cache():
+    cscompile._compiled.clear()
+    with patch('calvin.csparser.cscompile.calvin_codegen', wraps=cscompile.calvin_codegen) as codegen:
+        deployable, it = cscompile.compile_script(script, 'cached.calvin')
+        assert it.error_count == 0
+        deployable['actors'].clear()
+        again, it = cscompile.compile_script(script, 'cached.calvin')
+        assert codegen.call_count == 1
+        # A copy is returned, modifying it doesn't affect the cache
+        assert 'cached:src' in again['actors']
+        cscompile.compile_script(script, 'renamed.calvin')
+        assert codegen.call_count == 2
+        cscompile.compile_script(script + "\n", 'cached.calvin')
+        assert codegen.call_count == 3
+
+
+def test_compile_cache_actor_changed():
+    cscompile._compiled.clear()
+    with patch('calvin.csparser.cscompile.calvin_codegen', wraps=cscompile.calvin_codegen) as codegen:
+        with patch('calvin.csparser.cscompile._actorstore_fingerprint', return_value='a'):
+            cscompile.compile_script(script, 'cached.calvin')
+            cscompile.compile_script(script, 'cached.calvin')
+        assert codegen.call_count == 1
+        with patch('calvin.csparser.cscompile._actorstore_fingerprint', return_value='b'):
+            cscompile.compile_script(script, 'cached.calvin')
+        assert codegen.call_count == 2
+
+
+def test_compile_cache_size():
+    cscompile._compiled.clear()
+    with patch.object(cscompile._conf, 'get', return_value=2):
+        for name in ('a.calvin', 'b.calvin', 'c.calvin'):
+            cscompile.compile_script(script, name)
+    assert len(cscompile._compiled) == 2
+    assert [key[1] for key in cscompile._compiled] == ['b', 'c']
+
+
+@pytest.mark.parametrize('actor_type', ['std.CountTimer', 'io.Print', 'std.Constant', 'misc.Foo'])
+def test_metadata(actor_type):
+    store = DocumentationStore()
+    assert store.metadata(actor_type) == store._help(actor_type).metadata()
+
+
+def _batch_tree(tmpdir):
+    tmpdir.join('good.calvin').write(script)
+    tmpdir.mkdir('sub').join('bad.calvin').write("snk : io.Print()\nsrc.integer > snk.token\n")
+    tmpdir.mkdir('.hidden').join('skipped.calvin').write(script)
+    return str(tmpdir.join('report.json'))
+
+
+def test_batch_compile(tmpdir):
+    report_file = _batch_tree(tmpdir)
+    report = cscompiler.compile_batch([str(tmpdir)], False, False, jobs=1, report_file=report_file)
+    assert report['summary'] == {'compiled': 1, 'unchanged': 0, 'failed': 1}
+    good = report['scripts'][str(tmpdir.join('good.calvin'))]
+    bad = report['scripts'][str(tmpdir.join('sub', 'bad.calvin'))]
+    assert good['status'] == 'compiled'
+    assert bad['status'] == 'failed'
+    assert bad['issues'][0]['type'] == 'error'
+    deployable = json.loads(tmpdir.join('good.json').read())
+    assert 'good:src' in deployable['actors']
+    assert not tmpdir.join('sub', 'bad.json').check()
+    assert json.loads(open(report_file).read()) == report
+
+
+def test_batch_compile_unchanged(tmpdir):
+    report_file = _batch_tree(tmpdir)
+    cscompiler.compile_batch([str(tmpdir)], False, False, jobs=1, report_file=report_file)
+    report = cscompiler.compile_batch([str(tmpdir)], False, False, jobs=1, report_file=report_file)
+    assert report['summary'] == {'compiled': 0, 'unchanged': 1, 'failed': 1}
+    # Changed options, script and missing output are compiled again
+    report = cscompiler.compile_batch([str(tmpdir)], False, False, jobs=1, report_file=report_file, sort_keys=True)
+    assert report['summary']['compiled'] == 1
+    tmpdir.join('good.calvin').write(script + "\n")
+    report = cscompiler.compile_batch([str(tmpdir)], False, False, jobs=1, report_file=report_file, sort_keys=True)
+    assert report['summary']['compiled'] == 1
+    os.remove(str(tmpdir.join('good.json')))
+    report = cscompiler.compile_batch([str(tmpdir)], False, False, jobs=1, report_file=report_file, sort_keys=True)
+    assert report['summary']['compiled'] == 1
+
+
+def test_batch_compile_parallel(tmpdir):
+    for i in range(4):
+        tmpdir.join('app{}.calvin'.format(i)).write(script)
+    report = cscompiler.compile_batch([str(tmpdir)], False, False, jobs=2)
+    assert report['summary'] == {'compiled': 4, 'unchanged': 0, 'failed': 0}
+    for i in range(4):
+        deployable = json.loads(tmpdir.join('app{}.json'.format(i)).read())
+        assert 'app{}:src'.format(i) in deployable['actors']
@@ -93,7 +93,9 @@ class TestTunnelEndpoint(unittest.TestCase):
             'port_id': self.port.id,
             'peer_port_id': self.peer_port.id,
             'sequencenbr': 0,
-            'value': 'ACK'
+            'value': 'ACK',
+            'window': 3,
+            'token_formats': ['compact', 'dict']
         }
         payload = {
             'port_id': self.port.id,
@@ -126,6 +128,26 @@ class TestTunnelEndpoint(unittest.TestCase):
         expected_reply['value'] = 'ACK'
         self.tunnel.send.assert_called_with(expected_reply)
 
+    def test_recv_tokens(self):
+        payload = {
+            'port_id': self.port.id,
+            'peer_port_id': self.peer_port.id,
+            'sequencenbr': 0,
+            'tokens': [{'type': 'Token', 'value': v} for v in range(3)]
+        }
+        self.tunnel_in.recv_tokens(payload)
+        assert self.trigger_loop.called
+        assert [t.value for t in self.port.queue.fifo[:3]] == [0, 1, 2]
+        reply = self.tunnel.send.call_args[0][0]
+        assert reply['cmd'] == 'TOKENS_REPLY'
+        assert (reply['sequencenbr'], reply['count'], reply['value'], reply['window']) == (0, 3, 'ACK', 1)
+
+        # Overlapping range, the old token is acked again and the queue takes one more
+        payload['sequencenbr'] = 2
+        self.tunnel_in.recv_tokens(payload)
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['count'], reply['value'], reply['window']) == (2, 2, 'NACK', 0)
+
     def test_get_peer(self):
         assert self.tunnel_in.get_peer() == (self.peer_node_id, self.peer_port.id)
         assert self.tunnel_out.get_peer() == (self.node_id, self.port.id)
@@ -177,6 +199,37 @@ class TestTunnelEndpoint(unittest.TestCase):
         self.tunnel_out.communicate()
         assert self.tunnel.send.call_count == 2
 
+    def test_window_communicate(self):
+        for i in range(4):
+            self.tunnel_out.port.write_token(Token(i))
+        self.tunnel_out.windowed = True
+        self.tunnel_out.window_end = 3
+        assert self.tunnel_out.communicate() is True
+        assert self.tunnel.send.call_count == 1
+        msg = self.tunnel.send.call_args[0][0]
+        assert msg['cmd'] == 'TOKENS'
+        assert msg['sequencenbr'] == 0
+        assert [t['value'] for t in msg['tokens']] == [0, 1, 2]
+        # Window is full
+        assert self.tunnel_out.communicate() is False
+
+        # Cumulative ack of two tokens and a nack of the third
+        self.tunnel_out.reply_tokens(0, 2, 'NACK', 0)
+        queue = self.tunnel_out.port.queue
+        assert queue.read_pos[self.port.id] == 2
+        assert queue.tentative_read_pos[self.port.id] == 2
+        assert not self.tunnel_out.bulk
+
+        # Probe with a single token, the ack opens the window again
+        assert self.tunnel_out.communicate() is True
+        assert self.tunnel.send.call_args[0][0]['cmd'] == 'TOKEN'
+        self.tunnel_out.reply(2, 'ACK', 4)
+        assert self.tunnel_out.bulk
+        assert self.tunnel_out.window_end == 7
+        assert self.tunnel_out.communicate() is True
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['cmd'], msg['sequencenbr'], len(msg['tokens'])) == ('TOKENS', 3, 1)
+
     def test_communicate(self):
         self.tunnel_out.port.write_token(Token(1))
         self.tunnel_out.port.write_token(Token(2))
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import json
+import time
+import pytest
+from mock import Mock
+
+from calvin.runtime.north.authorization.policy_decision_point import PolicyDecisionPoint
+from calvin.runtime.north.authorization.policy_retrieval_point import FilePolicyRetrievalPoint
+
+pytestmark = pytest.mark.unittest
+
+policy_path = os.path.join(os.path.dirname(__file__), "security_test", "policies")
+
+edge_policies = {
+    "non_string_values": {
+        "rule_combining": "deny_overrides",
+        "target": {"subject": {"first_name": ["Ek.*", 5]}},
+        "rules": [{"id": "r0", "effect": "deny"}]
+    },
+    "invalid_regex": {
+        "rule_combining": "permit_overrides",
+        "target": {"action": {"requires": "runtime"}},
+        "rules": [{"effect": "permit", "obligations": [{"id": "time_range"}],
+                   "condition": {"function": "or", "attributes": [
+                       {"function": "equal", "attributes": ["attr:subject:first_name", "B(erit"]},
+                       {"function": "not_equal", "attributes": ["attr:environment:current_time", ["0.*"]]}]}}]
+    },
+    "no_rule_combining": {
+        "target": {"subject": {"last_name": ["Nilsson", "Ek"]}},
+        "rules": [{"id": "r0", "effect": "permit", "target": {"subject": {"age": []}}},
+                  {"id": "r1", "effect": "deny",
+                   "condition": {"function": "less_than_or_equal", "attributes": ["attr:subject:age", 4]}}]
+    },
+    "bad_rule_target": {
+        "rule_combining": "permit_overrides",
+        "target": {"subject": {"first_name": "Ek"}, "resource": {"node_name.name": ["testNode1"]}},
+        "rules": [{"id": "r0", "effect": "permit",
+                   "condition": {"function": "equal", "attributes": ["attr:subject", "y"]}},
+                  {"id": "r1", "effect": "deny", "target": "bad"}]
+    },
+    "no_target": {
+        "rule_combining": "deny_overrides",
+        "rules": [{"id": "r0", "effect": "deny", "target": {"subject": {"first_name": ["Carl"]}}}]
+    }
+}
+
+requests = [
+    {},
+    {"subject": {"first_name": "Admin", "control_interface": "handle_deploy"}},
+    {"subject": {"first_name": "Anders", "control_interface": "handle_deploy"}},
+    {"subject": {"first_name": ["Berit", "Zed"], "control_interface": "handle_other"}},
+    {"subject": {"first_name": "Berit", "actor_signer": "signer"}, "action": {"requires": ["io.Print"]},
+     "resource": {"address.country": "SE"}},
+    {"subject": {"first_name": "Carl\n", "actor_signer": "other"}, "action": {"requires": ["sys.x"]}},
+    {"subject": {"first_name": "David", "actor_signer": "signer"}, "action": {"requires": ["io.Print"]},
+     "resource": {"node_name.name": "testNode1", "address.country": "SE"}},
+    {"subject": {"first_name": "Fredrik", "control_interface": "handle_deploy"}},
+    {"subject": {"first_name": "Ek", "last_name": "Ek", "age": 3}, "action": {"requires": "runtime"},
+     "resource": {"node_name.name": "testNode1"}},
+    {"subject": {"first_name": 5, "last_name": "Nilsson", "age": "5"}},
+    {"subject": {"first_name": [{"a": 1}], "last_name": "X"}},
+    {"subject": {"first_name": None, "application_signer": "signer"}},
+]
+
+
+class PIP(object):
+
+    def __init__(self):
+        self.fetched = []
+
+    def get_attribute_value(self, attribute_type, attribute):
+        self.fetched.append((attribute_type, attribute))
+        if attribute_type == "environment":
+            return {"current_date": "2017-01-01", "current_time": "10:00"}[attribute]
+        if (attribute_type, attribute) == ("subject", "actor_signer"):
+            return "signer"
+        raise KeyError(attribute)
+
+
+def _pdp(policies, config=None):
+    node = Mock()
+    node.authorization.prp.get_policies.return_value = policies
+    return PolicyDecisionPoint(node, config)
+
+
+def _copy(request):
+    return json.loads(json.dumps(request))
+
+
+@pytest.mark.parametrize("combining", ["permit_overrides", "deny_overrides"])
+@pytest.mark.parametrize("edge", [False, True])
+def test_same_decisions(combining, edge):
+    policies = FilePolicyRetrievalPoint(policy_path).get_policies()
+    if edge:
+        policies.update(edge_policies)
+    pdp = _pdp(policies, {"policy_combining": combining})
+    for request in requests:
+        expected = pdp.interpreted_policy_decision(_copy(request), PIP())
+        assert pdp.combined_policy_decision(_copy(request), PIP()) == expected
+        # Cached
+        assert pdp.combined_policy_decision(_copy(request), PIP()) == expected
+
+
+def test_index():
+    pdp = _pdp(FilePolicyRetrievalPoint(policy_path).get_policies())
+    pdp.combined_policy_decision({"subject": {"first_name": "Anders"}}, PIP())
+    engine = pdp.engine
+    ids = [policy_id for policy_id, _ in engine.sources]
+    # Only policy0 matches any first_name
+    assert [ids[p] for p in engine.unindexed] == ["policy0"]
+    candidates = [ids[p] for p in engine._candidates({"subject": {"first_name": "Anders"}})]
+    assert sorted(candidates) == ["policy0", "policy1"]
+    candidates = [ids[p] for p in engine._candidates({"subject": {"first_name": ["David", "Elin\n"]}})]
+    assert sorted(candidates) == ["policy0", "policy4", "policy5"]
+    # Missing attributes are fetched from the PIP, non-string values can't be looked up
+    assert len(engine._candidates({"subject": {}})) == len(ids)
+    assert len(engine._candidates({"subject": {"first_name": 5}})) == len(ids)
+
+
+def test_decision_cache():
+    policies = FilePolicyRetrievalPoint(policy_path).get_policies()
+    pdp = _pdp(policies)
+    request = {"subject": {"first_name": "Anders", "control_interface": "handle_deploy"}}
+    assert pdp.combined_policy_decision(_copy(request), PIP()) == ("permit", [])
+    pip = PIP()
+    assert pdp.combined_policy_decision(_copy(request), pip) == ("permit", [])
+    assert pdp.engine.decisions.info()["hits"] == 1
+    # New policy objects clear the cache
+    policies = dict(policies)
+    policies["policy1"] = dict(policies["policy1"], rules=[])
+    pdp.node.authorization.prp.get_policies.return_value = policies
+    assert pdp.combined_policy_decision(_copy(request), pip) == ("not_applicable", [])
+
+
+def test_decision_cache_volatile():
+    policy = {
+        "rule_combining": "permit_overrides",
+        "rules": [{"id": "r0", "effect": "permit", "obligations": [{"id": "time_range"}],
+                   "condition": {"function": "greater_than_or_equal",
+                                 "attributes": ["attr:environment:current_time", "08:00"]}}]
+    }
+    pdp = _pdp({"p": policy})
+    request = {"subject": {"first_name": "Berit"}}
+    obligations = [{"id": "time_range"}]
+    assert pdp.combined_policy_decision(_copy(request), PIP()) == ("permit", obligations)
+    pip = PIP()
+    assert pdp.combined_policy_decision(_copy(request), pip) == ("permit", obligations)
+    # Depends on current time, not cached
+    assert ("environment", "current_time") in pip.fetched
+    assert pdp.engine.decisions.info()["size"] == 0
+
+
+def test_decision_cache_disabled():
+    pdp = _pdp(FilePolicyRetrievalPoint(policy_path).get_policies(), {"decision_cache_ttl": 0})
+    request = {"subject": {"first_name": "Anders", "control_interface": "handle_deploy"}}
+    pdp.combined_policy_decision(_copy(request), PIP())
+    pdp.combined_policy_decision(_copy(request), PIP())
+    assert pdp.engine.decisions.info()["size"] == 0
+
+
+def test_prp_cache(tmpdir):
+    prp = FilePolicyRetrievalPoint(str(tmpdir), check_interval=0)
+    policy_id = prp.create_policy({"id": "a"})
+    policy = prp.get_policies()[policy_id]
+    assert policy == {"id": "a"}
+    # Same object while unchanged
+    assert prp.get_policies()[policy_id] is policy
+    assert prp.get_policy(policy_id) is policy
+    prp.update_policy({"id": "b"}, policy_id)
+    assert prp.get_policies()[policy_id] == {"id": "b"}
+    # Changed by someone else
+    path = str(tmpdir.join(policy_id + ".json"))
+    with open(path, "w") as f:
+        f.write('{"id": "changed"}')
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert prp.get_policies()[policy_id] == {"id": "changed"}
+    prp.delete_policy(policy_id)
+    assert prp.get_policies() == {}
+
+
+def test_prp_check_interval(tmpdir):
+    prp = FilePolicyRetrievalPoint(str(tmpdir), check_interval=60)
+    assert prp.get_policies() == {}
+    tmpdir.join("external.json").write('{"id": "external"}')
+    assert prp.get_policies() == {}
+    # Changes through the PRP are seen immediately
+    policy_id = prp.create_policy({"id": "a"})
+    assert sorted(prp.get_policies()) == sorted(["external", policy_id])
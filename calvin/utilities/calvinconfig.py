@@ -88,14 +88,27 @@ class CalvinConfig(object):
             'global': {
                 'comment': 'User definable section',
                 'actor_paths': ['systemactors'],
+                'actor_manifest': True,  # Keep an index of each actor path in its .actor_manifest.json
+                'compile_cache_size': 100,  # Max number of compiled scripts kept, 0 disables the cache
                 'framework': 'twistedimpl',
-                'storage_type': 'dht', # supports dht, securedht, local, and proxy
+                'scheduler': None,  # default, debug or ready_queue, None selects default (debug when debugging)
+                'storage_type': 'dht', # supports dht, securedht, local, sqlite, and proxy
                 'storage_proxy': None,
+                'storage_sqlite_path': None,  # Database file for storage_type sqlite, default ~/.calvin/storage/<name>.db
+                'storage_cache_size': 1000,  # Max number of registry values cached, 0 disables the cache
+                # Seconds a registry value is cached, per key prefix, keys with other prefixes are not cached
+                'storage_cache_ttl': {'node-': 60.0, 'application-': 10.0, 'actor-': 2.0, 'port-': 2.0,
+                                      'replication-': 2.0, 'index-': 2.0},
+                'reqmatch_cache_ttl': 10.0,  # Seconds a requirement match result is reused, 0 disables the cache
+                'reqmatch_max_placements': 0,  # Stop requirement matching after this many possible placements, 0 is no limit
                 'capabilities_blacklist': [],
                 'remote_coder_negotiator': 'static',
                 'static_coder': 'json',
                 'metering_timeout': 10.0,
                 'metering_aggregated_timeout': 3600.0,  # Larger or equal to metering_timeout
+                'metering_log_size': 4096,  # Max number of firings kept per actor for timed metering
+                'token_window': True,  # Windowed token transfer over tunnels when the peer supports it
+                'link_batching': False,  # Coalesce messages sent on a runtime link during one reactor tick
                 'display_plugin': 'stdout_impl',
                 'stdout_plugin': 'defaultimpl',
                 'transports': ['calvinip'],
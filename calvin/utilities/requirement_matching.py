@@ -14,13 +14,84 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import time
+import hashlib
+
 from calvin.utilities import dynops
 from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
 from calvin.runtime.north.plugins.requirements import req_operations
 import calvin.requests.calvinresponse as response
 from calvin.runtime.south.plugins.async import async
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+
+class ReqMatchCache(object):
+    """ Possible placements of recently matched requirements keyed by a canonical hash of the
+        requirements list, and the ReqMatch:es waiting for a match in progress of the same requirements.
+        Cleared when nodes join or leave and when indexes are updated, entries also expire after
+        ttl seconds since index updates made by other runtimes are not seen. A ttl of 0 disables it.
+    """
+    def __init__(self, ttl):
+        super(ReqMatchCache, self).__init__()
+        self.ttl = ttl
+        # signature -> (expires, possible_placements, status)
+        self.results = {}
+        # (signature, generation) -> list of ReqMatch waiting for the match in progress
+        self.pending = {}
+        # Matches started before an invalidation are neither cached nor shared
+        self.generation = 0
+
+    @staticmethod
+    def signature(requirements):
+        return hashlib.sha1(json.dumps(requirements, sort_keys=True, default=repr)).hexdigest()
+
+    def cacheable(self, requirements):
+        """ Requirements are cacheable unless some operation depends on the actor matched for """
+        if self.ttl <= 0:
+            return False
+        for req in requirements:
+            for r in req.get('requirements', []) if req.get('op') == 'union_group' else [req]:
+                op = req_operations.get(r.get('op'))
+                if op is None or getattr(op, 'actor_dependent', False):
+                    return False
+        return True
+
+    def get(self, signature):
+        """ Return (possible_placements, status) or None """
+        entry = self.results.get(signature)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self.results[signature]
+            return None
+        return set(entry[1]), entry[2]
+
+    def wait(self, signature, req_match):
+        """ Let req_match wait for a match in progress, returns False when none is """
+        waiting = self.pending.get((signature, self.generation))
+        if waiting is None:
+            return False
+        waiting.append(req_match)
+        return True
+
+    def start(self, signature):
+        self.pending[(signature, self.generation)] = []
+        return self.generation
+
+    def done(self, signature, generation, possible_placements, status, store=True):
+        """ Store the result of a match, unless store is False, and return the ReqMatch:es waiting for it """
+        if store and generation == self.generation:
+            self.results[signature] = (time.time() + self.ttl, set(possible_placements), status)
+        return self.pending.pop((signature, generation), [])
+
+    def invalidate(self):
+        self.results = {}
+        self.generation += 1
+
 
 class ReqMatch(object):
     """ ReqMatch Do requirement matching for an actor.
@@ -65,12 +136,33 @@ class ReqMatch(object):
         self.requirements = requirements
         self.actor_id = actor_id
         self.component_ids = component_ids
+        self.signature = None
+        cache = getattr(self.node, 'req_match_cache', None)
+        if cache is not None and cache.cacheable(requirements):
+            signature = cache.signature(requirements)
+            found = cache.get(signature)
+            if found is not None:
+                _log.analyze(self.node.id, "+ CACHED", {'actor_id': actor_id, 'signature': signature})
+                self._matched(*found)
+                return
+            if cache.wait(signature, self):
+                # Identical requirements are being matched, share the result
+                return
+            self.signature = signature
+            self._generation = cache.start(signature)
         self._collect_placement_counter = 0
         self._collect_placement_last_value = 0
         self._collect_placement_cb = None
-        self.node_iter = self._build_match()
         self.possible_placements = set([])
         self.done = False
+        # Set when a requirement is dropped, the result is then not cached
+        self._incomplete = False
+        try:
+            self.node_iter = self._build_match()
+        except:
+            _log.exception("ReqMatch:_build_match")
+            self._failed()
+            return
         self.node_iter.set_cb(self._collect_placements)
         _log.analyze(self.node.id, "+ CALL CB", {'actor_id': self.actor_id, 'node_iter': str(self.node_iter)})
         # Must call it since the triggers might already have released before cb set
@@ -102,9 +194,15 @@ class ReqMatch(object):
                 except:
                     _log.error("actor_requirements one req failed for %s!!!" % self.actor_id, exc_info=True)
                     # FIXME how to handle failed requirements, now we drop it
-        return_iter = dynops.Intersection(*intersection_iters).set_name("SActor" + self.actor_id)
+                    self._incomplete = True
+        # Stop matching when enough possible placements are found
+        limit = _conf.get(None, 'reqmatch_max_placements') or None
         if difference_iters:
-            return_iter = dynops.Difference(return_iter, *difference_iters).set_name("SActor" + self.actor_id)
+            return_iter = dynops.Intersection(*intersection_iters).set_name("SActor" + self.actor_id)
+            return_iter = dynops.Difference(return_iter, *difference_iters,
+                                            limit=limit).set_name("SActor" + self.actor_id)
+        else:
+            return_iter = dynops.Intersection(*intersection_iters, limit=limit).set_name("SActor" + self.actor_id)
         return return_iter
 
     def _build_union_match(self, req):
@@ -117,6 +215,7 @@ class ReqMatch(object):
                                         **union_req['kwargs']).set_name(union_req['op'] + ",UActor" + self.actor_id))
             except:
                 _log.error("union_requirements one req failed for %s!!!" % self.actor_id, exc_info=True)
+                self._incomplete = True
         return dynops.Union(*union_iters)
 
     def _collect_placements(self):
@@ -145,12 +244,31 @@ class ReqMatch(object):
         except StopIteration:
             # All possible actor placements derived
             _log.analyze(self.node.id, "+ ALL", {})
-            self.done = True
-            if callable(self.callback):
-                status = response.CalvinResponse(True if self.possible_placements else False)
-                self.callback(possible_placements=self.possible_placements, status=status)
-                return
+            self._finish(response.CalvinResponse(True if self.possible_placements else False),
+                         store=not self._incomplete)
             _log.analyze(self.node.id, "+ END", {})
         except:
             _log.exception("ReqMatch:_collect_placements")
+            self._failed()
+
+    def _failed(self):
+        self.possible_placements = set([])
+        self._finish(response.CalvinResponse(response.INTERNAL_ERROR), store=False)
+
+    def _finish(self, status, store=True):
+        """ Report the result to the callback and to the ReqMatch:es waiting for the same requirements """
+        self.done = True
+        waiting = []
+        if self.signature:
+            waiting = self.node.req_match_cache.done(self.signature, self._generation,
+                                                     self.possible_placements, status, store=store)
+        self._matched(self.possible_placements, status)
+        for req_match in waiting:
+            req_match._matched(set(self.possible_placements), status)
+
+    def _matched(self, possible_placements, status):
+        self.possible_placements = possible_placements
+        self.done = True
+        if callable(self.callback):
+            self.callback(possible_placements=possible_placements, status=status)
 
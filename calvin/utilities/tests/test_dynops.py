@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+import random
+import timeit
+
+from calvin.utilities import dynops
+
+pytestmark = pytest.mark.unittest
+
+
+def drain(it):
+    elems = []
+    try:
+        while True:
+            elems.append(it.next())
+    except StopIteration:
+        return elems, True
+    except dynops.PauseIteration:
+        return elems, False
+
+
+def test_intersection_streams():
+    l1 = dynops.List()
+    l2 = dynops.List()
+    it = dynops.Intersection(l1, l2, [3, 2, 1, 7])
+    l1.extend([1, 2, 3])
+    assert drain(it) == ([], False)
+    l2.append(2)
+    assert drain(it) == ([2], False)
+    l2.extend([1, 2, 5])
+    assert drain(it) == ([1], False)
+    l1.final()
+    l2.extend([3, 7])
+    elems, final = drain(it)
+    assert elems == [3]
+    l2.final()
+    assert drain(it) == ([], True)
+
+
+def test_intersection_short_circuits_on_final_iterable():
+    l1 = dynops.List([1, 2])
+    l1.final()
+    l2 = dynops.List([2, 1, 5])
+    it = dynops.Intersection(l1, l2)
+    assert sorted(drain(it)[0]) == [1, 2]
+    # l2 is not final, but l1 can't add more elements to the intersection
+    assert drain(it) == ([], True)
+    empty = dynops.List()
+    empty.final()
+    assert drain(dynops.Intersection(empty, dynops.List([1]))) == ([], True)
+
+
+def test_intersection_limit():
+    l1 = dynops.List(range(100))
+    it = dynops.Intersection(l1, range(50, 150), limit=5)
+    elems, final = drain(it)
+    assert len(elems) == 5 and final
+    assert set(elems) <= set(range(50, 100))
+
+
+def test_intersection_infinite():
+    assert drain(dynops.Intersection(dynops.Infinite(), [1, 2])) == ([1, 2], True)
+    l1 = dynops.List([1, 2, 3])
+    l2 = dynops.List([4])
+    it = dynops.Intersection(l1, l2, [2, 3, 4])
+    assert drain(it) == ([], False)
+    # An iterable turning infinite no longer limits the intersection
+    l2.append(dynops.InfiniteElement())
+    l1.final()
+    l2.final()
+    assert sorted(drain(it)[0]) == [2, 3]
+    elems, _ = drain(dynops.Intersection(dynops.List([dynops.InfiniteElement()])))
+    assert len(elems) == 1 and isinstance(elems[0], dynops.InfiniteElement)
+
+
+def test_union_and_difference():
+    assert sorted(drain(dynops.Union([1, 2], [2, 3]))[0]) == [1, 2, 3]
+    assert drain(dynops.Difference(dynops.List([1, 2, 3, 4]), [2], [4, 5])) == ([1, 3], False)
+    elems, final = drain(dynops.Difference(dynops.List(range(10)), [0], limit=3))
+    assert elems == [1, 2, 3] and final
+
+
+def test_perf():
+    # Run with -s to see the numbers
+    random.seed(4711)
+    population = ["node%d" % i for i in range(30000)]
+    node_sets = [random.sample(population, 10000) for _ in range(4)]
+    expected = set.intersection(*[set(s) for s in node_sets])
+
+    def intersect(size=10000, limit=None):
+        lists = [dynops.List() for _ in node_sets]
+        it = dynops.Intersection(*lists, limit=limit)
+        found = []
+        # Filled in chunks as storage responses arrive
+        for start in range(0, size, 1000):
+            for l, s in zip(lists, node_sets):
+                l.extend(s[start:start + 1000])
+            found.extend(drain(it)[0])
+        for l in lists:
+            l.final()
+        found.extend(drain(it)[0])
+        return found
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=3))
+
+    assert set(intersect()) == expected
+    full = best(intersect)
+    half = best(lambda: intersect(size=5000))
+    limited = best(lambda: intersect(limit=10))
+    print
+    print "4 x 10k intersection %8.2fms, 4 x 5k %8.2fms, limit 10 %8.2fms, %d elements" % (
+        1000 * full, 1000 * half, 1000 * limited, len(expected))
+    # Linear in the number of elements, twice the elements is not four times the time
+    assert full < 3 * half
+    assert limited < full
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+from mock import Mock, patch
+
+from calvin.utilities import dynops
+from calvin.utilities.requirement_matching import ReqMatch, ReqMatchCache
+
+pytestmark = pytest.mark.unittest
+
+ATTR_REQ = [{'op': 'node_attr_match', 'kwargs': {'index': ['node_name', {'organization': 'org'}]}, 'type': '+'}]
+
+
+def create_node(ttl=10.0):
+    node = Mock()
+    node.id = 'node1'
+    node.req_match_cache = ReqMatchCache(ttl)
+    node.storage.get_index_iter.side_effect = lambda index: dynops.List()
+    return node
+
+
+def match(node, requirements, actor_id='actor1'):
+    callback = Mock()
+    req_match = ReqMatch(node, callback=callback)
+    req_match.match(requirements, actor_id=actor_id)
+    return req_match, callback
+
+
+def test_signature_canonical():
+    a = [{'op': 'x', 'kwargs': {'a': 1, 'b': 2}, 'type': '+'}]
+    b = [{'type': '+', 'kwargs': {'b': 2, 'a': 1}, 'op': 'x'}]
+    assert ReqMatchCache.signature(a) == ReqMatchCache.signature(b)
+    assert ReqMatchCache.signature(a) != ReqMatchCache.signature([dict(a[0], type='-')])
+
+
+@patch('calvin.utilities.requirement_matching.async')
+def test_identical_requirements_share_match(async):
+    node = create_node()
+    iters = []
+    node.storage.get_index_iter.side_effect = lambda index: iters.append(dynops.List()) or iters[-1]
+    first, first_cb = match(node, ATTR_REQ, 'actor1')
+    second, second_cb = match(node, ATTR_REQ, 'actor2')
+    assert node.storage.get_index_iter.call_count == 1
+    assert not first_cb.called and not second_cb.called
+    iters[0].extend(['node1', 'node2'])
+    iters[0].final()
+    first._collect_placements()
+    assert first_cb.call_args[1]['possible_placements'] == set(['node1', 'node2'])
+    assert second_cb.call_args[1]['possible_placements'] == set(['node1', 'node2'])
+    # Later matches are answered from the cache
+    third, third_cb = match(node, ATTR_REQ, 'actor3')
+    assert node.storage.get_index_iter.call_count == 1
+    assert third_cb.call_args[1]['possible_placements'] == set(['node1', 'node2'])
+    assert third_cb.call_args[1]['status']
+    # Each caller gets its own set
+    third_cb.call_args[1]['possible_placements'].add('node3')
+    assert node.req_match_cache.get(ReqMatchCache.signature(ATTR_REQ))[0] == set(['node1', 'node2'])
+
+
+@patch('calvin.utilities.requirement_matching.async')
+def test_invalidate_during_match(async):
+    node = create_node()
+    it = dynops.List()
+    node.storage.get_index_iter.side_effect = lambda index: it
+    first, first_cb = match(node, ATTR_REQ)
+    node.req_match_cache.invalidate()
+    it.append('node1')
+    it.final()
+    first._collect_placements()
+    assert first_cb.call_args[1]['possible_placements'] == set(['node1'])
+    assert not node.req_match_cache.results
+
+    # A match started after the invalidation does not share the earlier one
+    assert not node.req_match_cache.pending
+
+
+@patch('calvin.utilities.requirement_matching.async')
+def test_invalidate_new_match_not_shared(async):
+    node = create_node()
+    iters = []
+    node.storage.get_index_iter.side_effect = lambda index: iters.append(dynops.List()) or iters[-1]
+    first, first_cb = match(node, ATTR_REQ, 'actor1')
+    node.req_match_cache.invalidate()
+    second, second_cb = match(node, ATTR_REQ, 'actor2')
+    assert node.storage.get_index_iter.call_count == 2
+    iters[0].append('node1')
+    iters[0].final()
+    first._collect_placements()
+    assert first_cb.call_args[1]['possible_placements'] == set(['node1'])
+    assert not second_cb.called
+    iters[1].append('node2')
+    iters[1].final()
+    second._collect_placements()
+    assert second_cb.call_args[1]['possible_placements'] == set(['node2'])
+    assert node.req_match_cache.get(ReqMatchCache.signature(ATTR_REQ))[0] == set(['node2'])
+    assert not node.req_match_cache.pending
+
+
+@patch('calvin.utilities.requirement_matching.async')
+def test_failed_match_releases_waiters(async):
+    node = create_node()
+    it = Mock()
+    it.set_name.return_value = it
+    node.storage.get_index_iter.side_effect = lambda index: it
+    with patch('calvin.utilities.requirement_matching.dynops.Intersection') as intersection:
+        intersection.return_value.set_name.return_value = it
+        it.next.side_effect = dynops.PauseIteration
+        first, first_cb = match(node, ATTR_REQ, 'actor1')
+        second, second_cb = match(node, ATTR_REQ, 'actor2')
+        it.next.side_effect = KeyError
+        first._collect_placements()
+    for cb in (first_cb, second_cb):
+        assert cb.call_args[1]['possible_placements'] == set([])
+        assert cb.call_args[1]['status'].status == 500
+    assert not node.req_match_cache.pending
+    assert not node.req_match_cache.results
+
+
+def test_failed_build_releases_waiters():
+    node = create_node()
+    with patch.object(ReqMatch, '_build_match', side_effect=ValueError):
+        _, cb = match(node, ATTR_REQ)
+    assert cb.call_args[1]['status'].status == 500
+    assert not node.req_match_cache.pending
+
+
+def test_dropped_requirement_not_cached():
+    node = create_node()
+    node.storage.get_index_iter.side_effect = KeyError
+    _, cb = match(node, ATTR_REQ)
+    assert cb.called
+    assert not node.req_match_cache.results
+    assert not node.req_match_cache.pending
+
+
+def test_current_node_cached():
+    node = create_node()
+    _, cb = match(node, [{'op': 'current_node', 'kwargs': {}, 'type': '+'}])
+    assert cb.call_args[1]['possible_placements'] == set(['node1'])
+    assert len(node.req_match_cache.results) == 1
+
+
+def test_not_cacheable():
+    cache = ReqMatchCache(10.0)
+    assert cache.cacheable(ATTR_REQ)
+    assert not cache.cacheable([{'op': 'replica_nodes', 'kwargs': {}, 'type': '+'}])
+    assert not cache.cacheable([{'op': 'union_group', 'type': '+',
+                                 'requirements': [{'op': 'replica_nodes', 'kwargs': {}}]}])
+    assert not cache.cacheable([{'op': 'unknown', 'kwargs': {}, 'type': '+'}])
+    assert not ReqMatchCache(0).cacheable(ATTR_REQ)
+
+
+@patch('calvin.utilities.requirement_matching.time')
+def test_expires(time):
+    time.time.return_value = 100.0
+    cache = ReqMatchCache(10.0)
+    generation = cache.start('sig')
+    cache.done('sig', generation, set(['node1']), True)
+    assert cache.get('sig') == (set(['node1']), True)
+    time.time.return_value = 111.0
+    assert cache.get('sig') is None